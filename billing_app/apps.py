@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BillingAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'billing_app'
+
+    def ready(self):
+        # Connects the SQLite PRAGMA hook, the Product signals that keep
+        # the suggestion index current, the catalog tombstone writer, the
+        # live terminal publisher and the metrics counters
+        from . import catalog, db, live, metrics, search  # noqa: F401
@@ -0,0 +1,186 @@
+import gc
+import json
+import math
+import random
+import threading
+import time
+import tracemalloc
+
+from django.db import connection
+
+
+# ==========================
+# BENCHMARK SUITE
+# ==========================
+# Each scenario issues one request through django.test.Client, so the
+# whole middleware stack runs, and RequestTimingMiddleware's
+# request.timing supplies the query count. Latencies are measured with
+# tracemalloc off; peak memory comes from a separate sequential pass,
+# because tracing allocations slows every request down several times.
+
+SUGGEST_TERMS = ['sam', 'iphone', 'galaxy 1', 'charger', 'nord', '3500000', 'xiaomi note', 'watch']
+
+
+def create_bill(client, rng, product_ids):
+    body = {
+        'customer_name': 'Bench Customer',
+        'customer_phone': '9000000000',
+        'items': [{'product_id': pk, 'quantity': 1} for pk in rng.sample(product_ids, 3)],
+    }
+    return client.post('/api/bills/create/', json.dumps(body), content_type='application/json')
+
+
+# Reads first: create_bill changes what they would measure
+SCENARIOS = {
+    'bill_list': lambda client, rng, ids: client.get('/api/bills/', {'page_size': 50}),
+    'product_list': lambda client, rng, ids: client.get('/api/products/'),
+    'product_suggest': lambda client, rng, ids: client.get('/api/products/suggest/', {'q': rng.choice(SUGGEST_TERMS)}),
+    'reports_data': lambda client, rng, ids: client.get('/api/reports/'),
+    'proforma_list': lambda client, rng, ids: client.get('/api/proforma/', {'page_size': 50}),
+    'create_bill': create_bill,
+}
+EXPECTED_STATUS = {'create_bill': 201}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def send(scenario, client, rng, product_ids):
+    """Run ``scenario`` and read a streamed body to the end, a piece at a time, as a client would."""
+    response = scenario(client, rng, product_ids)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def check(name, response):
+    expected = EXPECTED_STATUS.get(name, 200)
+    if response.status_code != expected:
+        raise RuntimeError(f"{name}: HTTP {response.status_code}, expected {expected}")
+
+
+def run_load(name, make_client, product_ids, requests, concurrency, seed=0):
+    """Latency percentiles (ms) and throughput of ``requests`` calls over ``concurrency`` threads."""
+    scenario = SCENARIOS[name]
+    latencies, errors = [], []
+    per_thread = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    def worker(index, count):
+        client = make_client()
+        rng = random.Random(seed * 1000 + index)
+        timings = []
+        try:
+            for _ in range(count):
+                start = time.perf_counter()
+                response = send(scenario, client, rng, product_ids)
+                timings.append((time.perf_counter() - start) * 1000)
+                check(name, response)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            latencies.extend(timings)
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i, count)) for i, count in enumerate(per_thread)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'p50': round(percentile(latencies, 50), 2),
+        'p95': round(percentile(latencies, 95), 2),
+        'p99': round(percentile(latencies, 99), 2),
+        'rps': round(len(latencies) / elapsed, 1),
+    }
+
+
+def profile(name, client, product_ids, repeat=3):
+    """Query count and peak traced memory (KiB) of one request, worst of ``repeat``."""
+    scenario = SCENARIOS[name]
+    rng = random.Random(0)
+    # Warm up first: one-off work (session load, index build) is not per request
+    check(name, send(scenario, client, rng, product_ids))
+    queries = peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            gc.collect()  # garbage left by earlier requests would count towards the peak
+            tracemalloc.reset_peak()
+            response = send(scenario, client, rng, product_ids)
+            check(name, response)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            queries = max(queries, response.wsgi_request.timing['queries'])
+    finally:
+        tracemalloc.stop()
+    return {'queries': queries, 'peak_kib': round(peak / 1024)}
+
+
+# A percentile with fewer requests above it is mostly one or two outliers
+MIN_TAIL = 5
+
+
+def tail_allowance(pct, requests):
+    """
+    Extra relative growth allowed for the ``pct`` percentile of
+    ``requests`` samples: 1/sqrt(k) for the k samples above it, the
+    usual relative error of a count of k. ``None`` when k is below
+    MIN_TAIL (p95 needs 100 requests, p99 500), as the percentile then
+    only tracks the slowest few requests.
+    """
+    above = requests * (100 - pct) / 100
+    return 1 / math.sqrt(above) if above >= MIN_TAIL else None
+
+
+def regressions(baseline, results, tolerance=0.25, slack_ms=2.0):
+    """
+    Messages for every figure in ``results`` that is worse than ``baseline``.
+
+    Both are ``{size: {scenario: {'queries', 'peak_kib', 'latency':
+    {concurrency: {'requests', 'p50', 'p95', 'p99', 'rps'}}}}}``. Query
+    counts must not grow at all; peak memory may grow by ``tolerance``.
+    p95 and p99 may grow by ``tolerance`` plus tail_allowance() for the
+    smaller sample of the two runs, and by ``slack_ms``, so
+    sub-millisecond jitter on fast endpoints and a few slow requests in
+    a short run do not fail it. Entries missing on either side are
+    skipped, so a baseline can cover fewer sizes than a run.
+    """
+    problems = []
+    for size, scenarios in results.items():
+        for name, current in scenarios.items():
+            before = baseline.get(size, {}).get(name)
+            if before is None:
+                continue
+            where = f"{name} @ {size} bills"
+            if current['queries'] > before['queries']:
+                problems.append(f"{where}: {current['queries']} queries, baseline {before['queries']}")
+            if current['peak_kib'] > before['peak_kib'] * (1 + tolerance):
+                problems.append(f"{where}: peak memory {current['peak_kib']} KiB, baseline {before['peak_kib']} KiB")
+            for concurrency, latency in current['latency'].items():
+                old = before['latency'].get(concurrency)
+                if old is None:
+                    continue
+                requests = min(latency.get('requests', 0), old.get('requests', latency.get('requests', 0)))
+                for key, pct in (('p95', 95), ('p99', 99)):
+                    allowance = tail_allowance(pct, requests)
+                    if allowance is None:
+                        continue
+                    limit = old[key] * (1 + tolerance + allowance) + slack_ms
+                    if latency[key] > limit:
+                        problems.append(
+                            f"{where}, {concurrency} threads: {key} {latency[key]:.1f} ms, "
+                            f"baseline {old[key]:.1f} ms"
+                        )
+    return problems
@@ -0,0 +1,298 @@
+import codecs
+import csv
+import json
+import math
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+
+from .models import Category, Product
+from .live import products_changed_on_commit
+from .search import refresh_on_commit
+
+
+# ==========================
+# BULK PRODUCT IMPORT / STOCK ADJUSTMENT
+# ==========================
+# Rows are read from the request stream one at a time (CSV, NDJSON, or a
+# plain JSON array), validated in plain Python, and written a chunk at a
+# time, each chunk in its own transaction. A bad row is reported and
+# skipped; it never aborts the rest of the batch.
+
+MAX_REPORTED_ERRORS = 1000
+MAX_STOCK = 2 ** 31 - 1  # PositiveIntegerField is a 32-bit integer column
+
+
+def chunk_size():
+    return getattr(settings, 'BULK_CHUNK_SIZE', 1000)
+
+
+def iter_rows(request):
+    """Yield dict rows from an uploaded file or the raw request body."""
+    content_type = request.content_type.split(';')[0].strip()
+    if content_type.startswith('multipart/'):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ParseError('Upload the rows as "file"')
+        name = upload.name.lower()
+        stream = upload.file
+        content_type = 'application/json' if name.endswith('.json') else (
+            'application/x-ndjson' if name.endswith(('.ndjson', '.jsonl')) else 'text/csv'
+        )
+    else:
+        stream = request.stream
+        if stream is None:
+            raise ParseError('Empty request body')
+
+    if content_type == 'text/csv':
+        yield from csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+    elif content_type in ('application/x-ndjson', 'application/jsonl'):
+        for line in codecs.iterdecode(stream, 'utf-8'):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield {'__error__': 'Invalid JSON line'}
+    elif content_type == 'application/json':
+        # A JSON array cannot be parsed incrementally with the stdlib;
+        # send NDJSON or CSV for very large batches
+        try:
+            rows = json.load(stream)
+        except ValueError:
+            raise ParseError('Invalid JSON')
+        if not isinstance(rows, list):
+            raise ParseError('Expected a JSON array of rows')
+        yield from rows
+    else:
+        raise ParseError('Send text/csv, application/x-ndjson or application/json')
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BatchResult:
+    def __init__(self):
+        self.ok = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def as_dict(self, ok_key):
+        return {
+            ok_key: self.ok,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+def text(row, key):
+    value = row.get(key)
+    return str(value).strip() if value not in (None, '') else ''
+
+
+def text_field(row, key, errors, max_length, required=False):
+    """The stripped text of ``row[key]``, reported as an error when missing or too long."""
+    value = text(row, key)
+    if required and not value:
+        errors[key] = 'This field is required.'
+    elif len(value) > max_length:
+        errors[key] = f'Ensure this field has no more than {max_length} characters.'
+    return value
+
+
+def decimal_field(row, key, errors, required=True):
+    raw = text(row, key)
+    if not raw:
+        if required:
+            errors[key] = 'This field is required.'
+        return Decimal('0')
+    try:
+        value = Decimal(raw)
+    except InvalidOperation:
+        errors[key] = 'A valid number is required.'
+        return None
+    if value < 0 or value.as_tuple().exponent < -2 or value >= 10 ** 10:
+        errors[key] = 'Must be a non-negative amount below 10^10 with at most 2 decimal places.'
+    return value
+
+
+def int_field(row, key, errors, default=None):
+    raw = text(row, key)
+    if not raw:
+        if default is None:
+            errors[key] = 'This field is required.'
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        errors[key] = 'A valid integer is required.'
+        return None
+
+
+def clean_product(row):
+    """Return ``(Product, None)`` or ``(None, errors)`` for one import row."""
+    if '__error__' in row:
+        return None, {'row': row['__error__']}
+    errors = {}
+    name = text_field(row, 'name', errors, 200, required=True)
+    imei = text_field(row, 'imei', errors, 50)
+    category = text_field(row, 'category', errors, 100)
+    agency_name = text_field(row, 'agency_name', errors, 200)
+    selling_price = decimal_field(row, 'selling_price', errors)
+    purchase_price = decimal_field(row, 'purchase_price', errors)
+    stock = int_field(row, 'stock', errors, default=0)
+    if stock is not None and not 0 <= stock <= MAX_STOCK:
+        errors['stock'] = f'Ensure this value is between 0 and {MAX_STOCK}.'
+    try:
+        gst_percentage = float(text(row, 'gst_percentage') or 0)
+    except ValueError:
+        gst_percentage = None
+    if gst_percentage is None or not math.isfinite(gst_percentage):
+        errors['gst_percentage'] = 'A valid number is required.'
+    if errors:
+        return None, errors
+    return Product(
+        name=name,
+        imei=imei or None,
+        selling_price=selling_price,
+        purchase_price=purchase_price,
+        gst_percentage=gst_percentage,
+        category=category or None,
+        stock=stock,
+        agency_name=agency_name,
+    ), None
+
+
+def ensure_categories(names):
+    """Create any missing categories for a batch in one INSERT."""
+    if names:
+        Category.objects.bulk_create([Category(name=name) for name in names], ignore_conflicts=True)
+
+
+def import_products(rows):
+    result = BatchResult()
+    row_number = 0
+    for chunk in chunks(rows, chunk_size()):
+        products, numbers = [], []
+        for row in chunk:
+            row_number += 1
+            product, errors = clean_product(row if isinstance(row, dict) else {})
+            if errors:
+                result.error(row_number, errors)
+            else:
+                products.append(product)
+                numbers.append(row_number)
+        if not products:
+            continue
+        try:
+            with transaction.atomic():
+                ensure_categories({p.category for p in products if p.category})
+                Product.objects.bulk_create(products)
+                created = [p.pk for p in products if p.pk]
+                refresh_on_commit(created)
+                products_changed_on_commit(created)
+        except DatabaseError as exc:
+            for number in numbers:
+                result.error(number, {'row': f'Could not save chunk: {exc}'})
+            continue
+        result.ok += len(products)
+    return result
+
+
+def adjust_stock(rows):
+    """
+    Apply ``{"id" or "imei", "delta"}`` rows. Updates are relative
+    (stock = stock + delta), so they never overwrite stock sold by a
+    concurrent checkout; a delta that would take stock below zero or
+    above MAX_STOCK is skipped and reported.
+    """
+    result = BatchResult()
+    row_number = 0
+    for chunk in chunks(rows, chunk_size()):
+        wanted = []  # (row number, product id or None, imei or None, delta)
+        for row in chunk:
+            row_number += 1
+            row = row if isinstance(row, dict) else {}
+            errors = {}
+            delta = int_field(row, 'delta', errors)
+            if delta is not None and abs(delta) > MAX_STOCK:
+                errors['delta'] = f'Ensure this value is between -{MAX_STOCK} and {MAX_STOCK}.'
+            product_id = int_field(row, 'id', errors, default=0) if text(row, 'id') else None
+            imei = text(row, 'imei')
+            if product_id is None and not imei and 'id' not in errors:
+                errors['id'] = 'Give a product id or imei.'
+            if errors:
+                result.error(row_number, errors)
+            else:
+                wanted.append((row_number, product_id, imei, delta))
+        if wanted:
+            apply_stock_chunk(wanted, result)
+    return result
+
+
+def apply_stock_chunk(wanted, result):
+    imeis = {imei for _, product_id, imei, _ in wanted if product_id is None}
+    by_imei = dict(
+        Product.objects.filter(imei__in=imeis).values_list('imei', 'pk')
+    ) if imeis else {}
+
+    deltas, rows_for = {}, {}
+    for number, product_id, imei, delta in wanted:
+        pk = product_id if product_id is not None else by_imei.get(imei)
+        if pk is None:
+            result.error(number, {'imei': 'Product not found'})
+            continue
+        deltas[pk] = deltas.get(pk, 0) + delta
+        rows_for.setdefault(pk, []).append(number)
+    if not deltas:
+        return
+
+    # One relative UPDATE per distinct delta value (a delivery is usually
+    # a handful of distinct quantities), guarded so stock stays within
+    # 0..MAX_STOCK
+    by_delta = {}
+    for pk, delta in deltas.items():
+        by_delta.setdefault(delta, []).append(pk)
+
+    now = timezone.now()
+    with transaction.atomic():
+        for delta, pks in by_delta.items():
+            Product.objects.filter(pk__in=pks, stock__gte=-delta, stock__lte=MAX_STOCK - delta).update(
+                stock=F('stock') + delta, updated_at=now
+            )
+        # updated_at == now marks the rows the guard let through
+        applied = set(Product.objects.filter(pk__in=list(deltas), updated_at=now).values_list('pk', flat=True))
+        existing = applied | set(
+            Product.objects.filter(pk__in=[pk for pk in deltas if pk not in applied]).values_list('pk', flat=True)
+        )
+        refresh_on_commit(applied)
+        products_changed_on_commit(applied)
+
+    for pk, numbers in rows_for.items():
+        if pk in applied:
+            result.ok += len(numbers)
+        else:
+            if pk not in existing:
+                error = {'id': 'Product not found'}
+            elif deltas[pk] > 0:
+                error = {'delta': f'Stock would exceed {MAX_STOCK}'}
+            else:
+                error = {'delta': 'Insufficient stock'}
+            for number in numbers:
+                result.error(number, error)
@@ -0,0 +1,110 @@
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Max
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Product, ProductTombstone
+
+
+# ==========================
+# CATALOG VERSION / DELTA SYNC
+# ==========================
+# The catalog version is the newest Product.updated_at or tombstone
+# deleted_at, as integer microseconds. Every product write moves it:
+# saves through auto_now, checkout and bulk stock updates set updated_at
+# explicitly, and deletes leave a tombstone. Both maxima are single index
+# lookups.
+#
+# A transaction can commit after a later one has already published a
+# newer version, so ?since= re-sends everything changed in the last
+# CATALOG_SYNC_GRACE_SECONDS before the client's version. Upserts are
+# idempotent, so the overlap is harmless. For the same reason the ETag
+# also counts the rows inside that window, which makes a late commit
+# change the ETag even when the maximum does not move.
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def grace():
+    return timedelta(seconds=getattr(settings, 'CATALOG_SYNC_GRACE_SECONDS', 5))
+
+
+def tombstone_cutoff():
+    return timezone.now() - timedelta(days=getattr(settings, 'CATALOG_TOMBSTONE_DAYS', 30))
+
+
+def to_version(moment):
+    if moment is None:
+        return '0'
+    delta = moment - EPOCH
+    return str((delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds)
+
+
+def parse_version(raw):
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        raise ValidationError({'since': 'Invalid catalog version'})
+    if value < 0:
+        raise ValidationError({'since': 'Invalid catalog version'})
+    try:
+        return EPOCH + timedelta(microseconds=value)
+    except OverflowError:  # past datetime.max
+        raise ValidationError({'since': 'Invalid catalog version'})
+
+
+def latest_change():
+    latest = Product.objects.aggregate(latest=Max('updated_at'))['latest']
+    deleted = ProductTombstone.objects.aggregate(latest=Max('deleted_at'))['latest']
+    return max(filter(None, (latest, deleted)), default=None)
+
+
+def catalog_etag(request, latest):
+    """Strong ETag for a product_list response at catalog state ``latest``."""
+    recent = 0
+    if latest is not None:
+        window = latest - grace()
+        recent = (
+            Product.objects.filter(updated_at__gte=window).count()
+            + ProductTombstone.objects.filter(deleted_at__gte=window).count()
+        )
+    # The same catalog in another format (see renderers.py) is another entity
+    variant = f"{request.META.get('QUERY_STRING', '')}|{getattr(request, 'accepted_media_type', '')}"
+    query = hashlib.sha1(variant.encode()).hexdigest()[:12]
+    return f'"{to_version(latest)}-{recent}-{query}"'
+
+
+def etag_matches(request, etag):
+    """Weak comparison, as If-None-Match wants: compression marks the ETag weak."""
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if header.strip() == '*':
+        return True
+    return etag.removeprefix('W/') in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+
+def changes_since(since):
+    """
+    Return ``(changed products, deleted ids)`` after version ``since``, or
+    ``None`` when the tombstones needed for it have already been pruned and
+    the client must reload the full catalog.
+    """
+    if since < tombstone_cutoff():
+        return None
+    window = since - grace()
+    changed = Product.objects.filter(updated_at__gt=window).order_by('-created_at', '-id')
+    deleted = list(
+        ProductTombstone.objects.filter(deleted_at__gt=window)
+        .values_list('product_id', flat=True).distinct()
+    )
+    return changed, deleted
+
+
+@receiver(post_delete, sender=Product)
+def record_tombstone(sender, instance, **kwargs):
+    ProductTombstone.objects.create(product_id=instance.pk)
+    ProductTombstone.objects.filter(deleted_at__lt=tombstone_cutoff()).delete()
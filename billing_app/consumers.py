@@ -0,0 +1,30 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .live import TERMINALS_GROUP
+
+
+# ==========================
+# TERMINAL WEBSOCKET
+# ==========================
+class TerminalConsumer(AsyncJsonWebsocketConsumer):
+    """Pushes live stock and new-bill batches (see live.py) to a logged-in terminal."""
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        await self.channel_layer.group_add(TERMINALS_GROUP, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(TERMINALS_GROUP, self.channel_name)
+
+    async def terminal_batch(self, event):
+        await self.send_json({
+            'type': 'batch',
+            'stock': event['stock'],
+            'deleted': event['deleted'],
+            'bills': event['bills'],
+            'resync': event['resync'],
+        })
@@ -0,0 +1,131 @@
+import base64
+import json
+import re
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .models import Bill, Customer, ProformaInvoice, Service
+from .pagination import MAX_PK
+
+
+# ==========================
+# CUSTOMERS
+# ==========================
+# Bills, services and proformas keep the customer's name and phone as
+# typed and also link to a Customer keyed by the normalized phone, so
+# "+91 98765-43210", "098765 43210" and "9876543210" are one customer.
+# A customer's history is read per table from the (customer, created_at,
+# id) indexes and merged, and is paged with a keyset cursor over all three.
+
+NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_phone(raw):
+    """Digits only, without the trunk 0 or the CUSTOMER_COUNTRY_CODE prefix; '' if none."""
+    digits = NON_DIGITS.sub('', raw or '').lstrip('0')
+    country = getattr(settings, 'CUSTOMER_COUNTRY_CODE', '91')
+    national = getattr(settings, 'CUSTOMER_PHONE_DIGITS', 10)
+    if country and len(digits) == len(country) + national and digits.startswith(country):
+        digits = digits[len(country):]
+    return digits[:15]
+
+
+def customer_for(phone, name=''):
+    """The Customer for ``phone``, created on first sight and renamed to the latest ``name``."""
+    phone = normalize_phone(phone)
+    if not phone:
+        return None
+    name = (name or '').strip()[:200]
+    customer = Customer.objects.filter(phone=phone).first()
+    if customer is None:
+        try:
+            with transaction.atomic():
+                return Customer.objects.create(phone=phone, name=name)
+        except IntegrityError:
+            # Another terminal billed the same new number first
+            customer = Customer.objects.get(phone=phone)
+    if name and customer.name != name:
+        Customer.objects.filter(pk=customer.pk).update(name=name, updated_at=timezone.now())
+        customer.name = name
+    return customer
+
+
+def suggest(prefix, limit=10):
+    """Customers whose phone starts with ``prefix``, as a range seek on the unique index."""
+    digits = NON_DIGITS.sub('', prefix or '').lstrip('0')
+    if not digits:
+        return []
+    # ':' sorts right after '9', so this is phone__startswith without LIKE,
+    # which SQLite cannot serve from a case-sensitive index
+    return list(
+        Customer.objects.filter(phone__gte=digits, phone__lt=digits + ':')
+        .order_by('phone').values('phone', 'name')[:limit]
+    )
+
+
+# ---------- history ----------
+
+# Ties on created_at are broken by kind, then id; the order is part of the cursor
+HISTORY_KINDS = ('bill', 'service', 'proforma')
+HISTORY_MODELS = {'bill': Bill, 'service': Service, 'proforma': ProformaInvoice}
+
+
+def encode_history_cursor(created_at, kind, pk):
+    payload = json.dumps([created_at.isoformat(), kind, pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_history_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, kind, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        raise ValidationError({'cursor': 'Invalid cursor'})
+    if created_at is None or kind not in HISTORY_KINDS or not 0 < pk <= MAX_PK:
+        raise ValidationError({'cursor': 'Invalid cursor'})
+    return created_at, HISTORY_KINDS.index(kind), pk
+
+
+def history_keys(customer, kind, cursor, limit):
+    """``(created_at, rank, id, kind)`` of the next ``limit`` rows of one kind after ``cursor``."""
+    rank = HISTORY_KINDS.index(kind)
+    qs = HISTORY_MODELS[kind].objects.filter(customer=customer)
+    if cursor:
+        created_at, cursor_rank, pk = cursor
+        if rank < cursor_rank:
+            qs = qs.filter(created_at__lte=created_at)
+        elif rank > cursor_rank:
+            qs = qs.filter(created_at__lt=created_at)
+        else:
+            qs = qs.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=pk)
+            )
+    rows = qs.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit]
+    return [(created_at, rank, pk, kind) for created_at, pk in rows]
+
+
+def history_page(customer, cursor, page_size):
+    """
+    Return ``(entries, next_cursor)``: up to ``page_size`` ``(kind, id)``
+    pairs, newest first across all three tables. Each table gives at most
+    ``page_size + 1`` keys from its index; only the winners are loaded.
+    """
+    position = decode_history_cursor(cursor) if cursor else None
+    keys = []
+    for kind in HISTORY_KINDS:
+        keys.extend(history_keys(customer, kind, position, page_size + 1))
+    keys.sort(reverse=True)
+
+    next_cursor = None
+    if len(keys) > page_size:
+        keys = keys[:page_size]
+        created_at, rank, pk, kind = keys[-1]
+        next_cursor = encode_history_cursor(created_at, kind, pk)
+    return [(kind, pk) for created_at, rank, pk, kind in keys], next_cursor
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# ==========================
+# SQLITE CONNECTION TUNING
+# ==========================
+# busy_timeout makes concurrent writers wait instead of failing with
+# "database is locked", and synchronous FULL keeps the rollback journal
+# safe from power loss. PRAGMAs are per connection, so they are set on
+# every connect. journal_mode is the exception: it is stored in the file,
+# so settings only ask for it with SQLITE_WAL=1. WAL lets readers carry
+# on while a bill is being written, and there synchronous drops to
+# NORMAL, which WAL keeps consistent (a power loss can only lose the
+# last commits).
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
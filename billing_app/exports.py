@@ -0,0 +1,101 @@
+import csv
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import BillItem
+from .streaming import batches, for_server
+
+
+# ==========================
+# STREAMING CSV EXPORTS
+# ==========================
+# Rows come from values_list() querysets read with iterator(), so neither
+# the queryset cache nor model instances grow with the export size. The
+# CSV goes out CHUNK_SIZE rows at a time, one database fetch per piece,
+# and under ASGI each piece is read in the view's thread (for_server in
+# streaming.py). Text cells that a spreadsheet would run as a formula
+# are written with a leading apostrophe.
+
+CHUNK_SIZE = 2000
+
+# Leading characters that make Excel, LibreOffice and Sheets evaluate a cell
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def safe_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_pieces(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for batch in batches(rows, CHUNK_SIZE):
+        yield ''.join(writer.writerow([safe_cell(value) for value in row]) for row in batch)
+
+
+def stream_csv(request, filename, header, rows):
+    response = StreamingHttpResponse(for_server(request, csv_pieces(header, rows)), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def local(dt):
+    return timezone.localtime(dt).strftime('%Y-%m-%d %H:%M:%S') if dt else ''
+
+
+def bill_rows(bills):
+    fields = ('invoice_no', 'created_at', 'customer_name', 'customer_phone',
+              'subtotal', 'gst_amount', 'grand_total', 'created_by__username')
+    for row in bills.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        yield (row[0], local(row[1]), *row[2:])
+
+
+BILL_HEADER = ['Invoice No', 'Date', 'Customer', 'Phone', 'Subtotal', 'GST', 'Grand Total', 'Created By']
+
+
+def bill_item_rows(bills):
+    fields = ('bill__invoice_no', 'bill__created_at', 'bill__customer_name', 'bill__customer_phone',
+              'product__name', 'product__imei', 'quantity', 'price', 'total', 'bill__created_by__username')
+    items = (
+        BillItem.objects.filter(bill__in=bills.values('pk'))
+        .order_by('-bill__created_at', '-bill_id', 'id')
+        .values_list(*fields)
+    )
+    for row in items.iterator(chunk_size=CHUNK_SIZE):
+        yield (row[0], local(row[1]), *row[2:])
+
+
+BILL_ITEM_HEADER = ['Invoice No', 'Date', 'Customer', 'Phone', 'Product', 'IMEI',
+                    'Quantity', 'Price', 'Total', 'Created By']
+
+
+def service_rows(services):
+    fields = ('service_invoice_no', 'service_id', 'created_at', 'customer_name', 'customer_phone',
+              'service_type', 'issue', 'service_price', 'created_by__username')
+    for row in services.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        yield (row[0], row[1], local(row[2]), *row[3:])
+
+
+SERVICE_HEADER = ['Service Invoice No', 'Service ID', 'Date', 'Customer', 'Phone',
+                  'Service Type', 'Issue', 'Price', 'Created By']
+
+
+def proforma_rows(proformas):
+    fields = ('proforma_no', 'issue_date', 'valid_until', 'customer_name', 'customer_phone', 'currency',
+              'subtotal', 'gst_amount', 'discount_amount', 'grand_total', 'related_bill__invoice_no',
+              'created_by__username')
+    yield from proformas.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+PROFORMA_HEADER = ['Proforma No', 'Issue Date', 'Valid Until', 'Customer', 'Phone', 'Currency',
+                   'Subtotal', 'GST', 'Discount', 'Grand Total', 'Invoice No', 'Created By']
@@ -0,0 +1,191 @@
+from functools import cached_property
+
+from rest_framework.exceptions import ValidationError
+
+from .fastpath import ValuesSerializer
+from .models import Bill, BillItem, ProformaItem
+from .serializers import (
+    BillItemSerializer,
+    BillSerializer,
+    ProductSerializer,
+    ProformaInvoiceSerializer,
+    ProformaItemSerializer,
+    ServiceSerializer,
+)
+
+
+# ==========================
+# SPARSE FIELDSETS
+# ==========================
+# List endpoints answer with a compact summary of each row unless asked
+# for more. ?fields=a,b picks top-level fields ("all" for every one) and
+# ?expand=items,... adds nested relations. Only what is asked for is read:
+# top-level fields come from one values() query (see fastpath.py), and
+# each expanded relation costs one more query for the whole page. With
+# ?fields=all and every relation expanded, a row is exactly what the
+# model serializer renders.
+
+MAX_PROJECTIONS = 64
+
+
+class Expansion:
+    """
+    A nested relation rendered on request. ``load`` takes the set of
+    ``key`` values of a page and returns ``{key: rendered value}``;
+    rows whose key is missing get ``default``.
+    """
+
+    def __init__(self, key, load, default=None):
+        self.key = key
+        self.load = load
+        self.default = default
+
+
+class Projection:
+    """One fieldset and expansion choice, with ValuesSerializer's interface."""
+
+    def __init__(self, reader, order, expansions):
+        self.reader = reader
+        self.order = order
+        self.expansions = expansions
+
+    def values(self, qs):
+        return self.reader.values(qs)
+
+    def position(self, row):
+        return self.reader.position(row)
+
+    def serialize(self, rows):
+        if not self.expansions:
+            return self.reader.serialize(rows)
+        rows = list(rows)
+        data = self.reader.serialize(rows)
+        nested = {}
+        for name, expansion in self.expansions.items():
+            at = self.reader.index(expansion.key)
+            keys = [row[at] for row in rows]
+            loaded = expansion.load({key for key in keys if key is not None})
+            nested[name] = [loaded.get(key, expansion.default) for key in keys]
+        return [
+            {name: nested[name][i] if name in nested else row[name] for name in self.order}
+            for i, row in enumerate(data)
+        ]
+
+
+class Fieldset:
+    """The ``?fields=`` / ``?expand=`` choices of one list endpoint."""
+
+    def __init__(self, serializer_class, summary, columns=None, expansions=None):
+        self.serializer_class = serializer_class
+        self.summary = tuple(summary)
+        self.columns = dict(columns or {})
+        self.expansions = dict(expansions or {})
+        self.projections = {}
+
+    @cached_property
+    def field_order(self):
+        """Readable field names in serializer order, expansions it lacks appended."""
+        names = [name for name, field in self.serializer_class().fields.items() if not field.write_only]
+        return names + [name for name in self.expansions if name not in names]
+
+    @cached_property
+    def scalar_fields(self):
+        """Fields a column can render; relations keyed by the row id only expand."""
+        return [
+            name for name in self.field_order
+            if name not in self.expansions or self.expansions[name].key != 'id'
+        ]
+
+    def parse(self, params):
+        """``(fields, expand)`` asked for by the query string, validated."""
+        raw = params.get('fields', '').strip()
+        if not raw:
+            fields = self.summary
+        elif raw == 'all':
+            fields = tuple(self.scalar_fields)
+        else:
+            fields = tuple(name.strip() for name in raw.split(',') if name.strip())
+            unknown = sorted(set(fields) - set(self.scalar_fields))
+            if unknown:
+                raise ValidationError({'fields': f"Unknown field(s): {', '.join(unknown)}"})
+        expand = tuple(name.strip() for name in params.get('expand', '').split(',') if name.strip())
+        unknown = sorted(set(expand) - set(self.expansions))
+        if unknown:
+            raise ValidationError({'expand': f"Cannot expand: {', '.join(unknown)}"})
+        return fields, expand
+
+    def projection(self, fields, expand=()):
+        key = (frozenset(fields), frozenset(expand))
+        if key not in self.projections:
+            if len(self.projections) >= MAX_PROJECTIONS:
+                self.projections.clear()  # clients can ask for any combination
+            expansions = {name: self.expansions[name] for name in expand}
+            scalar = [name for name in fields if name not in expansions]
+            extra = ['created_at', 'id'] + [expansion.key for expansion in expansions.values()]
+            reader = ValuesSerializer(self.serializer_class, self.columns, fields=scalar, extra=extra)
+            order = [name for name in self.field_order if name in scalar or name in expansions]
+            self.projections[key] = Projection(reader, order, expansions)
+        return self.projections[key]
+
+    def for_request(self, request):
+        return self.projection(*self.parse(request.query_params))
+
+    def full(self):
+        """Every top-level field, nothing expanded."""
+        return self.projection(self.scalar_fields)
+
+
+# ---------- expansions ----------
+
+def serialize_grouped(items, serializer_class, key):
+    """``{key value: [rendered item, ...]}``, with one serializer for the whole page."""
+    items = list(items)
+    grouped = {}
+    for item, data in zip(items, serializer_class(items, many=True).data):
+        grouped.setdefault(getattr(item, key), []).append(data)
+    return grouped
+
+
+def bill_items(bill_ids):
+    items = BillItem.objects.filter(bill_id__in=bill_ids).select_related('product').order_by('id')
+    return serialize_grouped(items, BillItemSerializer, 'bill_id')
+
+
+def proforma_items(proforma_ids):
+    items = ProformaItem.objects.filter(proforma_id__in=proforma_ids).select_related('product').order_by('id')
+    return serialize_grouped(items, ProformaItemSerializer, 'proforma_id')
+
+
+def related_bills(bill_ids):
+    bills = list(BillSerializer.setup_eager_loading(Bill.objects.filter(pk__in=bill_ids)))
+    return {bill.pk: data for bill, data in zip(bills, BillSerializer(bills, many=True).data)}
+
+
+PRODUCTS = Fieldset(
+    ProductSerializer,
+    summary=('id', 'name', 'imei', 'selling_price', 'stock', 'category'),
+)
+SERVICES = Fieldset(
+    ServiceSerializer,
+    summary=(
+        'id', 'service_id', 'service_invoice_no', 'customer_name', 'customer_phone',
+        'service_type', 'service_price', 'created_at',
+    ),
+    columns={'created_by': 'created_by__username'},
+)
+BILLS = Fieldset(
+    BillSerializer,
+    summary=('id', 'invoice_no', 'customer_name', 'customer_phone', 'grand_total', 'created_at'),
+    columns={'created_by': 'created_by__username'},
+    expansions={'items': Expansion('id', bill_items, default=[])},
+)
+PROFORMAS = Fieldset(
+    ProformaInvoiceSerializer,
+    summary=('id', 'proforma_no', 'customer_name', 'customer_phone', 'grand_total', 'valid_until', 'created_at'),
+    # Unexpanded, related_bill is the bill's id
+    columns={'created_by': 'created_by__username', 'related_bill': 'related_bill_id'},
+    expansions={
+        'items': Expansion('id', proforma_items, default=[]),
+        'related_bill': Expansion('related_bill_id', related_bills),
+    },
+)
@@ -0,0 +1,86 @@
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+
+# ==========================
+# LIST FILTERS
+# ==========================
+# Query parameters shared by the invoice lists. Every filter maps to an
+# indexed column: dates become a half-open created_at range instead of
+# created_at__date (which wraps the column in a function), names are
+# matched by prefix, phones and invoice numbers exactly.
+
+def parse_date_param(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    try:
+        value = parse_date(raw)
+    except ValueError:  # well formed but impossible, e.g. 2024-13-01
+        value = None
+    if value is None:
+        raise ValidationError({name: 'Use YYYY-MM-DD'})
+    return value
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_by_date_range(qs, params, field='created_at'):
+    """Apply inclusive ``?start=`` / ``?end=`` dates to ``field``."""
+    start = parse_date_param(params, 'start')
+    end = parse_date_param(params, 'end')
+    if start:
+        qs = qs.filter(**{f'{field}__gte': day_start(start)})
+    if end and end < date.max:  # nothing is later than the last representable day
+        qs = qs.filter(**{f'{field}__lt': day_start(end + timedelta(days=1))})
+    return qs
+
+
+def filter_by_customer(qs, params):
+    customer = params.get('customer', '').strip()
+    if customer:
+        qs = qs.filter(customer_name__istartswith=customer)
+    phone = params.get('phone', '').strip()
+    if phone:
+        qs = qs.filter(customer_phone=phone)
+    created_by = params.get('created_by', '').strip()
+    if created_by:
+        if created_by.isdigit():
+            qs = qs.filter(created_by_id=int(created_by))
+        else:
+            qs = qs.filter(created_by__username=created_by)
+    return qs
+
+
+def filter_bills(qs, params):
+    qs = filter_by_date_range(qs, params)
+    qs = filter_by_customer(qs, params)
+    invoice_no = params.get('invoice_no', '').strip()
+    if invoice_no:
+        qs = qs.filter(invoice_no=invoice_no.upper())
+    return qs
+
+
+def filter_services(qs, params):
+    qs = filter_by_date_range(qs, params)
+    qs = filter_by_customer(qs, params)
+    invoice_no = params.get('invoice_no', '').strip()
+    if invoice_no:
+        invoice_no = invoice_no.upper()
+        qs = qs.filter(Q(service_invoice_no=invoice_no) | Q(service_id=invoice_no))
+    return qs
+
+
+def filter_proformas(qs, params):
+    qs = filter_by_date_range(qs, params)
+    qs = filter_by_customer(qs, params)
+    proforma_no = params.get('proforma_no', '').strip()
+    if proforma_no:
+        qs = qs.filter(proforma_no=proforma_no.upper())
+    return qs
@@ -0,0 +1,131 @@
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import to_version
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================
+# LIVE TERMINAL UPDATES
+# ==========================
+# Stock changes and new bills are published to every connected terminal
+# (consumers.TerminalConsumer) once their transaction commits. Changes are
+# buffered per process for LIVE_COALESCE_SECONDS and sent as one batch, so
+# a burst of checkouts becomes a single message. A batch carries each
+# changed product's current stock with its catalog version rather than a
+# raw delta: applying it twice, or after a newer value from another
+# process, is harmless because terminals keep whichever version is newer.
+
+TERMINALS_GROUP = 'terminals'
+
+
+def coalesce_seconds():
+    return getattr(settings, 'LIVE_COALESCE_SECONDS', 0.25)
+
+
+def resync_threshold():
+    return getattr(settings, 'LIVE_RESYNC_THRESHOLD', 1000)
+
+
+def bill_summary(bill):
+    return {
+        'id': bill.id,
+        'invoice_no': bill.invoice_no,
+        'customer_name': bill.customer_name,
+        'grand_total': str(bill.grand_total),
+        'created_by': bill.created_by.username if bill.created_by else None,
+        'created_at': bill.created_at.isoformat(),
+    }
+
+
+class LivePublisher:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.product_ids = set()
+        self.bills = []
+        self.timer = None
+
+    def products_changed(self, ids):
+        with self.lock:
+            self.product_ids.update(ids)
+        self.schedule()
+
+    def bill_created(self, summary):
+        with self.lock:
+            self.bills.append(summary)
+        self.schedule()
+
+    def schedule(self):
+        delay = coalesce_seconds()
+        if delay <= 0:
+            self.flush()
+            return
+        with self.lock:
+            if self.timer is None:
+                self.timer = threading.Timer(delay, self.flush_in_background)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+    def take(self):
+        with self.lock:
+            ids, bills = self.product_ids, self.bills
+            self.product_ids, self.bills, self.timer = set(), [], None
+        return ids, bills
+
+    def build_message(self, ids, bills):
+        message = {'type': 'terminal.batch', 'stock': [], 'deleted': [], 'bills': bills, 'resync': False}
+        if len(ids) > resync_threshold():
+            # e.g. a bulk stock upload: cheaper for terminals to pull a delta
+            message['resync'] = True
+            return message
+        rows = Product.objects.filter(pk__in=ids).values_list('id', 'stock', 'updated_at')
+        message['stock'] = [{'id': pk, 'stock': stock, 'v': to_version(updated)} for pk, stock, updated in rows]
+        message['deleted'] = sorted(ids - {row['id'] for row in message['stock']})
+        return message
+
+    def flush(self):
+        ids, bills = self.take()
+        if not ids and not bills:
+            return
+        try:
+            layer = get_channel_layer()
+            if layer is not None:
+                async_to_sync(layer.group_send)(TERMINALS_GROUP, self.build_message(ids, bills))
+        except Exception:
+            # Live updates are best effort; terminals catch up with a catalog delta
+            logger.exception("Could not publish live terminal update")
+
+
+publisher = LivePublisher()
+
+
+def products_changed_on_commit(ids):
+    """For writes that bypass signals (queryset.update(), bulk_create())."""
+    ids = list(ids)
+    if ids:
+        transaction.on_commit(lambda: publisher.products_changed(ids))
+
+
+def bill_created_on_commit(bill):
+    transaction.on_commit(lambda: publisher.bill_created(bill_summary(bill)))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def publish_product(sender, instance, **kwargs):
+    products_changed_on_commit([instance.pk])
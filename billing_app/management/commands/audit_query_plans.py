@@ -0,0 +1,72 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from billing_app.queryplans import VENDORS, api_view_names, audit, audit_cases
+from billing_app.synthetic import Generator
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the SQL behind every billing_app API view on a throwaway test "
+        "database and report full scans and temporary sorts with suggested indexes. "
+        "Runs on the configured engine: set DATABASE_URL=postgres://... to audit "
+        "PostgreSQL plans. Exits non-zero when anything not allow-listed is found."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bills", type=int, default=2_000, help="synthetic bills to plan against")
+        parser.add_argument("--all", action="store_true", help="also list allow-listed findings")
+        parser.add_argument("--sql", action="store_true", help="print the statement behind each finding")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in VENDORS:
+            raise CommandError(f"Cannot read {connection.vendor} plans; audit on {' or '.join(VENDORS)}")
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            findings, cases = self.run(options["bills"])
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        missing = api_view_names() - {case.view for case in cases}
+        if missing:
+            self.stderr.write(f"No audit case for: {', '.join(sorted(missing))}")
+
+        by_view = defaultdict(list)
+        for finding in findings:
+            if options["all"] or not finding.allowed:
+                by_view[finding.case.view].append(finding)
+        for view in sorted(by_view):
+            self.stdout.write(self.style.MIGRATE_HEADING(view))
+            for finding in by_view[view]:
+                marker = "ok" if finding.allowed else "!!"
+                self.stdout.write(f"  {marker} {finding.case}")
+                self.stdout.write(f"     {finding.kind} on {finding.table}: {finding.detail}")
+                if finding.allowed:
+                    self.stdout.write(f"     allowed: {finding.allowed}")
+                elif finding.suggestion:
+                    self.stdout.write(f"     suggest: {finding.suggestion}")
+                if options["sql"]:
+                    self.stdout.write(f"     {finding.sql}")
+
+        problems = [finding for finding in findings if not finding.allowed]
+        if problems or missing:
+            raise CommandError(f"{len(problems)} unindexed plan(s), {len(missing)} unaudited view(s)")
+        self.stdout.write(self.style.SUCCESS(f"{connection.vendor}: {len(cases)} requests, no unindexed plans"))
+
+    def run(self, bills):
+        Generator(seed=1).run(
+            products=max(50, bills // 20), bills=bills, services=bills // 4,
+            proformas=max(1, bills // 20), returns=bills // 50, units=max(10, bills // 10),
+        )
+        client = Client()
+        client.force_login(User.objects.create_user("plan-audit", is_staff=True))
+        cases = audit_cases()
+        return audit(client, cases), cases
@@ -0,0 +1,70 @@
+import csv
+import io
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from billing_app.models import Product
+from billing_app.views import bulk_adjust_stock, bulk_import_products
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time bulk product import and bulk stock adjustment at 50k rows (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["rows"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def post(self, view, user, body, content_type):
+        request = APIRequestFactory().post("/", body, content_type=content_type)
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = view(request)
+            elapsed = time.perf_counter() - start
+        return response, elapsed, len(ctx.captured_queries)
+
+    def run(self, count):
+        user = User.objects.create_user("bench-bulk", is_staff=True)
+
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["name", "imei", "selling_price", "purchase_price", "gst_percentage", "category", "stock", "agency_name"])
+        for i in range(count):
+            writer.writerow([f"Bench Phone {i}", f"35{i:013d}", "12999.00", "11000.00", "18", f"Cat {i % 25}", "5", f"Agency {i % 40}"])
+        body = out.getvalue().encode()
+
+        response, elapsed, queries = self.post(bulk_import_products, user, body, "text/csv")
+        self.stdout.write(
+            f"import:  {response.data['created']} rows, {response.data['failed']} failed, "
+            f"{elapsed:.2f} s ({count / elapsed:,.0f} rows/s), {queries} queries"
+        )
+
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["imei", "delta"])
+        for i in range(count):
+            writer.writerow([f"35{i:013d}", "3" if i % 2 else "-2"])
+        body = out.getvalue().encode()
+
+        response, elapsed, queries = self.post(bulk_adjust_stock, user, body, "text/csv")
+        self.stdout.write(
+            f"stock:   {response.data['updated']} rows, {response.data['failed']} failed, "
+            f"{elapsed:.2f} s ({count / elapsed:,.0f} rows/s), {queries} queries"
+        )
+        self.stdout.write(f"check:   total stock {sum(Product.objects.values_list('stock', flat=True))}")
@@ -0,0 +1,72 @@
+import json
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from billing_app.models import Product
+from billing_app.views import create_bill
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark create_bill query count and latency for 1-, 20- and 200-line bills (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, nargs="+", default=[1, 20, 200])
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["lines"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, line_counts, repeat):
+        user = User.objects.create_user("bench-checkout", is_staff=True)
+        products = Product.objects.bulk_create([
+            Product(
+                name=f"Bench Phone {i}",
+                selling_price=Decimal("999.00"),
+                purchase_price=Decimal("800.00"),
+                gst_percentage=18,
+                stock=10 ** 6,
+            )
+            for i in range(max(line_counts))
+        ])
+        factory = APIRequestFactory()
+
+        self.stdout.write(f"{'lines':>6} {'queries':>8} {'p50 ms':>8} {'max ms':>8}")
+        for lines in line_counts:
+            payload = {
+                "customer_name": "Bench",
+                "customer_phone": "9000000000",
+                "items": [{"product_id": p.id, "quantity": 1} for p in products[:lines]],
+            }
+            body = json.dumps(payload)
+            timings = []
+            queries = 0
+            for _ in range(repeat):
+                request = factory.post("/api/bills/create/", body, content_type="application/json")
+                force_authenticate(request, user=user)
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    response = create_bill(request)
+                    timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 201:
+                    self.stderr.write(f"create_bill failed: {response.data}")
+                    return
+                queries = len(ctx.captured_queries)
+            self.stdout.write(
+                f"{lines:>6} {queries:>8} {statistics.median(timings):>8.2f} {max(timings):>8.2f}"
+            )
@@ -0,0 +1,90 @@
+import json
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from billing_app.models import Product
+from billing_app.views import create_bill
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent create_bill throughput on a throwaway test database. "
+        "Runs on the configured engine: set DATABASE_URL=postgres://... to benchmark "
+        "PostgreSQL, and --no-pragmas to compare against untuned SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+        parser.add_argument("--bills", type=int, default=50, help="bills per thread")
+        parser.add_argument("--no-pragmas", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["no_pragmas"]:
+            settings.SQLITE_PRAGMAS = {}
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options["threads"], options["bills"])
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, thread_counts, bills_per_thread):
+        user = User.objects.create_user("bench-throughput", is_staff=True)
+        products = Product.objects.bulk_create([
+            Product(
+                name=f"Bench Phone {i}",
+                selling_price=Decimal("999.00"),
+                purchase_price=Decimal("800.00"),
+                stock=10 ** 6,
+            )
+            for i in range(50)
+        ])
+        product_ids = [p.id for p in products]
+        factory = APIRequestFactory()
+
+        self.stdout.write(f"engine: {connection.vendor}, pragmas: {getattr(settings, 'SQLITE_PRAGMAS', {}) or 'off'}")
+        self.stdout.write(f"{'threads':>8} {'bills':>7} {'bills/s':>9} {'failed':>7}")
+        for threads in thread_counts:
+            failures = []
+
+            def terminal(seed):
+                rng = random.Random(seed)
+                try:
+                    for _ in range(bills_per_thread):
+                        body = json.dumps({
+                            "customer_name": "Bench",
+                            "customer_phone": "9000000000",
+                            "items": [{"product_id": pid, "quantity": 1} for pid in rng.sample(product_ids, 3)],
+                        })
+                        request = factory.post("/api/bills/create/", body, content_type="application/json")
+                        force_authenticate(request, user=user)
+                        try:
+                            response = create_bill(request)
+                        except Exception as exc:
+                            failures.append(repr(exc))
+                            continue
+                        if response.status_code != 201:
+                            failures.append(response.status_code)
+                finally:
+                    connection.close()
+
+            workers = [threading.Thread(target=terminal, args=(seed,)) for seed in range(threads)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+
+            total = threads * bills_per_thread
+            self.stdout.write(f"{threads:>8} {total:>7} {(total - len(failures)) / elapsed:>9.1f} {len(failures):>7}")
+            if failures:
+                self.stdout.write(f"         first failure: {failures[0]}")
@@ -0,0 +1,143 @@
+import gzip
+import json
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from billing_app.synthetic import Generator
+
+
+# Loads app.js into a bare context and times its decoders on each body
+NODE_HARNESS = r"""
+const fs = require('fs'), vm = require('vm');
+const [appJs, dir, repeat, ...names] = process.argv.slice(1);
+const ctx = vm.createContext({ document: { addEventListener() {} }, TextDecoder, window: {} });
+vm.runInContext(fs.readFileSync(appJs, 'utf8'), ctx);
+const decode = vm.runInContext(`({
+    json: body => JSON.parse(new TextDecoder().decode(body)),
+    columns: body => fromColumns(JSON.parse(new TextDecoder().decode(body))),
+    msgpack: body => fromColumns(decodeMessagePack(body)),
+})`, ctx);
+const result = {};
+for (const name of names) {
+    const body = new Uint8Array(fs.readFileSync(`${dir}/${name}`));
+    const format = name.split('.').pop();
+    const timings = [];
+    let data;
+    for (let i = 0; i < Number(repeat); i++) {
+        const start = process.hrtime.bigint();
+        data = decode[format](body);
+        timings.push(Number(process.hrtime.bigint() - start) / 1e6);
+    }
+    timings.sort((a, b) => a - b);
+    result[name] = { ms: timings[timings.length >> 1], decoded: JSON.stringify(data) };
+}
+process.stdout.write(JSON.stringify(result));
+"""
+
+FORMATS = {
+    'json': 'application/json',
+    'columns': 'application/vnd.billing.columns+json',
+    'msgpack': 'application/msgpack',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the JSON, columnar JSON and MessagePack renderings of the "
+        "product and bill lists on a throwaway test database: body size "
+        "(raw and gzipped), server time per request, and the time app.js "
+        "takes to decode the body under node, when node is installed. It "
+        "also checks that every format decodes to the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10_000)
+        parser.add_argument("--bills", type=int, default=2_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options["products"], options["bills"], options["repeat"])
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, products, bills, repeat):
+        Generator(seed=1, chunk_size=10_000).run(products=products, bills=bills)
+        client = Client()
+        client.force_login(User.objects.create_user("bench", is_staff=True))
+        scenarios = {
+            'products': ('/api/products/', {'fields': 'all'}),
+            'bills': ('/api/bills/', {'page_size': 500}),
+            'bills+items': ('/api/bills/', {'page_size': 500, 'fields': 'all', 'expand': 'items'}),
+        }
+
+        bodies, server = {}, {}
+        for scenario, (path, params) in scenarios.items():
+            for fmt, media_type in FORMATS.items():
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    response = client.get(path, params, HTTP_ACCEPT=media_type)
+                    body = response.getvalue()  # lists stream: reading the body does the work
+                    timings.append(time.perf_counter() - start)
+                if response.status_code != 200 or not response['Content-Type'].startswith(media_type):
+                    raise RuntimeError(f"{scenario} as {fmt}: HTTP {response.status_code} {response['Content-Type']}")
+                bodies[scenario, fmt] = body
+                server[scenario, fmt] = statistics.median(timings)
+
+        client_ms = self.decode_times(bodies, repeat)
+        self.stdout.write(
+            f"{'list':<12} {'format':<8} {'KiB':>8} {'gzip KiB':>9} {'size':>6} "
+            f"{'server ms':>10} {'decode ms':>10} {'vs json':>8}"
+        )
+        for scenario in scenarios:
+            base = bodies[scenario, 'json']
+            for fmt in FORMATS:
+                body = bodies[scenario, fmt]
+                decode = client_ms.get((scenario, fmt))
+                base_decode = client_ms.get((scenario, 'json'))
+                self.stdout.write(
+                    f"{scenario:<12} {fmt:<8} {len(body) / 1024:>8.1f} "
+                    f"{len(gzip.compress(body)) / 1024:>9.1f} {len(body) / len(base):>5.0%} "
+                    f"{server[scenario, fmt] * 1000:>10.1f} "
+                    + (f"{decode:>10.2f} {base_decode / decode:>7.2f}x" if decode else f"{'-':>10} {'-':>8}")
+                )
+        if not client_ms:
+            self.stdout.write("Decode times need node on PATH; skipped.")
+
+    def decode_times(self, bodies, repeat):
+        """``{(scenario, format): median ms}`` of app.js decoding each body, or ``{}`` without node."""
+        node = shutil.which('node')
+        if node is None:
+            return {}
+        app_js = Path(settings.BASE_DIR) / 'static' / 'js' / 'app.js'
+        with tempfile.TemporaryDirectory() as tmp:
+            names = {}
+            for (scenario, fmt), body in bodies.items():
+                name = f"{scenario.replace('+', '_')}.{fmt}"
+                Path(tmp, name).write_bytes(body)
+                names[name] = (scenario, fmt)
+            output = subprocess.run(
+                [node, '-e', NODE_HARNESS, str(app_js), tmp, str(repeat), *names],
+                check=True, capture_output=True, text=True,
+            ).stdout
+        result = json.loads(output)
+        for name, (scenario, fmt) in names.items():
+            if result[name]['decoded'] != result[f"{scenario.replace('+', '_')}.json"]['decoded']:
+                raise AssertionError(f"{scenario}: {fmt} decodes to different data than JSON")
+        return {names[name]: figures['ms'] for name, figures in result.items()}
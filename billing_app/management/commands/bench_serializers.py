@@ -0,0 +1,99 @@
+import gc
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+
+from billing_app.models import Product, Service
+from billing_app.serializers import ProductSerializer, ServiceSerializer
+from billing_app.synthetic import Generator
+from billing_app.fieldsets import PRODUCTS, SERVICES
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the ModelSerializer and values() fast-path renderings of the "
+        "product and service lists on a throwaway test database. Reports rows "
+        "per second (query, serialize and render to JSON), the peak traced memory "
+        "of building the list, and the memory blocks and KiB the built list "
+        "holds. It also checks that both paths give the same JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options["rows"], options["repeat"])
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, sizes, repeat):
+        generator = Generator(seed=1, chunk_size=10_000)
+        renderer = JSONRenderer()
+        products, services = PRODUCTS.full(), SERVICES.full()
+        paths = {
+            'product': (
+                lambda: Product.objects.order_by('-created_at', '-id'),
+                lambda qs: ProductSerializer(qs, many=True).data,
+                lambda qs: products.serialize(products.values(qs).iterator(chunk_size=2000)),
+            ),
+            'service': (
+                lambda: Service.objects.select_related('created_by').order_by('-created_at', '-id'),
+                lambda qs: ServiceSerializer(qs, many=True).data,
+                lambda qs: services.serialize(services.values(qs).iterator(chunk_size=2000)),
+            ),
+        }
+        self.stdout.write(
+            f"{'list':<8} {'rows':>7} {'path':<10} {'rows/s':>10} {'ms':>8} {'peak KiB':>9} "
+            f"{'held KiB':>9} {'blocks':>9} {'speedup':>8}"
+        )
+        for size in sorted(sizes):
+            generator.run(products=size - Product.objects.count(), services=size - Service.objects.count())
+            for name, (queryset, slow, fast) in paths.items():
+                if renderer.render(slow(queryset())) != renderer.render(fast(queryset())):
+                    raise AssertionError(f"{name}: fast path JSON differs from the serializer's")
+                figures = {}
+                for label, build in (('serializer', slow), ('fast', fast)):
+                    figures[label] = self.measure(lambda: build(queryset()), renderer.render, repeat)
+                for label, (seconds, peak, held, blocks) in figures.items():
+                    speedup = figures['serializer'][0] / seconds
+                    self.stdout.write(
+                        f"{name:<8} {size:>7} {label:<10} {size / seconds:>10.0f} {seconds * 1000:>8.0f} "
+                        f"{peak // 1024:>9} {held // 1024:>9} {blocks:>9} {speedup:>7.1f}x"
+                    )
+
+    def measure(self, build, render, repeat):
+        """
+        Median seconds of build-and-render over ``repeat`` runs, then, from one
+        traced build: peak bytes, and the bytes and blocks the built list holds.
+        """
+        timings = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            render(build())
+            timings.append(time.perf_counter() - start)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            start = tracemalloc.take_snapshot()
+            data = build()
+            gc.collect()
+            held = tracemalloc.take_snapshot().compare_to(start, 'filename')
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        del data
+        size = sum(stat.size_diff for stat in held if stat.size_diff > 0)
+        blocks = sum(stat.count_diff for stat in held if stat.count_diff > 0)
+        return statistics.median(timings), peak, size, blocks
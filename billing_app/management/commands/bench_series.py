@@ -0,0 +1,87 @@
+import json
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from billing_app.models import Bill
+from billing_app.rollups import rebuild_sales_rollup, sales_series
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time /api/reports/series/ against a GROUP BY over Bill at large row counts (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bills", type=int, default=1_000_000)
+        parser.add_argument("--days", type=int, default=365 * 2)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["bills"], options["days"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, count, days, repeat):
+        rng = random.Random(7)
+        now = timezone.now()
+        created_at = Bill._meta.get_field("created_at")
+        created_at.auto_now_add = False  # keep the spread-out timestamps below
+        try:
+            start = time.perf_counter()
+            for offset in range(0, count, 10_000):
+                Bill.objects.bulk_create([
+                    Bill(
+                        invoice_no=f"BENCH-{i:010d}",
+                        customer_name="Bench",
+                        customer_phone="9000000000",
+                        grand_total=Decimal(rng.randint(500, 50_000)),
+                        created_at=now - timedelta(seconds=rng.randint(0, days * 86400)),
+                    )
+                    for i in range(offset, min(offset + 10_000, count))
+                ])
+        finally:
+            created_at.auto_now_add = True
+        self.stdout.write(f"inserted {count} bills in {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        rows = rebuild_sales_rollup()
+        self.stdout.write(f"rollup rebuild: {rows} rows in {time.perf_counter() - start:.1f} s")
+
+        end_day = timezone.localdate()
+        first_day = end_day - timedelta(days=364)
+        self.stdout.write(f"{'series (1 year)':<20} {'p50 ms':>9} {'points':>7} {'json bytes':>11}")
+        for bucket in ("day", "week", "month"):
+            timings = []
+            for _ in range(repeat):
+                t = time.perf_counter()
+                series = sales_series(first_day, end_day, bucket)
+                timings.append((time.perf_counter() - t) * 1000)
+            size = len(json.dumps(series))
+            self.stdout.write(
+                f"{'rollup ' + bucket:<20} {statistics.median(timings):>9.2f} {len(series['periods']):>7} {size:>11}"
+            )
+
+        timings = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            list(
+                Bill.objects.filter(created_at__date__gte=first_day)
+                .annotate(day=TruncDate("created_at")).values("day")
+                .annotate(total=Sum("grand_total")).order_by("day")
+            )
+            timings.append((time.perf_counter() - t) * 1000)
+        self.stdout.write(f"{'bill GROUP BY day':<20} {statistics.median(timings):>9.2f}")
@@ -0,0 +1,71 @@
+import gc
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from billing_app.models import Product
+from billing_app.synthetic import Generator
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the full product list, gzipped, rendered in one piece and "
+        "streamed, on a throwaway test database of growing size. Reports "
+        "the peak traced memory of serving and reading one response, the "
+        "time it takes and the bytes on the wire. Streamed, the peak should "
+        "stay flat as the catalog grows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options["rows"], options["chunk_size"])
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, sizes, chunk_size):
+        generator = Generator(seed=1, chunk_size=10_000)
+        client = Client()
+        client.force_login(User.objects.create_user("bench", is_staff=True))
+        self.stdout.write(f"{'rows':>7} {'mode':<9} {'peak KiB':>9} {'ms':>8} {'wire KiB':>9}")
+        for size in sorted(sizes):
+            generator.run(products=size - Product.objects.count())
+            for mode, setting in (('whole', 0), ('streamed', chunk_size)):
+                with override_settings(BILLING_STREAM_CHUNK_SIZE=setting):
+                    peak, seconds, wire = self.measure(client)
+                self.stdout.write(f"{size:>7} {mode:<9} {peak // 1024:>9} {seconds * 1000:>8.0f} {wire // 1024:>9}")
+
+    def measure(self, client):
+        """Peak traced bytes, seconds and compressed bytes of one request read to the end."""
+        def fetch():
+            response = client.get("/api/products/", {"fields": "all"}, HTTP_ACCEPT_ENCODING="gzip")
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            pieces = response.streaming_content if response.streaming else [response.content]
+            return sum(len(piece) for piece in pieces)
+
+        fetch()  # warm up
+        gc.collect()
+        start = time.perf_counter()
+        wire = fetch()
+        seconds = time.perf_counter() - start
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fetch()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return peak, seconds, wire
@@ -0,0 +1,72 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from billing_app.models import Product
+from billing_app.search import ProductIndex
+
+
+BRANDS = ["Samsung", "Redmi", "Realme", "Vivo", "Oppo", "Apple", "OnePlus", "Nokia", "Motorola", "Poco"]
+MODELS = ["Galaxy", "Note", "Narzo", "Y", "Reno", "iPhone", "Nord", "G", "Edge", "X"]
+COLOURS = ["Black", "Blue", "Green", "White", "Gold", "Silver"]
+QUERIES = ["sa", "red", "galaxy", "note 1", "iphone 14", "blue", "nord ce", "35", "8642", "agency 3"]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare product_suggest via the ORM against the in-memory ProductIndex (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["products"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, count, repeat):
+        rng = random.Random(42)
+        Product.objects.bulk_create(
+            (
+                Product(
+                    name=f"{rng.choice(BRANDS)} {rng.choice(MODELS)} {rng.randint(1, 99)} {rng.choice(COLOURS)}",
+                    imei=str(rng.randrange(10 ** 14, 10 ** 15)),
+                    selling_price=Decimal("9999.00"),
+                    purchase_price=Decimal("8000.00"),
+                    stock=rng.randint(0, 5),
+                    agency_name=f"Agency {rng.randint(1, 40)}",
+                )
+                for _ in range(count)
+            ),
+            batch_size=2000,
+        )
+
+        index = ProductIndex()
+        start = time.perf_counter()
+        index.rebuild()
+        self.stdout.write(f"index build: {(time.perf_counter() - start) * 1000:.0f} ms for {count} products")
+
+        self.stdout.write(f"{'query':<12} {'orm ms':>9} {'index ms':>9}")
+        for q in QUERIES:
+            orm, mem = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(Product.objects.filter(Q(name__icontains=q), stock__gt=0)[:10])
+                orm.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                index.search(q, limit=10)
+                mem.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(f"{q:<12} {statistics.median(orm):>9.3f} {statistics.median(mem):>9.3f}")
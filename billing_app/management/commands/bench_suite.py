@@ -0,0 +1,110 @@
+import json
+import logging
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from billing_app.benchmarks import SCENARIOS, profile, regressions, run_load
+from billing_app.live import publisher
+from billing_app.models import Bill, Product
+from billing_app.search import product_index
+from billing_app.synthetic import Generator
+
+# Regenerate with --save-baseline in the commit that changes a benchmarked endpoint
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'bench_baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the main API endpoints on a throwaway test database filled by the "
+        "synthetic generator, at each --sizes bill count and --concurrency level. "
+        "Reports query counts, p50/p95/p99 latency and peak memory; with --check, "
+        "exits non-zero when any of them regresses against the baseline file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 20_000], help="bill counts")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+        parser.add_argument("--requests", type=int, default=100, help="requests per scenario and level")
+        parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+        parser.add_argument("--save-baseline", action="store_true", help="write the results to --baseline")
+        parser.add_argument("--check", action="store_true", help="fail on regressions against --baseline")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="allowed latency/memory growth")
+
+    def handle(self, *args, **options):
+        baseline_path = Path(options["baseline"])
+        if options["check"] and not baseline_path.exists():
+            raise CommandError(f"No baseline at {baseline_path}; run with --save-baseline first")
+
+        # Slow-request warnings would bury the table; the table has the figures
+        logging.getLogger('billing_app.requests').setLevel(logging.ERROR)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = self.run(options)
+        finally:
+            publisher.take()  # no terminal listens; drop the batch before its tables go
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["save_baseline"]:
+            baseline_path.write_text(json.dumps(results, indent=1, sort_keys=True) + "\n")
+            self.stdout.write(f"baseline written to {baseline_path}")
+        if options["check"]:
+            problems = regressions(json.loads(baseline_path.read_text()), results, options["tolerance"])
+            for problem in problems:
+                self.stderr.write(f"REGRESSION {problem}")
+            if problems:
+                raise CommandError(f"{len(problems)} regression(s) against {baseline_path}")
+            self.stdout.write(self.style.SUCCESS("no regressions"))
+
+    def run(self, options):
+        user = User.objects.create_user("bench-suite", is_staff=True)
+
+        def make_client():
+            client = Client()
+            client.force_login(user)
+            return client
+
+        generator = Generator(seed=1)
+        results = {}
+        self.stdout.write(f"engine: {connection.vendor}")
+        for size in sorted(options["sizes"]):
+            missing = size - Bill.objects.count()
+            generator.run(
+                products=max(200, size // 20) - Product.objects.count(),
+                bills=missing,
+                services=missing // 4,
+                proformas=missing // 20,
+                returns=missing // 50,
+            )
+            # create_bill must never run out of stock
+            Product.objects.update(stock=10 ** 6)
+            product_index.rebuild()
+            product_ids = list(Product.objects.values_list('id', flat=True))
+
+            self.stdout.write(f"\n{size} bills, {len(product_ids)} products")
+            self.stdout.write(
+                f"{'scenario':<16} {'threads':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                f"{'req/s':>8} {'queries':>7} {'peak KiB':>9}"
+            )
+            client = make_client()
+            results[str(size)] = {}
+            for name in options["scenarios"]:
+                entry = profile(name, client, product_ids)
+                entry['latency'] = {}
+                for concurrency in options["concurrency"]:
+                    latency = run_load(name, make_client, product_ids, options["requests"], concurrency)
+                    entry['latency'][str(concurrency)] = latency
+                    self.stdout.write(
+                        f"{name:<16} {concurrency:>7} {latency['p50']:>8.1f} {latency['p95']:>8.1f} "
+                        f"{latency['p99']:>8.1f} {latency['rps']:>8.1f} {entry['queries']:>7} {entry['peak_kib']:>9}"
+                    )
+                results[str(size)][name] = entry
+        return results
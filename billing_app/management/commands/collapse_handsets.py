@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from billing_app.units import collapse_group, collapse_groups
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold catalogs kept as one Product per handset into one Product per "
+        "model with a ProductUnit per IMEI. Products that match on every "
+        "catalog field except IMEI and stock are one model. Bill and proforma "
+        "lines move to the surviving product."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+
+    def handle(self, *args, **options):
+        groups = list(collapse_groups())
+        handsets = sum(group['members'] for group in groups)
+        if options["dry_run"]:
+            self.stdout.write(f"{handsets} handset products would become {len(groups)} catalog rows")
+            return
+        removed = 0
+        for group in groups:
+            removed += collapse_group(group)
+        self.stdout.write(self.style.SUCCESS(
+            f"{handsets} handset products collapsed into {len(groups)} catalog rows ({removed} removed)"
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from billing_app.synthetic import Generator
+
+
+class Command(BaseCommand):
+    help = (
+        "Append synthetic products, handsets, bills, services, proformas and returns to the "
+        "configured database with bulk inserts. Meant for benchmark databases only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=5_000)
+        parser.add_argument("--units", type=int, default=20_000, help="handsets with their own IMEI")
+        parser.add_argument("--bills", type=int, default=100_000)
+        parser.add_argument("--services", type=int, default=None, help="default: bills / 4")
+        parser.add_argument("--proformas", type=int, default=None, help="default: bills / 20")
+        parser.add_argument("--returns", type=int, default=None, help="default: bills / 50")
+        parser.add_argument("--customers", type=int, default=None, help="default: a third of the documents")
+        parser.add_argument("--days", type=int, default=365, help="spread created_at over this many days")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--chunk-size", type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        bills = options["bills"]
+
+        def default(name, divisor):
+            return options[name] if options[name] is not None else bills // divisor
+
+        Generator(
+            seed=options["seed"], days=options["days"], chunk_size=options["chunk_size"], stdout=self.stdout,
+        ).run(
+            products=options["products"],
+            units=options["units"],
+            bills=bills,
+            services=default("services", 4),
+            proformas=default("proformas", 20),
+            returns=default("returns", 50),
+            customers=options["customers"],
+        )
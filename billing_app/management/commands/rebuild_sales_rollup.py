@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from billing_app.rollups import rebuild_sales_rollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the DailySales rollup from the Bill and Service history."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = rebuild_sales_rollup()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily sales rows"))
@@ -0,0 +1,274 @@
+import fcntl
+import json
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Bill, ProformaInvoice, Service
+
+
+# ==========================
+# PROMETHEUS METRICS
+# ==========================
+# Every worker process aggregates in memory (a lock and a few dict
+# increments per event) and writes a snapshot to
+# METRICS_DIR/<pid>-<start>.json at most once per METRICS_FLUSH_SECONDS.
+# The start time keeps a new worker that reuses a pid from overwriting
+# the old worker's totals. /metrics sums the snapshots of all workers, so
+# any worker can answer a scrape. A scrape first folds the counters and
+# histograms of exited workers into aggregate.json and deletes their
+# snapshots, so totals do not drop when gunicorn recycles a worker and
+# the directory does not grow; their gauges are dropped. Clear
+# METRICS_DIR when deploying to start counting from zero.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HELP = {
+    'billing_request_duration_seconds': ('histogram', 'Request latency by view.'),
+    'billing_request_queries_total': ('counter', 'SQL queries run by view.'),
+    'billing_bills_created_total': ('counter', 'Bills created.'),
+    'billing_services_created_total': ('counter', 'Services created.'),
+    'billing_returns_total': ('counter', 'Returns processed.'),
+    'billing_proformas_created_total': ('counter', 'Proforma invoices created.'),
+    'billing_stock_conflicts_total': ('counter', 'Checkouts rejected for insufficient stock.'),
+    'billing_db_connections_created_total': ('counter', 'Database connections opened.'),
+    'billing_db_connections_open': ('gauge', 'Database connections currently open.'),
+    'billing_process_resident_memory_bytes': ('gauge', 'Resident memory of each worker process.'),
+}
+
+
+def metrics_dir():
+    return Path(getattr(settings, 'METRICS_DIR', Path('/tmp') / 'billing_metrics'))
+
+
+def labels(**values):
+    return ','.join(f'{key}="{str(value)}"' for key, value in sorted(values.items()))
+
+
+def resident_memory():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Registry:
+    def __init__(self):
+        self.counters = {}    # "name\tlabels" -> value
+        self.histograms = {}  # "name\tlabels" -> [bucket counts..., +Inf count, sum]
+        self.last_flush = 0.0
+        self.connections = weakref.WeakSet()
+        self.started_now()
+
+    def started_now(self):
+        """Name this process's snapshot; run again in a forked child, which starts from zero."""
+        self.lock = threading.Lock()
+        self.pid, self.started = os.getpid(), time.time_ns()
+        self.counters.clear()
+        self.histograms.clear()
+
+    def inc(self, name, amount=1, **label_values):
+        key = f"{name}\t{labels(**label_values)}"
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self.maybe_flush()
+
+    def observe(self, name, value, **label_values):
+        key = f"{name}\t{labels(**label_values)}"
+        with self.lock:
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            series[bisect_left(LATENCY_BUCKETS, value)] += 1
+            series[-1] += value
+        self.maybe_flush()
+
+    def gauges(self):
+        open_connections = sum(1 for wrapper in list(self.connections) if wrapper.connection is not None)
+        return {
+            'billing_db_connections_open\t': open_connections,
+            f'billing_process_resident_memory_bytes\t{labels(pid=os.getpid())}': resident_memory(),
+        }
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= getattr(settings, 'METRICS_FLUSH_SECONDS', 1):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            self.last_flush = time.monotonic()
+            snapshot = {
+                'pid': self.pid,
+                'counters': dict(self.counters),
+                'histograms': {key: list(series) for key, series in self.histograms.items()},
+            }
+            name = f'{self.pid}-{self.started}.json'
+        snapshot['gauges'] = self.gauges()
+        directory = metrics_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / name
+        tmp = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        tmp.write_text(json.dumps(snapshot))
+        os.replace(tmp, path)
+
+
+registry = Registry()
+# The parent's counts are in the parent's snapshot
+os.register_at_fork(after_in_child=registry.started_now)
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+AGGREGATE = 'aggregate.json'
+
+
+def add(counters, histograms, snapshot):
+    for key, value in snapshot['counters'].items():
+        counters[key] = counters.get(key, 0) + value
+    for key, series in snapshot['histograms'].items():
+        total = histograms.setdefault(key, [0] * len(series))
+        for i, value in enumerate(series):
+            total[i] += value
+
+
+def read(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None  # missing, or replaced mid-read; the next scrape gets it
+
+
+def write(path, data):
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def snapshots(directory):
+    """``[(path, pid, started)]`` of the worker snapshots in ``directory``."""
+    found = []
+    for path in directory.glob('*.json'):
+        pid, _, started = path.stem.partition('-')
+        if pid.isdigit():
+            found.append((path, int(pid), int(started) if started.isdigit() else 0))
+    return found
+
+
+def retire(directory):
+    """
+    Fold the snapshots of exited workers into the aggregate and delete
+    them. A worker is gone when its pid is, or when a later worker has
+    taken its pid. Called with the directory lock held.
+    """
+    found = snapshots(directory)
+    newest = {}
+    for path, pid, started in found:
+        newest[pid] = max(newest.get(pid, started), started)
+    dead = [path for path, pid, started in found if started != newest[pid] or not alive(pid)]
+    if not dead:
+        return
+    aggregate = read(directory / AGGREGATE) or {'counters': {}, 'histograms': {}, 'folded': []}
+    # Left over only if the last fold stopped before deleting them
+    already = set(aggregate['folded'])
+    for path in dead:
+        snapshot = None if path.name in already else read(path)
+        if snapshot is not None:
+            add(aggregate['counters'], aggregate['histograms'], snapshot)
+    aggregate['folded'] = [path.name for path in dead]
+    write(directory / AGGREGATE, aggregate)
+    for path in dead:
+        path.unlink(missing_ok=True)
+
+
+def collect():
+    """Sum every worker's snapshot and the aggregate into ``(counters, histograms, gauges)``."""
+    registry.flush()
+    directory = metrics_dir()
+    counters, histograms, gauges = {}, {}, {}
+    with open(directory / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # one scrape folds at a time
+        retire(directory)
+        aggregate = read(directory / AGGREGATE)
+        if aggregate is not None:
+            add(counters, histograms, aggregate)
+        for path, pid, started in snapshots(directory):
+            snapshot = read(path)
+            if snapshot is None:
+                continue
+            add(counters, histograms, snapshot)
+            for key, value in snapshot['gauges'].items():
+                gauges[key] = gauges.get(key, 0) + value
+    return counters, histograms, gauges
+
+
+def render():
+    """The Prometheus text exposition format (version 0.0.4)."""
+    counters, histograms, gauges = collect()
+    by_name = {}
+    for series in (counters, histograms, gauges):
+        for key, value in series.items():
+            name, label_text = key.split('\t')
+            by_name.setdefault(name, []).append((label_text, value))
+
+    def sample(name, label_text, value):
+        return f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}'
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = HELP.get(name, ('untyped', ''))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for label_text, value in sorted(by_name[name]):
+            if kind == 'histogram':
+                sep = ',' if label_text else ''
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label_text}{sep}le="{bound}"}} {cumulative}')
+                lines.append(sample(f'{name}_sum', label_text, value[-1]))
+                lines.append(sample(f'{name}_count', label_text, cumulative))
+            else:
+                lines.append(sample(name, label_text, value))
+    return '\n'.join(lines) + '\n'
+
+
+def count_on_commit(name, amount=1):
+    transaction.on_commit(lambda: registry.inc(name, amount))
+
+
+@receiver(post_save, sender=Bill)
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=ProformaInvoice)
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        name = {
+            Bill: 'billing_bills_created_total',
+            Service: 'billing_services_created_total',
+            ProformaInvoice: 'billing_proformas_created_total',
+        }[sender]
+        count_on_commit(name)
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    registry.connections.add(connection)
+    registry.inc('billing_db_connections_created_total')
@@ -1,7 +1,27 @@
 # billing_app/middleware.py – FINAL SAFE VERSION
 
+import logging
+import re
+import time
+import zlib
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+from . import metrics
+
+logger = logging.getLogger('billing_app.requests')
+
 
 class LoginRequiredMiddleware:
     def __init__(self, get_response):
@@ -37,4 +57,192 @@ class LoginRequiredMiddleware:
             messages.error(request, "This page is for administrators only.")
             return redirect('billing')
 
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
+
+
+# ==========================
+# REQUEST INSTRUMENTATION
+# ==========================
+class QueryStats:
+    """Counts and times every query run through a connection's execute wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.by_sql = Counter()
+        self.seconds_by_sql = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            # sql is the parameterised template, so an N+1 loop shows up as
+            # one statement repeated once per row
+            self.by_sql[sql] += 1
+            self.seconds_by_sql[sql] += elapsed
+
+    def duplicates(self, limit=3):
+        return [(sql, n, self.seconds_by_sql[sql]) for sql, n in self.by_sql.most_common(limit) if n > 1]
+
+
+class RequestTimingMiddleware:
+    """
+    Per request: view name, wall time, SQL query count and SQL time, sent
+    back as a Server-Timing header. Requests slower than REQUEST_SLOW_MS,
+    or repeating one statement REQUEST_DUPLICATE_QUERY_WARN times, are
+    logged with their most repeated queries. The cost is two clock reads
+    and a dict increment per query. Queries run while a streaming body is
+    iterated happen after the response leaves, so they are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(stats))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else request.path_info
+        request.timing = {'view': view, 'seconds': elapsed, 'queries': stats.count, 'db_seconds': stats.seconds}
+        # Unresolved paths share one label so scanners cannot blow up cardinality
+        metric_view = view if match else 'unmatched'
+        metrics.registry.observe('billing_request_duration_seconds', elapsed, view=metric_view)
+        if stats.count:
+            metrics.registry.inc('billing_request_queries_total', stats.count, view=metric_view)
+
+        if getattr(settings, 'REQUEST_SERVER_TIMING', True):
+            response['Server-Timing'] = (
+                f'app;dur={elapsed * 1000:.1f}, '
+                f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"'
+            )
+
+        repeated = stats.duplicates()
+        slow = elapsed * 1000 >= getattr(settings, 'REQUEST_SLOW_MS', 500)
+        n_plus_one = repeated and repeated[0][1] >= getattr(settings, 'REQUEST_DUPLICATE_QUERY_WARN', 20)
+        if slow or n_plus_one:
+            logger.warning(
+                "%s %s %s (%s): %.1f ms, %d queries in %.1f ms%s",
+                'Slow request' if slow else 'Repeated queries in',
+                request.method, request.path_info, view, elapsed * 1000,
+                stats.count, stats.seconds * 1000,
+                ''.join(f"\n  {n}x {seconds * 1000:.1f} ms  {sql[:300]}" for sql, n, seconds in repeated),
+            )
+        return response
+
+
+# ==========================
+# RESPONSE COMPRESSION
+# ==========================
+# API responses are compressed with brotli when the client accepts it and
+# the brotli package is installed, else with gzip. Streamed bodies (list
+# responses, CSV exports) are compressed piece by piece, with a sync
+# flush after each piece, so memory stays flat and the client can start
+# parsing early. Pages are left alone: they carry the CSRF token, which
+# compression would expose to BREACH-style guessing. API responses do
+# not. Static files are precompressed by whitenoise.
+
+COMPRESSED_PATHS = ('/api/',)
+MIN_COMPRESS_BYTES = 200
+BROTLI_QUALITY = 5  # 11, the default, costs far too much CPU per request
+ACCEPT_ENCODING = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+
+class GzipStream:
+    def __init__(self):
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip framing
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+ENCODERS = {'gzip': GzipStream, **({'br': BrotliStream} if brotli is not None else {})}
+
+
+def choose_encoding(header):
+    """The best of ENCODERS that an Accept-Encoding header allows, or ``None``."""
+    weights = {}
+    for part in header.split(','):
+        match = ACCEPT_ENCODING.match(part)
+        if match:
+            try:
+                weights[match[1].lower()] = float(match[2]) if match[2] else 1.0
+            except ValueError:
+                continue
+    for coding in ('br', 'gzip'):
+        if coding in ENCODERS and weights.get(coding, weights.get('*', 0)) > 0:
+            return coding
+    return None
+
+
+def compress_pieces(pieces, stream):
+    for piece in pieces:
+        if piece:
+            yield stream.compress(piece)
+    yield stream.finish()
+
+
+async def compress_pieces_async(pieces, stream):
+    async for piece in pieces:
+        if piece:
+            yield stream.compress(piece)
+    yield stream.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path_info.startswith(COMPRESSED_PATHS) or response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < MIN_COMPRESS_BYTES:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        stream = ENCODERS[coding]()
+        if response.streaming:
+            compress = compress_pieces_async if response.is_async else compress_pieces
+            response.streaming_content = compress(response.streaming_content, stream)
+            del response.headers['Content-Length']
+        else:
+            body = stream.compress(response.content) + stream.finish()
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response.headers['Content-Length'] = str(len(body))
+
+        # The encoded body is a different representation (RFC 9110 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_sales(apps, schema_editor):
+    Bill = apps.get_model('billing_app', 'Bill')
+    Service = apps.get_model('billing_app', 'Service')
+    DailySales = apps.get_model('billing_app', 'DailySales')
+
+    rows = {}
+    bills = (
+        Bill.objects.annotate(day=TruncDate('created_at')).values('day', 'created_by')
+        .annotate(count=Count('id'), total=Sum('grand_total'), gst=Sum('gst_amount')).order_by()
+    )
+    for group in bills:
+        rows[group['day'], group['created_by']] = DailySales(
+            date=group['day'], user_id=group['created_by'],
+            bill_count=group['count'], bill_total=group['total'] or 0, gst_total=group['gst'] or 0,
+        )
+    services = (
+        Service.objects.annotate(day=TruncDate('created_at')).values('day', 'created_by')
+        .annotate(count=Count('id'), total=Sum('service_price')).order_by()
+    )
+    for group in services:
+        key = (group['day'], group['created_by'])
+        entry = rows.setdefault(key, DailySales(date=key[0], user_id=key[1]))
+        entry.service_count = group['count']
+        entry.service_total = group['total'] or 0
+    DailySales.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('billing_app', '0004_product_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bill_count', models.PositiveIntegerField(default=0)),
+                ('bill_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('gst_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('service_count', models.PositiveIntegerField(default=0)),
+                ('service_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('return_count', models.PositiveIntegerField(default=0)),
+                ('return_quantity', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailysales',
+            constraint=models.UniqueConstraint(fields=('date', 'user'), name='daily_sales_date_user'),
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_app', '0007_product_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='client_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+# istartswith / iexact compile to LIKE on SQLite and to UPPER(col) LIKE /
+# = UPPER(%s) on PostgreSQL; neither can use a plain index on the column,
+# and Meta.indexes cannot express an index that serves both.
+CASE_INSENSITIVE_INDEXES = [
+    ('bill_customer_ci_idx', 'billing_app_bill', 'customer_name'),
+    ('service_customer_ci_idx', 'billing_app_service', 'customer_name'),
+    ('proforma_customer_ci_idx', 'billing_app_proformainvoice', 'customer_name'),
+    ('product_name_ci_idx', 'billing_app_product', 'name'),
+]
+
+
+def create_case_insensitive_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    quote = schema_editor.quote_name
+    for name, table, column in CASE_INSENSITIVE_INDEXES:
+        if vendor == 'sqlite':
+            expression = f'{quote(column)} COLLATE NOCASE'
+        elif vendor == 'postgresql':
+            expression = f'(UPPER({quote(column)}::text)) text_pattern_ops'
+        else:
+            continue
+        schema_editor.execute(f'CREATE INDEX {quote(name)} ON {quote(table)} ({expression})')
+
+
+def drop_case_insensitive_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        for name, table, column in CASE_INSENSITIVE_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(name)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_app', '0008_bill_client_key'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bill',
+            name='bill_phone_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='bill',
+            name='bill_customer_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='service',
+            name='service_phone_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='service',
+            name='service_customer_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['customer_phone', '-created_at', '-id'], name='bill_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='bill_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['imei'], name='product_imei_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proformainvoice',
+            index=models.Index(fields=['customer_phone', '-created_at', '-id'], name='proforma_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proformainvoice',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='proforma_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['customer_phone', '-created_at', '-id'], name='service_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='service_user_idx'),
+        ),
+        migrations.RunPython(create_case_insensitive_indexes, drop_case_insensitive_indexes),
+    ]
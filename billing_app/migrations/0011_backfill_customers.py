@@ -0,0 +1,75 @@
+import re
+
+from django.db import migrations
+
+BATCH = 2000
+
+
+def normalize_phone(raw):
+    # A copy of customers.normalize_phone with the default settings, frozen
+    # here so later changes to the app code cannot change this migration
+    digits = re.sub(r'\D', '', raw or '').lstrip('0')
+    if len(digits) == 12 and digits.startswith('91'):
+        digits = digits[2:]
+    return digits[:15]
+
+
+def backfill(apps, schema_editor):
+    Customer = apps.get_model('billing_app', 'Customer')
+    documents = [
+        apps.get_model('billing_app', name)
+        for name in ('Bill', 'Service', 'ProformaInvoice')
+    ]
+
+    # The newest non-blank name for each number across all three tables,
+    # which are read one after another: keep (created_at, name) per number
+    latest = {}
+    for model in documents:
+        rows = model.objects.order_by('created_at', 'id').values_list(
+            'customer_phone', 'customer_name', 'created_at',
+        )
+        for phone, name, created_at in rows.iterator(chunk_size=BATCH):
+            phone = normalize_phone(phone)
+            if not phone:
+                continue
+            name = (name or '').strip()[:200]
+            seen = latest.get(phone)
+            if seen is None or (name and (not seen[1] or created_at >= seen[0])):
+                latest[phone] = (created_at, name)
+    names = {phone: name for phone, (created_at, name) in latest.items()}
+
+    existing = set(Customer.objects.values_list('phone', flat=True))
+    Customer.objects.bulk_create(
+        [Customer(phone=phone, name=name) for phone, name in names.items() if phone not in existing],
+        batch_size=BATCH,
+    )
+    ids = dict(Customer.objects.values_list('phone', 'id'))
+
+    # Each batch of ids is read in full before it is written, walking the
+    # primary key, so no cursor is open on a table while it is updated
+    for model in documents:
+        last = 0
+        while True:
+            rows = list(
+                model.objects.filter(customer__isnull=True, pk__gt=last)
+                .order_by('pk').values_list('id', 'customer_phone')[:BATCH]
+            )
+            if not rows:
+                break
+            last = rows[-1][0]
+            batch = [
+                model(id=pk, customer_id=ids[normalize_phone(phone)])
+                for pk, phone in rows if normalize_phone(phone) in ids
+            ]
+            model.objects.bulk_update(batch, ['customer'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_app', '0010_customer'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
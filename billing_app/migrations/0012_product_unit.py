@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_app', '0011_backfill_customers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductUnit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('imei', models.CharField(max_length=50, unique=True)),
+                ('status', models.CharField(choices=[('in_stock', 'In stock'), ('sold', 'Sold')], default='in_stock', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sold_at', models.DateTimeField(blank=True, null=True)),
+                ('bill_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='units', to='billing_app.billitem')),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='units', to='billing_app.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'status'], name='product_unit_status_idx')],
+            },
+        ),
+    ]
@@ -1,7 +1,24 @@
 from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
-import uuid
+
+
+# ==========================
+# DOCUMENT NUMBER SEQUENCES
+# ==========================
+class InvoiceSequence(models.Model):
+    """Next free number per prefix and financial year (see numbering.py)."""
+    prefix = models.CharField(max_length=10)
+    financial_year = models.PositiveIntegerField()
+    next_value = models.PositiveBigIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['prefix', 'financial_year'], name='invoice_sequence_prefix_year'),
+        ]
+
+    def __str__(self):
+        return f"{self.prefix}-{self.financial_year}: {self.next_value}"
 
 
 # ==========================
@@ -30,10 +47,84 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_created_idx'),
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+            models.Index(fields=['imei'], name='product_imei_idx'),
+            # plus product_name_ci_idx for name__iexact (migration 0009)
+        ]
+
     def __str__(self):
         return f"{self.name} (Stock: {self.stock})"
 
 
+class ProductTombstone(models.Model):
+    """A deleted product, kept so catalog delta syncs can drop it (see catalog.py)."""
+    product_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='product_tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Product {self.product_id} deleted {self.deleted_at}"
+
+
+# ==========================
+# PRODUCT UNITS (SERIAL NUMBERS)
+# ==========================
+class ProductUnit(models.Model):
+    """
+    One handset of a product, identified by its IMEI (see units.py). The
+    catalog holds one Product per model; Product.stock still counts the
+    units on hand, and checkout marks the units it sells.
+    """
+    IN_STOCK = 'in_stock'
+    SOLD = 'sold'
+    STATUS_CHOICES = [(IN_STOCK, 'In stock'), (SOLD, 'Sold')]
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='units',
+        db_index=False,  # covered by product_unit_status_idx
+    )
+    imei = models.CharField(max_length=50, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=IN_STOCK)
+    bill_item = models.ForeignKey(
+        'BillItem', on_delete=models.SET_NULL, null=True, blank=True, related_name='units',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    sold_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'status'], name='product_unit_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.imei} ({self.get_status_display()})"
+
+
+# ==========================
+# CUSTOMER
+# ==========================
+class Customer(models.Model):
+    """
+    One row per normalized phone number (customers.normalize_phone).
+    Documents keep the name and phone as typed, for printing, and link
+    here so a customer's history is an indexed lookup per table.
+    """
+    phone = models.CharField(max_length=15, unique=True)
+    name = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name or '-'} ({self.phone})"
+
+
 # ==========================
 # BILL (INVOICE)
 # ==========================
@@ -45,11 +136,29 @@ class Bill(models.Model):
     gst_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     grand_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='bills')
+    customer = models.ForeignKey(
+        Customer, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        db_index=False, related_name='bills',  # covered by the history index
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Idempotency key generated by the terminal, so a retried or replayed
+    # offline checkout can never bill (and deduct stock) twice
+    client_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='bill_created_idx'),
+            models.Index(fields=['customer_phone', '-created_at', '-id'], name='bill_phone_idx'),
+            models.Index(fields=['created_by', '-created_at', '-id'], name='bill_user_idx'),
+            models.Index(fields=['customer', '-created_at', '-id'], name='bill_customer_history_idx'),
+            # customer_name__istartswith uses bill_customer_ci_idx, a
+            # backend-specific case-insensitive index (migration 0009)
+        ]
 
     def save(self, *args, **kwargs):
+        from .numbering import next_number
         if not self.invoice_no:
-            self.invoice_no = f"INV-{uuid.uuid4().hex[:8].upper()}"
+            self.invoice_no = next_number("INV")
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -95,13 +204,27 @@ class Service(models.Model):
     service_price = models.DecimalField(max_digits=12, decimal_places=2)
     issue = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='services')
+    customer = models.ForeignKey(
+        Customer, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        db_index=False, related_name='services',  # covered by the history index
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='service_created_idx'),
+            models.Index(fields=['customer_phone', '-created_at', '-id'], name='service_phone_idx'),
+            models.Index(fields=['created_by', '-created_at', '-id'], name='service_user_idx'),
+            models.Index(fields=['customer', '-created_at', '-id'], name='service_customer_history_idx'),
+            # plus service_customer_ci_idx (migration 0009)
+        ]
+
     def save(self, *args, **kwargs):
+        from .numbering import next_number
         if not self.service_id:
-            self.service_id = f"SVC-{uuid.uuid4().hex[:8].upper()}"
+            self.service_id = next_number("SVC")
         if not self.service_invoice_no:
-            self.service_invoice_no = f"SIN-{uuid.uuid4().hex[:8].upper()}"
+            self.service_invoice_no = next_number("SIN")
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -147,11 +270,25 @@ class ProformaInvoice(models.Model):
 
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     related_bill = models.ForeignKey(Bill, on_delete=models.SET_NULL, null=True, blank=True)
+    customer = models.ForeignKey(
+        Customer, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        db_index=False, related_name='proformas',  # covered by the history index
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='proforma_created_idx'),
+            models.Index(fields=['customer_phone', '-created_at', '-id'], name='proforma_phone_idx'),
+            models.Index(fields=['created_by', '-created_at', '-id'], name='proforma_user_idx'),
+            models.Index(fields=['customer', '-created_at', '-id'], name='proforma_customer_history_idx'),
+            # plus proforma_customer_ci_idx (migration 0009)
+        ]
+
     def save(self, *args, **kwargs):
+        from .numbering import next_number
         if not self.proforma_no:
-            self.proforma_no = f"PF-{uuid.uuid4().hex[:8].upper()}"
+            self.proforma_no = next_number("PF")
         super().save(*args, **kwargs)
 
 
@@ -180,3 +317,31 @@ class ReturnInvoice(models.Model):
 
     def __str__(self):
         return f"Return - {self.invoice.invoice_no}"
+
+
+# ==========================
+# DAILY SALES ROLLUP
+# ==========================
+class DailySales(models.Model):
+    """
+    Per-day, per-user sales totals, maintained in the same transaction as
+    the bill, service or return that changes them (see rollups.py).
+    Rebuild with ``manage.py rebuild_sales_rollup``.
+    """
+    date = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    bill_count = models.PositiveIntegerField(default=0)
+    bill_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    gst_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    service_count = models.PositiveIntegerField(default=0)
+    service_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    return_count = models.PositiveIntegerField(default=0)
+    return_quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'user'], name='daily_sales_date_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.user or 'unknown'}"
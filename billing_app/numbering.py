@@ -0,0 +1,106 @@
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import InvoiceSequence
+
+
+# ==========================
+# SEQUENTIAL DOCUMENT NUMBERS
+# ==========================
+# Numbers look like INV-2026-000123: prefix, financial year, sequence.
+#
+# With INVOICE_NUMBER_BLOCK_SIZE = 1 (and always on SQLite, which only has
+# one writer anyway) the counter is bumped inside the caller's transaction,
+# so a rolled-back bill gives its number back and the series is gap-free.
+#
+# With a larger block size each worker process reserves a block of numbers
+# on a separate autocommit connection and hands them out from memory. The
+# counter row is then locked for one tiny transaction per block instead of
+# for the whole checkout, at the cost of gaps when a bill fails or a worker
+# exits with numbers left in its block. Numbers are still unique and
+# increase within each worker.
+
+def financial_year(day=None):
+    """Starting calendar year of the financial year containing ``day``."""
+    day = day or timezone.localdate()
+    start_month = getattr(settings, 'FINANCIAL_YEAR_START_MONTH', 4)
+    return day.year if day.month >= start_month else day.year - 1
+
+
+def format_number(prefix, year, value):
+    return f"{prefix}-{year}-{value:06d}"
+
+
+class NumberAllocator:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.blocks = {}  # (prefix, year) -> [next, end)
+
+    def block_size(self):
+        if connection.vendor == 'sqlite':
+            return 1
+        return max(1, getattr(settings, 'INVOICE_NUMBER_BLOCK_SIZE', 1))
+
+    def next(self, prefix):
+        year = financial_year()
+        size = self.block_size()
+        if size == 1:
+            return format_number(prefix, year, reserve_in_transaction(prefix, year))
+
+        key = (prefix, year)
+        with self.lock:
+            block = self.blocks.get(key)
+            if block is None or block[0] >= block[1]:
+                start = reserve_on_own_connection(prefix, year, size)
+                block = self.blocks[key] = [start, start + size]
+            value = block[0]
+            block[0] += 1
+        return format_number(prefix, year, value)
+
+
+def reserve_in_transaction(prefix, year, size=1):
+    """Bump the counter in the current transaction; returns the first reserved value."""
+    counter = InvoiceSequence.objects.filter(prefix=prefix, financial_year=year)
+    with transaction.atomic():
+        # UPDATE first so the row (or, on SQLite, database) write lock is
+        # taken up front; a read-then-write would fail to upgrade under load
+        if not counter.update(next_value=F('next_value') + size):
+            try:
+                with transaction.atomic():
+                    InvoiceSequence.objects.create(prefix=prefix, financial_year=year, next_value=1 + size)
+                return 1
+            except IntegrityError:
+                counter.update(next_value=F('next_value') + size)
+        return counter.values_list('next_value', flat=True).get() - size
+
+
+def reserve_on_own_connection(prefix, year, size):
+    """Reserve ``size`` numbers in a transaction that commits independently of the caller's."""
+    own = connections.create_connection(DEFAULT_DB_ALIAS)
+    try:
+        table = own.ops.quote_name(InvoiceSequence._meta.db_table)
+        with own.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (prefix, financial_year, next_value) VALUES (%s, %s, 1) "
+                f"ON CONFLICT (prefix, financial_year) DO NOTHING",
+                [prefix, year],
+            )
+            cursor.execute(
+                f"UPDATE {table} SET next_value = next_value + %s "
+                f"WHERE prefix = %s AND financial_year = %s RETURNING next_value",
+                [size, prefix, year],
+            )
+            return cursor.fetchone()[0] - size
+    finally:
+        own.close()
+
+
+allocator = NumberAllocator()
+
+
+def next_number(prefix):
+    return allocator.next(prefix)
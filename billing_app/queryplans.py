@@ -0,0 +1,362 @@
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import connection
+from django.urls import get_resolver
+from django.utils import timezone
+
+from .models import Bill, Product, ProductUnit, ProformaInvoice, Service
+from .customers import encode_history_cursor
+from .pagination import encode_cursor
+
+
+# ==========================
+# QUERY PLAN AUDIT
+# ==========================
+# Sends a request to every billing_app API view (once per filter it
+# supports), records the SQL it runs and asks the database how it would
+# execute each statement: EXPLAIN QUERY PLAN on SQLite, EXPLAIN (FORMAT
+# JSON) on PostgreSQL with sequential scans disabled, so a scan in the
+# plan means no usable index exists rather than that the table is small.
+# Full scans, unbounded index walks and temporary sorts on billing_app
+# tables are reported with a suggested index, unless ALLOWED lists them.
+
+SCAN, INDEX_WALK, SORT = 'full scan', 'full index scan', 'temp sort'
+
+# (view, table, kind, text the SQL must contain, why it is fine)
+ALLOWED = [
+    ('category_list', 'billing_app_category', SCAN, '', 'returns every category'),
+    ('product_list', 'billing_app_product', INDEX_WALK, '', 'returns the whole catalog'),
+    ('product_suggest', 'billing_app_product', SCAN, '', 'periodic rebuild of the in-memory index'),
+    ('bill_export', 'billing_app_bill', INDEX_WALK, '', 'exports every matching bill in list order'),
+    ('service_export', 'billing_app_service', INDEX_WALK, '', 'exports every matching service in list order'),
+    ('proforma_export', 'billing_app_proformainvoice', INDEX_WALK, '', 'exports every matching proforma in list order'),
+    ('bill_export', 'billing_app_bill', SORT, 'FROM "billing_app_billitem"', 'orders every exported item by its bill'),
+    ('bill_list', 'billing_app_billitem', SORT, '', 'sorts the items of one page'),
+    ('proforma_list', 'billing_app_billitem', SORT, '', 'sorts the items of one page'),
+    ('proforma_list', 'billing_app_proformaitem', SORT, '', 'sorts the items of one page'),
+    ('customer_history', 'billing_app_billitem', SORT, '', 'sorts the items of one page'),
+    ('customer_history', 'billing_app_proformaitem', SORT, '', 'sorts the items of one page'),
+    ('bill_list', 'billing_app_bill', SORT, ' LIKE ', 'sorts the bills matching a customer name prefix'),
+    ('service_list', 'billing_app_service', SORT, ' LIKE ', 'sorts the services matching a customer name prefix'),
+    ('proforma_list', 'billing_app_proformainvoice', SORT, ' LIKE ', 'sorts the proformas matching a customer name prefix'),
+    ('bill_export', 'billing_app_bill', SORT, ' LIKE ', 'sorts the bills matching a customer name prefix'),
+    ('service_export', 'billing_app_service', SORT, ' LIKE ', 'sorts the services matching a customer name prefix'),
+    ('proforma_export', 'billing_app_proformainvoice', SORT, ' LIKE ', 'sorts the proformas matching a customer name prefix'),
+    ('service_list', 'billing_app_service', SORT, '"service_id" = ', 'sorts the (at most two) services with that number'),
+    ('process_return', 'billing_app_product', SORT, '', 'picks the lowest id among products with that name'),
+    ('reports_data', 'billing_app_dailysales', SCAN, '', 'all-time totals read the whole per-day rollup'),
+    ('reports_data', 'billing_app_dailysales', INDEX_WALK, '', 'all-time totals read the whole per-day rollup'),
+    ('reports_series', 'billing_app_dailysales', SORT, '', 'groups at most a few thousand rollup rows'),
+]
+
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+
+
+@dataclass
+class Case:
+    view: str
+    method: str
+    path: str
+    data: object = field(default_factory=dict)
+
+    def __str__(self):
+        query = '&'.join(f'{key}={value}' for key, value in self.data.items()) if self.method == 'GET' else ''
+        return f"{self.method} {self.path}{'?' + query if query else ''}"
+
+
+@dataclass
+class Finding:
+    case: Case
+    table: str
+    kind: str
+    detail: str
+    sql: str
+    suggestion: str = ''
+    allowed: str = ''
+
+
+def audit_cases():
+    """One request per API view and filter, built from whatever rows exist."""
+    bill = Bill.objects.exclude(customer=None).select_related('customer').order_by('id').first()
+    service = Service.objects.order_by('id').first()
+    proforma = ProformaInvoice.objects.order_by('id').first()
+    product = Product.objects.exclude(imei=None).order_by('id').first() or Product.objects.order_by('id').first()
+    unit = ProductUnit.objects.filter(status=ProductUnit.IN_STOCK).order_by('id').first()
+    if not (bill and service and proforma and product and unit):
+        raise ValueError("The audit needs a bill with a customer, a service, a proforma, a product and a unit")
+    # The last quarter; synthetic data covers the year up to today
+    today = timezone.localdate()
+    period = {'start': (today - timedelta(days=90)).isoformat(), 'end': today.isoformat()}
+
+    def list_cases(view, export, obj, number_param, number):
+        path = {'bill_list': '/api/bills/', 'service_list': '/api/services/', 'proforma_list': '/api/proforma/'}[view]
+        filters = [
+            {'page_size': 50},
+            {'cursor': encode_cursor(obj)},
+            {'page_size': 50, **period},
+            {'page_size': 50, 'customer': obj.customer_name[:3]},
+            {'page_size': 50, 'phone': obj.customer_phone},
+            {'page_size': 50, 'created_by': str(obj.created_by_id)},
+            {'page_size': 50, 'created_by': obj.created_by.username},
+            {number_param: number},
+        ]
+        return [Case(view, 'GET', path, params) for params in filters] + [
+            Case(export, 'GET', path + 'export/', {'customer': obj.customer_name[:3]}),
+            Case(export, 'GET', path + 'export/', period),
+        ]
+
+    # Products on a bill cannot be deleted, so delete_product gets its own
+    spare = Product.objects.create(name='Audit Spare', selling_price=1, purchase_price=1)
+    # Products with units in stock need IMEIs; plain lines take one without
+    plain = Product.objects.exclude(units__status=ProductUnit.IN_STOCK).order_by('id').first()
+    item = {'product_id': plain.id, 'quantity': 1}
+    cases = [
+        Case('category_list', 'GET', '/api/categories/'),
+        Case('product_list', 'GET', '/api/products/'),
+        Case('product_list', 'GET', '/api/products/', {'page_size': 50}),
+        Case('product_list', 'GET', '/api/products/', {'since': '1'}),
+        Case('product_suggest', 'GET', '/api/products/suggest/', {'q': product.name[:4]}),
+        Case('scan_unit', 'GET', f'/api/units/{unit.imei}/'),
+        Case('scan_unit', 'GET', f'/api/units/{product.imei or unit.imei}/'),
+        Case('customer_suggest', 'GET', '/api/customers/suggest/', {'q': bill.customer.phone[:4]}),
+        Case('customer_history', 'GET', f'/api/customers/{bill.customer.phone}/history/', {'page_size': 20}),
+        Case('customer_history', 'GET', f'/api/customers/{bill.customer.phone}/history/', {
+            'cursor': encode_history_cursor(bill.created_at, 'bill', bill.id),
+        }),
+        Case('reports_data', 'GET', '/api/reports/'),
+        Case('reports_data', 'GET', '/api/reports/', period),
+        Case('reports_series', 'GET', '/api/reports/series/', {'bucket': 'month'}),
+        Case('bill_export', 'GET', '/api/bills/export/', {'items': '1'}),
+        *list_cases('bill_list', 'bill_export', bill, 'invoice_no', bill.invoice_no),
+        *list_cases('service_list', 'service_export', service, 'invoice_no', service.service_invoice_no),
+        *list_cases('proforma_list', 'proforma_export', proforma, 'proforma_no', proforma.proforma_no),
+        Case('bill_list', 'GET', '/api/bills/', {'page_size': 50, 'fields': 'all', 'expand': 'items'}),
+        Case('proforma_list', 'GET', '/api/proforma/', {
+            'page_size': 50, 'fields': 'all', 'expand': 'items,related_bill',
+        }),
+        # Writes last: they change the rows the reads above look for
+        Case('create_category', 'POST', '/api/categories/create/', {'name': 'Audit'}),
+        Case('create_product', 'POST', '/api/products/create/', {
+            'name': 'Audit Phone', 'selling_price': '100.00', 'purchase_price': '80.00', 'stock': 10,
+        }),
+        Case('update_product', 'PUT', f'/api/products/{product.id}/', {'stock': 10 ** 6}),
+        Case('bulk_import_products', 'POST', '/api/products/bulk/', [{
+            'name': 'Audit Bulk', 'selling_price': '10.00', 'purchase_price': '8.00', 'stock': 1,
+        }]),
+        Case('bulk_adjust_stock', 'POST', '/api/products/stock/bulk/', [
+            {'id': product.id, 'delta': 5},
+            {'imei': product.imei or '350000000000000', 'delta': 1},
+        ]),
+        Case('bulk_intake_units', 'POST', '/api/units/bulk/', [
+            {'product_id': unit.product_id, 'imei': '869999999999999'},
+            {'product_id': unit.product_id, 'imei': unit.imei},
+        ]),
+        Case('create_bill', 'POST', '/api/bills/create/', {
+            'customer_name': 'Audit', 'customer_phone': '9000000000', 'items': [item],
+        }),
+        Case('create_bill', 'POST', '/api/bills/create/', {
+            'customer_name': 'Audit', 'customer_phone': '9000000000',
+            'items': [{'product_id': unit.product_id, 'quantity': 1, 'imeis': [unit.imei]}],
+        }),
+        Case('sync_bills', 'POST', '/api/bills/sync/', {'bills': [{
+            'client_key': 'audit-1', 'customer_name': 'Audit', 'customer_phone': '9000000000', 'items': [item],
+        }]}),
+        Case('create_service', 'POST', '/api/services/create/', {
+            'customer_name': 'Audit', 'customer_phone': '9000000000', 'service_type': 'Repair', 'service_price': '100',
+        }),
+        Case('create_proforma', 'POST', '/api/proforma/create/', {
+            'customer_name': 'Audit', 'items': [{'product_id': product.id, 'quantity': 1, 'price': '100.00'}],
+        }),
+        Case('process_return', 'POST', '/api/returns/process/', {'name': product.name.upper(), 'quantity': 1}),
+        Case('process_return', 'POST', '/api/returns/process/', {'product_id': product.id, 'quantity': 1}),
+        Case('delete_product', 'DELETE', f'/api/products/{spare.id}/delete/'),
+    ]
+    return cases
+
+
+def api_view_names():
+    """URL names of every billing_app API endpoint."""
+    names = set()
+    for pattern in get_resolver().url_patterns:
+        for inner in getattr(pattern, 'url_patterns', [pattern]):
+            if str(inner.pattern).startswith('api/') and inner.name:
+                names.add(inner.name)
+    return names
+
+
+def capture(client, case):
+    """Run ``case`` through ``client`` and return the statements it executed."""
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(EXPLAINED):
+            statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        if case.method == 'GET':
+            response = client.get(case.path, case.data)
+        else:
+            send = getattr(client, case.method.lower())
+            response = send(case.path, json.dumps(case.data), content_type='application/json')
+        if response.streaming:
+            b''.join(response.streaming_content)  # exports query while streaming
+    if response.status_code >= 400:
+        raise AssertionError(f"{case}: HTTP {response.status_code} {getattr(response, 'content', b'')[:200]!r}")
+    return statements
+
+
+# ---------- plans ----------
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?')
+SQLITE_SEARCH = re.compile(r'^SEARCH (?:TABLE )?(\w+)')
+
+
+def sorted_table(sql):
+    """The table whose column leads the ORDER BY / GROUP BY of ``sql``."""
+    upper = sql.upper()
+    at = max(upper.rfind(' ORDER BY '), upper.rfind(' GROUP BY '))
+    match = re.search(r'"(\w+)"\."\w+"', sql[at:]) if at >= 0 else None
+    return match.group(1) if match else None
+
+
+def sqlite_findings(sql, rows):
+    """``(table, kind, detail)`` for an EXPLAIN QUERY PLAN result."""
+    bounded = ' LIMIT ' in sql and ' WHERE ' not in sql
+    findings, driving = [], sorted_table(sql)
+    for row in rows:
+        detail = row[-1]
+        scan = SQLITE_SCAN.match(detail)
+        search = SQLITE_SEARCH.match(detail)
+        table = (scan or search).group(1) if (scan or search) else None
+        driving = driving or table
+        if scan and not scan.group(2):
+            findings.append((table, SCAN, detail))
+        elif scan and not bounded:
+            findings.append((table, INDEX_WALK, detail))
+        elif detail.startswith('USE TEMP B-TREE') and driving:
+            findings.append((driving, SORT, detail))
+    return findings
+
+
+def postgres_findings(sql, plan):
+    """``(table, kind, detail)`` for an EXPLAIN (FORMAT JSON) plan."""
+    findings = []
+
+    def relation(node):
+        if 'Relation Name' in node:
+            return node['Relation Name']
+        for child in node.get('Plans', []):
+            name = relation(child)
+            if name:
+                return name
+        return None
+
+    def walk(node, limited):
+        kind = node['Node Type']
+        if kind == 'Seq Scan':
+            findings.append((node['Relation Name'], SCAN, f"Seq Scan on {node['Relation Name']}"))
+        elif kind in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in node:
+            if 'Filter' in node or not limited:
+                findings.append((node['Relation Name'], INDEX_WALK, f"{kind} using {node['Index Name']}"))
+        elif kind in ('Sort', 'Incremental Sort'):
+            table = sorted_table(sql) or relation(node)
+            findings.append((table, SORT, f"{kind} on {', '.join(node.get('Sort Key', []))}"))
+        for child in node.get('Plans', []):
+            walk(child, limited or kind == 'Limit')
+
+    walk(plan[0]['Plan'], False)
+    return findings
+
+
+# Engines explain() can read plans from
+VENDORS = ('postgresql', 'sqlite')
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return postgres_findings(sql, plan)
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return sqlite_findings(sql, cursor.fetchall())
+    raise ValueError(f"No plan reader for {connection.vendor}; use one of {', '.join(VENDORS)}")
+
+
+# ---------- suggestions ----------
+
+def column_refs(text, table):
+    pattern = re.compile(rf'(UPPER\()?"{table}"\."(\w+)"(?:::text\))?\)?\s*(LIKE|DESC|ASC)?')
+    return pattern.findall(text)
+
+
+def suggest_index(model, sql):
+    """A best-effort index for the filter and ordering ``sql`` applies to ``model``."""
+    table = model._meta.db_table
+    upper = sql.upper()
+    where_at = upper.find(' WHERE ')
+    order_at = upper.rfind(' ORDER BY ')
+    group_at = upper.rfind(' GROUP BY ')
+    tail = min(at for at in (order_at, group_at, len(sql)) if at >= 0)
+    where = sql[where_at:tail] if where_at >= 0 else ''
+    order = sql[order_at:] if order_at >= 0 else ''
+
+    by_column = {f.column: f.name for f in model._meta.concrete_fields}
+    fields, patterns = [], []
+    for wrapped, column, operator in column_refs(where, table):
+        name = by_column.get(column, column)
+        if operator == 'LIKE' or wrapped:
+            if name not in patterns:
+                patterns.append(name)
+        elif name not in fields:
+            fields.append(name)
+    for wrapped, column, direction in column_refs(order, table):
+        name = by_column.get(column, column)
+        ordered = f'-{name}' if direction == 'DESC' else name
+        if name not in fields and ordered not in fields:
+            fields.append(ordered)
+
+    if patterns:
+        return (
+            f"case-insensitive index on {', '.join(patterns)} "
+            "(SQLite: COLLATE NOCASE, PostgreSQL: UPPER(...) text_pattern_ops)"
+        )
+    return f"models.Index(fields={fields!r})" if fields else ''
+
+
+# ---------- audit ----------
+
+def audit(client, cases=None):
+    """Run every case and return a list of :class:`Finding`, allowed ones included."""
+    models = {model._meta.db_table: model for model in apps.get_app_config('billing_app').get_models()}
+    findings = []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET enable_seqscan = off')
+    try:
+        for case in cases if cases is not None else audit_cases():
+            seen = set()
+            for sql, params in capture(client, case):
+                for table, kind, detail in explain(sql, params):
+                    if table not in models or (table, kind, sql) in seen:
+                        continue
+                    seen.add((table, kind, sql))
+                    allowed = next((
+                        reason for view, allowed_table, allowed_kind, marker, reason in ALLOWED
+                        if (view, allowed_table, allowed_kind) == (case.view, table, kind) and marker in sql
+                    ), '')
+                    findings.append(Finding(
+                        case, table, kind, detail, sql, suggest_index(models[table], sql), allowed,
+                    ))
+    finally:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('RESET enable_seqscan')
+    return findings
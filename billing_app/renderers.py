@@ -0,0 +1,145 @@
+import struct
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# ==========================
+# COMPACT LIST RENDERERS
+# ==========================
+# Terminals on mobile data pay for every repeated key of a list response.
+# Two more renderers are offered on the list endpoints, chosen with the
+# Accept header (or ?format=columns / ?format=msgpack):
+#
+#   application/vnd.billing.columns+json
+#       JSON in which every list of same-shaped objects, nested ones
+#       included, becomes {"$columns": [names], "$rows": [[values], ...]}
+#   application/msgpack
+#       the same columnar shape in MessagePack
+#
+# Plain JSON stays the default. app.js (fromColumns, decodeMessagePack)
+# turns both back into the usual objects. The MessagePack writer below
+# covers what the JSON renderer can produce (nil, booleans, 64-bit ints,
+# doubles, UTF-8 strings, arrays and maps), which is all the API needs.
+# That avoids a new dependency for one encoder.
+
+COLUMNS_KEY, ROWS_KEY = '$columns', '$rows'
+
+
+def to_columns(value):
+    """``value`` with every non-empty list of same-keyed dicts made columnar."""
+    if isinstance(value, dict):
+        return {key: to_columns(item) if isinstance(item, (list, dict)) else item for key, item in value.items()}
+    if not isinstance(value, list):
+        return value
+    if value and isinstance(value[0], dict):
+        names = tuple(value[0])
+        if all(isinstance(row, dict) and tuple(row) == names for row in value):
+            return {
+                COLUMNS_KEY: list(names),
+                ROWS_KEY: [
+                    [to_columns(item) if isinstance(item, (list, dict)) else item for item in row.values()]
+                    for row in value
+                ],
+            }
+    return [to_columns(item) if isinstance(item, (list, dict)) else item for item in value]
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = 'application/vnd.billing.columns+json'
+    format = 'columns'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(to_columns(data), accepted_media_type, renderer_context)
+
+
+# ---------- MessagePack ----------
+
+def pack_header(out, size, fixed, fixed_limit, markers):
+    """Length prefix of a str, array or map: a fix-type byte, or a marker and a big-endian size."""
+    if size < fixed_limit:
+        out.append(fixed | size)
+        return
+    for marker, limit, fmt in markers:
+        if size <= limit:
+            out += struct.pack(fmt, marker, size)
+            return
+    raise ValueError(f"MessagePack cannot hold {size} entries")
+
+
+STR_MARKERS = ((0xd9, 0xff, '>BB'), (0xda, 0xffff, '>BH'), (0xdb, 0xffffffff, '>BI'))
+ARRAY_MARKERS = ((0xdc, 0xffff, '>BH'), (0xdd, 0xffffffff, '>BI'))
+MAP_MARKERS = ((0xde, 0xffff, '>BH'), (0xdf, 0xffffffff, '>BI'))
+
+
+def pack_int(out, value):
+    if 0 <= value <= 0x7f:
+        out.append(value)
+    elif -32 <= value < 0:
+        out.append(value & 0xff)
+    elif value > 0:
+        for marker, limit, fmt in ((0xcc, 0xff, '>BB'), (0xcd, 0xffff, '>BH'), (0xce, 0xffffffff, '>BI'),
+                                   (0xcf, 0xffffffffffffffff, '>BQ')):
+            if value <= limit:
+                out += struct.pack(fmt, marker, value)
+                return
+        raise ValueError(f"MessagePack cannot hold {value}")
+    else:
+        for marker, limit, fmt in ((0xd0, 0x80, '>Bb'), (0xd1, 0x8000, '>Bh'), (0xd2, 0x80000000, '>Bi'),
+                                   (0xd3, 0x8000000000000000, '>Bq')):
+            if -value <= limit:
+                out += struct.pack(fmt, marker, value)
+                return
+        raise ValueError(f"MessagePack cannot hold {value}")
+
+
+def pack(value, out, default):
+    if isinstance(value, str):
+        data = value.encode()
+        pack_header(out, len(data), 0xa0, 32, STR_MARKERS)
+        out += data
+    elif value is None:
+        out.append(0xc0)
+    elif value is True:
+        out.append(0xc3)
+    elif value is False:
+        out.append(0xc2)
+    elif isinstance(value, int):
+        pack_int(out, value)
+    elif isinstance(value, float):
+        out += struct.pack('>Bd', 0xcb, value)
+    elif isinstance(value, (list, tuple)):
+        pack_header(out, len(value), 0x90, 16, ARRAY_MARKERS)
+        for item in value:
+            pack(item, out, default)
+    elif isinstance(value, dict):
+        pack_header(out, len(value), 0x80, 16, MAP_MARKERS)
+        for key, item in value.items():
+            pack(key, out, default)
+            pack(item, out, default)
+    else:
+        pack(default(value), out, default)
+
+
+def packb(value, default=JSONEncoder().default):
+    """``value`` as MessagePack bytes; other types go through ``default`` first."""
+    out = bytearray()
+    pack(value, out, default)
+    return bytes(out)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return packb(to_columns(data))
+
+
+# JSON (and the browsable API) first, so clients that accept anything get JSON
+LIST_RENDERERS = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer, MessagePackRenderer]
@@ -0,0 +1,178 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Bill, DailySales, Service
+
+
+# ==========================
+# DAILY SALES ROLLUP
+# ==========================
+# Callers run these inside the transaction that creates the bill/service,
+# so the rollup can never disagree with the rows it summarises. Each call
+# is one UPDATE on the (date, user) row, plus an INSERT the first time
+# that user sells on a given day.
+
+def add_to_rollup(day, user, **deltas):
+    user_id = user.pk if user and user.is_authenticated else None
+    increments = {field: F(field) + value for field, value in deltas.items()}
+    if DailySales.objects.filter(date=day, user_id=user_id).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            DailySales.objects.create(date=day, user_id=user_id, **deltas)
+    except IntegrityError:
+        # Another terminal created today's row first
+        DailySales.objects.filter(date=day, user_id=user_id).update(**increments)
+
+
+def record_bill(bill):
+    add_to_rollup(
+        timezone.localdate(bill.created_at),
+        bill.created_by,
+        bill_count=1,
+        bill_total=bill.grand_total,
+        gst_total=bill.gst_amount,
+    )
+
+
+def record_service(service):
+    add_to_rollup(
+        timezone.localdate(service.created_at),
+        service.created_by,
+        service_count=1,
+        service_total=service.service_price,
+    )
+
+
+def record_return(quantity, user):
+    add_to_rollup(timezone.localdate(), user, return_count=1, return_quantity=quantity)
+
+
+def sales_between(start=None, end=None):
+    """Summed rollup columns for the inclusive date range (open-ended when None)."""
+    qs = DailySales.objects.all()
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+    totals = qs.aggregate(
+        bill_count=Sum('bill_count'),
+        bill_total=Sum('bill_total'),
+        gst_total=Sum('gst_total'),
+        service_count=Sum('service_count'),
+        service_total=Sum('service_total'),
+        return_count=Sum('return_count'),
+        return_quantity=Sum('return_quantity'),
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def rebuild_sales_rollup():
+    """
+    Recompute bill and service columns from history. Return counters are
+    kept: process_return only adjusts stock, so there is no history to
+    rebuild them from. Returns the number of rollup rows written.
+    """
+    rows = {}
+
+    def row(day, user_id):
+        key = (day, user_id)
+        if key not in rows:
+            rows[key] = DailySales(date=day, user_id=user_id)
+        return rows[key]
+
+    bills = (
+        Bill.objects.annotate(day=TruncDate('created_at'))
+        .values('day', 'created_by')
+        .annotate(count=Count('id'), total=Sum('grand_total'), gst=Sum('gst_amount'))
+        .order_by()
+    )
+    for group in bills:
+        entry = row(group['day'], group['created_by'])
+        entry.bill_count = group['count']
+        entry.bill_total = group['total'] or 0
+        entry.gst_total = group['gst'] or 0
+
+    services = (
+        Service.objects.annotate(day=TruncDate('created_at'))
+        .values('day', 'created_by')
+        .annotate(count=Count('id'), total=Sum('service_price'))
+        .order_by()
+    )
+    for group in services:
+        entry = row(group['day'], group['created_by'])
+        entry.service_count = group['count']
+        entry.service_total = group['total'] or 0
+
+    for kept in DailySales.objects.filter(return_count__gt=0):
+        entry = row(kept.date, kept.user_id)
+        entry.return_count = kept.return_count
+        entry.return_quantity = kept.return_quantity
+
+    DailySales.objects.all().delete()
+    DailySales.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
+
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, bucket):
+    """The start of the bucket after ``day``'s, or ``None`` past date.max."""
+    try:
+        if bucket == 'week':
+            return day + timedelta(days=7)
+        if bucket == 'month':
+            return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return day + timedelta(days=1)
+    except OverflowError:
+        return None
+
+
+def sales_series(start, end, bucket='day'):
+    """
+    Bill and service revenue per day/week/month between ``start`` and
+    ``end`` (inclusive), from one GROUP BY over the rollup. Returned
+    column-wise with empty buckets filled in, so charts can plot directly.
+    """
+    grouped = (
+        DailySales.objects.filter(date__gte=start, date__lte=end)
+        .annotate(period=BUCKETS[bucket]('date'))
+        .values('period')
+        .annotate(
+            bills=Sum('bill_total'),
+            bill_count=Sum('bill_count'),
+            services=Sum('service_total'),
+            service_count=Sum('service_count'),
+        )
+        .order_by('period')
+    )
+    by_period = {row['period']: row for row in grouped}
+
+    series = {'bucket': bucket, 'periods': [], 'bills': [], 'bill_count': [], 'services': [], 'service_count': []}
+    period = bucket_start(start, bucket)
+    while period is not None and period <= end:
+        row = by_period.get(period, {})
+        series['periods'].append(period.isoformat())
+        series['bills'].append(float(row.get('bills') or 0))
+        series['bill_count'].append(row.get('bill_count') or 0)
+        series['services'].append(float(row.get('services') or 0))
+        series['service_count'].append(row.get('service_count') or 0)
+        period = next_bucket(period, bucket)
+    return series
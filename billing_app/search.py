@@ -0,0 +1,228 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import grace
+from .models import Product
+
+
+# ==========================
+# PRODUCT SUGGESTION INDEX
+# ==========================
+# A process-local index over product name, IMEI and agency so typeahead
+# never scans the Product table. Local writes reach it through signals;
+# writes made by other worker processes (or via queryset.update()) are
+# picked up by a periodic delta read on the indexed updated_at column
+# (overlapping by CATALOG_SYNC_GRACE_SECONDS for late commits), and a
+# full rebuild every few minutes drops products deleted elsewhere.
+
+SUGGEST_FIELDS = ('id', 'name', 'imei', 'stock', 'selling_price', 'purchase_price', 'agency_name', 'updated_at')
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def words(text):
+    return set(text.replace('\0', ' ').split())
+
+
+def walk_prefix(entries, q):
+    """Yield ``(key, pk)`` pairs from a sorted list whose key starts with ``q``."""
+    i = bisect_left(entries, (q,))
+    while i < len(entries) and entries[i][0].startswith(q):
+        yield entries[i]
+        i += 1
+
+
+class ProductIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.docs = {}        # id -> product row (dict of SUGGEST_FIELDS)
+        self.haystacks = {}   # id -> lowercased "name\0imei\0agency"
+        self.names = []       # sorted (name, id) pairs
+        self.words = []       # sorted (word, id) pairs over name, IMEI and agency words
+        self.grams = defaultdict(set)  # trigram -> set of ids, for substring matches
+        self.loaded = False
+        self.rebuilding = False
+        self.synced_at = 0.0
+        self.rebuilt_at = 0.0
+        self.high_water = None
+
+    # ---------- maintenance ----------
+
+    def rebuild(self):
+        """Build a fresh index from the database and swap it in."""
+        fresh = ProductIndex()
+        for row in Product.objects.values(*SUGGEST_FIELDS).iterator(chunk_size=2000):
+            fresh._add(row)
+        fresh.names.sort()
+        fresh.words.sort()
+        with self.lock:
+            self.docs, self.haystacks, self.grams = fresh.docs, fresh.haystacks, fresh.grams
+            self.names, self.words = fresh.names, fresh.words
+            self.high_water = fresh.high_water
+            self.loaded = True
+            self.synced_at = self.rebuilt_at = time.monotonic()
+
+    def rebuild_in_background(self):
+        def run():
+            try:
+                self.rebuild()
+            finally:
+                self.rebuilding = False
+                connection.close()
+
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(target=run, name='product-index-rebuild', daemon=True).start()
+
+    def refresh(self, ids):
+        """Re-read the given product ids from the database."""
+        rows = {row['id']: row for row in Product.objects.filter(pk__in=list(ids)).values(*SUGGEST_FIELDS)}
+        with self.lock:
+            for pk in ids:
+                self.discard(pk)
+                if pk in rows:
+                    self.upsert(rows[pk])
+
+    def sync(self):
+        """Load the index on first use, then keep it close to the database."""
+        now = time.monotonic()
+        if not self.loaded:
+            self.rebuild()
+            return
+        if now - self.rebuilt_at > getattr(settings, 'PRODUCT_INDEX_REBUILD_SECONDS', 300):
+            # Periodic rebuild drops products deleted by other processes;
+            # it runs off the request path while the current index serves
+            self.rebuild_in_background()
+        if now - self.synced_at < getattr(settings, 'PRODUCT_INDEX_SYNC_SECONDS', 5):
+            return
+        with self.lock:
+            high_water = self.high_water
+            self.synced_at = now
+        changed = Product.objects.values(*SUGGEST_FIELDS)
+        if high_water is not None:
+            # updated_at is stamped before commit, so a write can land
+            # below the high water mark; re-read the same grace window as
+            # the catalog delta (catalog.py)
+            changed = changed.filter(updated_at__gte=high_water - grace())
+        for row in changed:
+            self.upsert(row)
+
+    def upsert(self, row):
+        with self.lock:
+            self.discard(row['id'])
+            self._add(row, keep_sorted=True)
+
+    def discard(self, pk):
+        with self.lock:
+            if pk not in self.docs:
+                return
+            row = self.docs.pop(pk)
+            haystack = self.haystacks.pop(pk)
+            for gram in trigrams(haystack):
+                ids = self.grams.get(gram)
+                if ids is not None:
+                    ids.discard(pk)
+                    if not ids:
+                        del self.grams[gram]
+            self._remove_sorted(self.names, ((row['name'] or '').lower(), pk))
+            for word in words(haystack):
+                self._remove_sorted(self.words, (word, pk))
+
+    @staticmethod
+    def _remove_sorted(entries, entry):
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+    def _add(self, row, keep_sorted=False):
+        pk = row['id']
+        name = (row['name'] or '').lower()
+        haystack = '\0'.join((name, row['imei'] or '', row['agency_name'] or '')).lower()
+        self.docs[pk] = row
+        self.haystacks[pk] = haystack
+        grams = self.grams
+        for gram in trigrams(haystack):
+            grams[gram].add(pk)
+        add = insort if keep_sorted else list.append
+        add(self.names, (name, pk))
+        for word in words(haystack):
+            add(self.words, (word, pk))
+        updated_at = row.get('updated_at')
+        if updated_at and (self.high_water is None or updated_at > self.high_water):
+            self.high_water = updated_at
+
+    # ---------- queries ----------
+
+    def substring_matches(self, q):
+        """Ids whose name, IMEI or agency contains ``q`` (needs 3+ characters)."""
+        if len(q) < 3:
+            return
+        smallest = min((self.grams.get(gram, ()) for gram in trigrams(q)), key=len)
+        for pk in smallest:
+            if q in self.haystacks[pk]:
+                yield pk
+
+    def search(self, q, limit=10, in_stock=True):
+        """
+        Ranked suggestions: name prefix first (an exact name sorts first),
+        then any word prefix (name, IMEI, agency), then plain substring.
+        Each tier is consumed lazily, so a query stops once ``limit`` is met.
+        """
+        q = q.strip().lower()
+        if not q:
+            return []
+        self.sync()
+        with self.lock:
+            results, seen = [], set()
+            tiers = (
+                (pk for _, pk in walk_prefix(self.names, q)),
+                (pk for _, pk in walk_prefix(self.words, q)),
+                self.substring_matches(q),
+            )
+            for tier in tiers:
+                for pk in tier:
+                    if pk in seen:
+                        continue
+                    seen.add(pk)
+                    row = self.docs[pk]
+                    if in_stock and row['stock'] <= 0:
+                        continue
+                    results.append(row)
+                    if len(results) >= limit:
+                        return results
+            return results
+
+
+product_index = ProductIndex()
+
+
+def refresh_on_commit(ids):
+    """For writes that bypass signals (queryset.update()), e.g. checkout."""
+    if product_index.loaded:
+        ids = list(ids)
+        transaction.on_commit(lambda: product_index.refresh(ids))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    if product_index.loaded:
+        row = {field: getattr(instance, field) for field in SUGGEST_FIELDS}
+        transaction.on_commit(lambda: product_index.upsert(row))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    if product_index.loaded:
+        pk = instance.pk
+        transaction.on_commit(lambda: product_index.discard(pk))
@@ -1,6 +1,14 @@
 from rest_framework import serializers
 from django.db import transaction
+from django.db.models import F, Prefetch
+from django.utils import timezone
 from decimal import Decimal
+from .customers import customer_for
+from .units import sell_units, tracked
+from .rollups import record_bill, record_service
+from .live import bill_created_on_commit, products_changed_on_commit
+from .metrics import registry
+from .search import refresh_on_commit
 from .models import (
     Category,
     Product,
@@ -36,6 +44,10 @@ class ProductSerializer(serializers.ModelSerializer):
 class BillItemCreateSerializer(serializers.Serializer):
     product_id = serializers.IntegerField(required=True)
     quantity = serializers.IntegerField(required=True, min_value=1)
+    # Scanned handsets (see units.py); one IMEI per unit of quantity
+    imeis = serializers.ListField(
+        child=serializers.CharField(max_length=50), required=False, allow_empty=True
+    )
 
 
 class BillItemSerializer(serializers.ModelSerializer):
@@ -65,12 +77,16 @@ class BillItemSerializer(serializers.ModelSerializer):
 class BillSerializer(serializers.ModelSerializer):
     items = BillItemCreateSerializer(many=True, write_only=True)
     created_by = serializers.StringRelatedField(read_only=True)
+    # Declared explicitly so a repeated key is deduplicated by the caller
+    # (see sync.py) instead of rejected by a UniqueValidator
+    client_key = serializers.CharField(max_length=64, required=False, allow_null=True, write_only=True)
 
     class Meta:
         model = Bill
         fields = [
             "id",
             "invoice_no",
+            "client_key",
             "customer_name",
             "customer_phone",
             "items",
@@ -90,6 +106,16 @@ class BillSerializer(serializers.ModelSerializer):
             "created_at"
         ]
 
+    @staticmethod
+    def setup_eager_loading(qs, prefix=""):
+        """Load creator, items and item products up front instead of per bill."""
+        return qs.select_related(f"{prefix}created_by").prefetch_related(
+            Prefetch(
+                f"{prefix}items",
+                queryset=BillItem.objects.select_related("product").order_by("id"),
+            )
+        )
+
     def create(self, validated_data):
         items_data = validated_data.pop("items")
         request = self.context.get("request")
@@ -97,69 +123,111 @@ class BillSerializer(serializers.ModelSerializer):
         if not items_data:
             raise serializers.ValidationError({"items": "At least one item is required"})
 
-        with transaction.atomic():
-            # Create bill with initial values
-            bill = Bill.objects.create(
-                customer_name=validated_data.get("customer_name"),
-                customer_phone=validated_data.get("customer_phone", ""),
-                created_by=request.user if request else None,
-                subtotal=Decimal("0"),
-                gst_amount=Decimal("0"),
-                grand_total=Decimal("0")
-            )
+        for idx, item_data in enumerate(items_data):
+            if not item_data.get("product_id"):
+                raise serializers.ValidationError({
+                    "items": f"Item {idx + 1}: product_id is required"
+                })
+            if int(item_data.get("quantity", 1)) <= 0:
+                raise serializers.ValidationError({
+                    "items": f"Item {idx + 1}: Quantity must be greater than 0"
+                })
+            imeis = item_data.get("imeis") or []
+            if imeis and len(imeis) != int(item_data.get("quantity", 1)):
+                raise serializers.ValidationError({
+                    "items": f"Item {idx + 1}: Give one IMEI per unit"
+                })
+
+        scanned = [imei for item_data in items_data for imei in item_data.get("imeis") or []]
+        if len(set(scanned)) != len(scanned):
+            raise serializers.ValidationError({"items": "The same IMEI is scanned twice"})
+
+        wanted = {}
+        for item_data in items_data:
+            product_id = item_data["product_id"]
+            wanted[product_id] = wanted.get(product_id, 0) + int(item_data.get("quantity", 1))
 
-            subtotal = Decimal("0")
-            gst_total = Decimal("0")
-
-            for idx, item_data in enumerate(items_data):
-                # Get product from product_id
-                product_id = item_data.get("product_id")
-                if not product_id:
-                    raise serializers.ValidationError({
-                        "items": f"Item {idx + 1}: product_id is required"
-                    })
-                
-                try:
-                    product = Product.objects.get(id=product_id)
-                except Product.DoesNotExist:
+        with transaction.atomic():
+            # Conditional decrement first: a row only updates while enough
+            # stock is left, so concurrent checkouts can never oversell. Each
+            # UPDATE also locks its product row (sorted ids keep lock order
+            # stable between terminals), and on SQLite it takes the write lock
+            # before anything is read, so busy terminals wait their turn
+            # instead of failing with "database is locked".
+            now = timezone.now()
+            for product_id in sorted(wanted):
+                quantity = wanted[product_id]
+                updated = Product.objects.filter(
+                    pk=product_id, stock__gte=quantity
+                ).update(stock=F("stock") - quantity, updated_at=now)
+                if not updated:
+                    product = Product.objects.filter(pk=product_id).first()
+                    if product is None:
+                        idx = next(i for i, item in enumerate(items_data) if item["product_id"] == product_id)
+                        raise serializers.ValidationError({
+                            "items": f"Item {idx + 1}: Product with id {product_id} does not exist"
+                        })
+                    registry.inc("billing_stock_conflicts_total")
                     raise serializers.ValidationError({
-                        "items": f"Item {idx + 1}: Product with id {product_id} does not exist"
+                        "items": f"Insufficient stock for {product.name}"
                     })
-                
-                quantity = int(item_data.get("quantity", 1))
-                if quantity <= 0:
+            refresh_on_commit(wanted)
+            products_changed_on_commit(wanted)
+
+            # Rows are locked by the updates above, so one plain read suffices
+            products = Product.objects.in_bulk(list(wanted))
+            serial_numbered = tracked(list(wanted))
+            for idx, item_data in enumerate(items_data):
+                if item_data["product_id"] in serial_numbered and not item_data.get("imeis"):
                     raise serializers.ValidationError({
-                        "items": f"Item {idx + 1}: Quantity must be greater than 0"
+                        "items": f"Item {idx + 1}: Scan the IMEI of each {products[item_data['product_id']].name}"
                     })
 
+            subtotal = Decimal("0")
+            gst_total = Decimal("0")
+            lines = []
+
+            for item_data in items_data:
+                product = products[item_data["product_id"]]
+                quantity = int(item_data.get("quantity", 1))
                 price = Decimal(str(product.selling_price))
                 total = price * quantity
                 gst_percentage = Decimal(str(product.gst_percentage))
                 gst_amount = (total * gst_percentage) / Decimal("100")
 
-                BillItem.objects.create(
-                    bill=bill,
-                    product=product,
-                    quantity=quantity,
-                    price=price,
-                    total=total,
-                )
-
+                lines.append((product, quantity, price, total, item_data.get("imeis") or []))
                 subtotal += total
                 gst_total += gst_amount
 
-            # Update bill with calculated totals
-            bill.subtotal = subtotal
-            bill.gst_amount = gst_total
-            bill.grand_total = subtotal + gst_total
-            bill.save()
+            bill = Bill.objects.create(
+                customer_name=validated_data.get("customer_name"),
+                customer_phone=validated_data.get("customer_phone", ""),
+                customer=customer_for(validated_data.get("customer_phone"), validated_data.get("customer_name")),
+                created_by=request.user if request else None,
+                client_key=validated_data.get("client_key") or None,
+                subtotal=subtotal,
+                gst_amount=gst_total,
+                grand_total=subtotal + gst_total
+            )
+
+            # bulk_create skips BillItem.save(); stock was already deducted above
+            bill_items = BillItem.objects.bulk_create([
+                BillItem(bill=bill, product=product, quantity=quantity, price=price, total=total)
+                for product, quantity, price, total, imeis in lines
+            ])
+            for item, (product, quantity, price, total, imeis) in zip(bill_items, lines):
+                if imeis:
+                    sell_units(item, imeis, now)
+            record_bill(bill)
+            bill_created_on_commit(bill)
 
             return bill
 
     def to_representation(self, instance):
         """Override to return full item details with product info on read"""
         ret = super().to_representation(instance)
-        # Replace items with full BillItemSerializer that includes product details
+        # Replace items with full BillItemSerializer that includes product details.
+        # items.all() is served from the prefetch cache when setup_eager_loading ran.
         ret['items'] = BillItemSerializer(instance.items.all(), many=True).data
         return ret
 
@@ -175,12 +243,20 @@ class ServiceSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ["service_id", "service_invoice_no", "created_by"]
 
+    @staticmethod
+    def setup_eager_loading(qs):
+        return qs.select_related("created_by")
+
     def create(self, validated_data):
         request = self.context.get("request")
-        return Service.objects.create(
-            created_by=request.user if request else None,
-            **validated_data
-        )
+        with transaction.atomic():
+            service = Service.objects.create(
+                created_by=request.user if request else None,
+                customer=customer_for(validated_data.get("customer_phone"), validated_data.get("customer_name")),
+                **validated_data
+            )
+            record_service(service)
+        return service
 
 
 # ==========================
@@ -227,13 +303,29 @@ class ProformaInvoiceSerializer(serializers.ModelSerializer):
             "related_bill",
         ]
 
+    @staticmethod
+    def setup_eager_loading(qs):
+        """Load items, products and the nested related bill in a fixed number of queries."""
+        qs = qs.select_related("created_by", "related_bill").prefetch_related(
+            Prefetch(
+                "items",
+                queryset=ProformaItem.objects.select_related("product").order_by("id"),
+            )
+        )
+        return BillSerializer.setup_eager_loading(qs, prefix="related_bill__")
+
     def create(self, validated_data):
         items_data = validated_data.pop("items")
         request = self.context.get("request")
 
         with transaction.atomic():
+            # Totals are read-only; they are filled in from the items below
             proforma = ProformaInvoice.objects.create(
                 created_by=request.user if request else None,
+                customer=customer_for(validated_data.get("customer_phone"), validated_data.get("customer_name")),
+                subtotal=0,
+                gst_amount=0,
+                grand_total=0,
                 **validated_data
             )
 
@@ -246,7 +338,7 @@ class ProformaInvoiceSerializer(serializers.ModelSerializer):
 
                 price = product.selling_price
                 total = price * quantity
-                gst_amount = (total * product.gst_percentage) / 100
+                gst_amount = (total * Decimal(str(product.gst_percentage))) / Decimal("100")
 
                 ProformaItem.objects.create(
                     proforma=proforma,
@@ -0,0 +1,69 @@
+import hashlib
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+# ==========================
+# SERVICE WORKER PRECACHE
+# ==========================
+# collectstatic writes precache.json next to whitenoise's manifest: the
+# hashed URL of every app asset plus a version derived from those URLs.
+# /sw.js is served with both injected (views.service_worker), so a deploy
+# that changes any asset changes the worker, which installs a fresh cache
+# and drops the old one. Hashed URLs never change content, so the worker
+# can serve them cache-first without ever handing out stale JS.
+
+PRECACHE_FILE = 'precache.json'
+PRECACHE_EXTENSIONS = ('.js', '.css', '.png', '.ico', '.svg', '.woff2', '.json')
+PRECACHE_SKIP = ('admin/', 'rest_framework/', 'sw.js', PRECACHE_FILE)
+
+
+def precache_entries(urls_by_name):
+    """``{'version', 'urls'}`` for the app assets among ``{name: url}``."""
+    urls = sorted(
+        url for name, url in urls_by_name.items()
+        if name.endswith(PRECACHE_EXTENSIONS) and not name.startswith(PRECACHE_SKIP)
+    )
+    version = hashlib.sha1('\n'.join(urls).encode()).hexdigest()[:12]
+    return {'version': version, 'urls': urls}
+
+
+def source_precache():
+    """Precache entries for uncollected sources (development), versioned by content."""
+    digest = hashlib.sha1()
+    urls_by_name = {}
+    for finder in finders.get_finders():
+        for name, storage in finder.list([]):
+            name = name.replace('\\', '/')
+            if name.endswith(PRECACHE_EXTENSIONS) and not name.startswith(PRECACHE_SKIP):
+                urls_by_name[name] = settings.STATIC_URL.rstrip('/') + '/' + name
+                with storage.open(name) as f:
+                    digest.update(name.encode() + f.read())
+    entries = precache_entries(urls_by_name)
+    entries['version'] = digest.hexdigest()[:12]
+    return entries
+
+
+def load_precache():
+    try:
+        return json.loads((Path(settings.STATIC_ROOT) / PRECACHE_FILE).read_text())
+    except FileNotFoundError:
+        return source_precache()
+
+
+class PrecacheManifestStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Whitenoise's manifest storage, plus precache.json for the service worker."""
+
+    def post_process(self, *args, **kwargs):
+        yield from super().post_process(*args, **kwargs)
+        if kwargs.get('dry_run'):
+            return
+        entries = precache_entries({name: self.url(name, force=True) for name in self.hashed_files})
+        if self.exists(PRECACHE_FILE):
+            self.delete(PRECACHE_FILE)
+        self._save(PRECACHE_FILE, ContentFile(json.dumps(entries, indent=1).encode()))
@@ -0,0 +1,114 @@
+from itertools import chain, islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .renderers import COLUMNS_KEY, ROWS_KEY, ColumnarJSONRenderer, to_columns
+
+
+# ==========================
+# STREAMING JSON LISTS
+# ==========================
+# An unpaginated list is read from a chunked iterator() and rendered a
+# batch of BILLING_STREAM_CHUNK_SIZE rows at a time, so a worker holds
+# one batch rather than the whole list. The bytes are exactly what
+# JSONRenderer (or ColumnarJSONRenderer) would have produced for the
+# complete list. A list that fits in one batch is an ordinary Response.
+# Under ASGI each batch is read in the sync thread the view ran in,
+# because Django would otherwise collect a sync iterator into a list
+# before sending it. Other formats (MessagePack, the browsable API), and
+# every list when the chunk size is 0, are rendered in one piece as
+# before.
+
+def chunk_size():
+    """Rows per streamed batch; 0 turns streaming off."""
+    return getattr(settings, 'BILLING_STREAM_CHUNK_SIZE', 2000)
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+class ListWriter:
+    """The JSON of ``{'results': [...], **extra}`` in pieces, one per batch of results."""
+
+    def __init__(self, extra):
+        self.encode = JSONRenderer().render
+        self.extra = extra
+
+    def open(self, batch):
+        return b'['
+
+    def rows(self, batch):
+        return self.encode(batch)[1:-1]
+
+    def close(self):
+        return b']'
+
+    def pieces(self, batches):
+        yield b'{"results":'
+        started = False
+        for batch in batches:
+            yield (b',' if started else self.open(batch)) + self.rows(batch)
+            started = True
+        yield self.close() if started else b'[]'
+        yield b',' + self.encode(self.extra)[1:] if self.extra else b'}'
+
+
+class ColumnarListWriter(ListWriter):
+    """The same, with results as ``{"$columns": [...], "$rows": [...]}``."""
+
+    def open(self, batch):
+        return b'{"' + COLUMNS_KEY.encode() + b'":' + self.encode(list(batch[0])) + b',"' + ROWS_KEY.encode() + b'":['
+
+    def rows(self, batch):
+        return self.encode(to_columns(batch)[ROWS_KEY])[1:-1]
+
+    def close(self):
+        return b']}'
+
+
+async def read_in_sync_thread(pieces):
+    """``pieces`` as an async iterator, each step run where the view's connection lives."""
+    step = sync_to_async(next, thread_sensitive=True)
+    while (piece := await step(pieces, None)) is not None:
+        yield piece
+
+
+def for_server(request, pieces):
+    """``pieces`` for the server ``request`` came through: read in the view's thread under ASGI."""
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return read_in_sync_thread(pieces)
+    return pieces
+
+
+def stream_list(request, rows, serialize, extra=None):
+    """
+    ``{'results': serialize(rows), **extra}`` rendered as the request's
+    JSON format, serialized a batch at a time. ``None`` when streaming is
+    off or the negotiated renderer is not a JSON one; ``rows`` is
+    untouched then.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    size = chunk_size()
+    if not size:
+        return None
+    if isinstance(renderer, ColumnarJSONRenderer):
+        writer = ColumnarListWriter(extra or {})
+    elif isinstance(renderer, JSONRenderer):
+        writer = ListWriter(extra or {})
+    else:
+        return None
+
+    rows = iter(rows)
+    first = list(islice(rows, size))
+    if len(first) < size:
+        return Response({'results': serialize(first), **(extra or {})})
+    pieces = writer.pieces(serialize(batch) for batch in chain([first], batches(rows, size)))
+    return StreamingHttpResponse(for_server(request, pieces), content_type=renderer.media_type)
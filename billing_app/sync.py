@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from .models import Bill
+from .serializers import BillSerializer
+
+
+# ==========================
+# OFFLINE BILL SYNC
+# ==========================
+# Terminals that lose their connection queue checkouts in IndexedDB, each
+# under a client-generated key, and post the queue to /api/bills/sync/
+# once they are back online. A key that was already billed (by an earlier
+# sync, a retried POST, or an earlier entry of the same batch) is reported
+# as a duplicate with the original invoice instead of being billed again.
+
+def max_batch():
+    return getattr(settings, 'BILL_SYNC_MAX_BATCH', 200)
+
+
+def billed(bill, status):
+    return {
+        'client_key': bill.client_key,
+        'status': status,
+        'invoice_no': bill.invoice_no,
+        'grand_total': bill.grand_total,
+    }
+
+
+def rejected(key, errors):
+    return {'client_key': key, 'status': 'rejected', 'errors': errors}
+
+
+def apply_bill(data, request, known=None):
+    """
+    Bill one checkout unless its ``client_key`` was billed before. Returns
+    a result dict whose status is ``created``, ``duplicate`` or
+    ``rejected``; ``known`` caches bills by key across a batch.
+    """
+    known = {} if known is None else known
+    # Anything but an object is left to the serializer, which rejects it
+    key = (data.get('client_key') or None) if isinstance(data, dict) else None
+    if key is not None:
+        bill = known.get(key) or Bill.objects.filter(client_key=key).first()
+        if bill is not None:
+            known[key] = bill
+            return billed(bill, 'duplicate')
+
+    serializer = BillSerializer(data=data, context={'request': request})
+    if not serializer.is_valid():
+        return rejected(key, serializer.errors)
+    try:
+        with transaction.atomic():
+            bill = serializer.save()
+    except serializers.ValidationError as exc:
+        return rejected(key, exc.detail)
+    except IntegrityError:
+        # A concurrent request billed the same key first
+        bill = Bill.objects.filter(client_key=key).first() if key else None
+        if bill is None:
+            raise
+        known[key] = bill
+        return billed(bill, 'duplicate')
+    if key is not None:
+        known[key] = bill
+    return billed(bill, 'created')
+
+
+def sync_bills(entries, request):
+    """Apply a queued batch in order, in one transaction with a savepoint per bill."""
+    keys = [entry.get('client_key') for entry in entries if isinstance(entry, dict)]
+    known = {
+        bill.client_key: bill
+        for bill in Bill.objects.filter(client_key__in=[k for k in keys if isinstance(k, str)])
+    }
+    results = []
+    with transaction.atomic():
+        for entry in entries:
+            key = entry.get('client_key') if isinstance(entry, dict) else None
+            if not isinstance(key, str) or not key.strip() or len(key) > 64:
+                key = key if isinstance(key, str) else None
+                results.append(rejected(key, {'client_key': 'A key of at most 64 characters is required.'}))
+                continue
+            results.append(apply_bill(entry, request, known))
+    return results
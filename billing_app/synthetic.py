@@ -0,0 +1,273 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.utils import timezone
+
+from .models import (
+    Bill, BillItem, Category, Customer, Product, ProductUnit, ProformaInvoice, ProformaItem, ReturnInvoice,
+    Service,
+)
+from .rollups import rebuild_sales_rollup
+
+
+# ==========================
+# SYNTHETIC DATA
+# ==========================
+# Realistic-looking shop data for benchmarks, written with bulk_create a
+# chunk at a time so millions of rows fit in constant memory. Document
+# numbers use their own SYN prefixes, so they never collide with the real
+# sequences, and created_at is spread over the requested number of days.
+# Synthetic customers have 8xxxxxxxxx numbers and documents are issued to
+# them at random, so most customers have a history. Handsets are units
+# with 86xxxxxxxxxxxxx IMEIs, spread over the mobile and tablet models.
+# Each call appends to whatever is already there.
+
+BRANDS = ['Samsung', 'Apple', 'Xiaomi', 'Vivo', 'Oppo', 'Realme', 'OnePlus', 'Nokia', 'Motorola', 'iQOO']
+KINDS = {
+    'Mobiles': ['Galaxy', 'iPhone', 'Note', 'Y', 'Reno', 'Narzo', 'Nord', 'G', 'Edge', 'Z'],
+    'Accessories': ['Charger', 'Cable', 'Earbuds', 'Back Cover', 'Tempered Glass', 'Power Bank'],
+    'Tablets': ['Tab', 'iPad', 'Pad'],
+    'Wearables': ['Watch', 'Band'],
+}
+SERVICE_TYPES = ['Screen replacement', 'Battery replacement', 'Software update', 'Charging port repair', 'Water damage']
+FIRST_NAMES = ['Ravi', 'Anil', 'Priya', 'Sneha', 'Arun', 'Divya', 'Karthik', 'Meena', 'Suresh', 'Lakshmi']
+LAST_NAMES = ['Kumar', 'Nair', 'Menon', 'Reddy', 'Sharma', 'Iyer', 'Das', 'Pillai']
+
+
+@contextmanager
+def explicit_created_at(*models):
+    """Let bulk_create keep the created_at values it is given."""
+    fields = [model._meta.get_field('created_at') for model in models]
+    try:
+        for field in fields:
+            field.auto_now_add = False
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Generator:
+    def __init__(self, seed=0, days=365, chunk_size=5000, stdout=None):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.chunk_size = chunk_size
+        self.stdout = stdout
+        self.now = timezone.now()
+        self.pool = None  # (customer id, phone, name) documents are issued to
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def moment(self):
+        return self.now - timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def customers(self, count):
+        offset = Customer.objects.filter(phone__startswith='8').count()
+        for start, size in self.chunks(count):
+            Customer.objects.bulk_create([
+                Customer(
+                    phone=f"8{n:09d}",
+                    name=f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}",
+                )
+                for n in range(offset + start, offset + start + size)
+            ], ignore_conflicts=True)
+        self.pool = None
+        self.log(f"customers: +{count}")
+
+    def customer(self):
+        """``(customer id, phone, name)`` of a random existing customer."""
+        if self.pool is None:
+            self.pool = list(Customer.objects.values_list('id', 'phone', 'name'))
+        return self.rng.choice(self.pool)
+
+    def cashiers(self, count=5):
+        users = []
+        for i in range(count):
+            user, _ = User.objects.get_or_create(username=f"synthetic{i}", defaults={'is_staff': True})
+            users.append(user)
+        return users
+
+    def chunks(self, total):
+        done = 0
+        while done < total:
+            size = min(self.chunk_size, total - done)
+            yield done, size
+            done += size
+
+    def products(self, count):
+        Category.objects.bulk_create([Category(name=name) for name in KINDS], ignore_conflicts=True)
+        offset = Product.objects.count()
+        for start, size in self.chunks(count):
+            rows = []
+            for n in range(offset + start, offset + start + size):
+                category = self.rng.choice(list(KINDS))
+                price = Decimal(self.rng.randrange(199, 150000))
+                rows.append(Product(
+                    name=f"{self.rng.choice(BRANDS)} {self.rng.choice(KINDS[category])} {n}",
+                    imei=f"35{n:013d}" if category in ('Mobiles', 'Tablets') else None,
+                    selling_price=price,
+                    purchase_price=(price * Decimal('0.85')).quantize(Decimal('0.01')),
+                    gst_percentage=18,
+                    category=category,
+                    stock=self.rng.randrange(0, 50),
+                    agency_name=f"{self.rng.choice(BRANDS)} Distributors",
+                ))
+            Product.objects.bulk_create(rows)
+        self.log(f"products: +{count}")
+
+    def units(self, count):
+        models = list(Product.objects.filter(category__in=('Mobiles', 'Tablets')).values_list('id', flat=True))
+        if not models:
+            return
+        offset = ProductUnit.objects.filter(imei__startswith='86').count()
+        for start, size in self.chunks(count):
+            rows, counts = [], {}
+            for n in range(offset + start, offset + start + size):
+                pk = self.rng.choice(models)
+                counts[pk] = counts.get(pk, 0) + 1
+                rows.append(ProductUnit(product_id=pk, imei=f"86{n:013d}"))
+            by_count = {}
+            for pk, added in counts.items():
+                by_count.setdefault(added, []).append(pk)
+            with transaction.atomic():
+                ProductUnit.objects.bulk_create(rows)
+                for added, pks in by_count.items():
+                    Product.objects.filter(pk__in=pks).update(stock=F('stock') + added)
+        self.log(f"units: +{count}")
+
+    def product_prices(self):
+        return list(Product.objects.values_list('id', 'selling_price', 'gst_percentage'))
+
+    def documents(self, model, item_model, parent_field, count, build, number_field, prefix):
+        """Bulk-create ``count`` documents with 1-4 lines each."""
+        catalog = self.product_prices()
+        users = self.cashiers()
+        offset = model.objects.filter(**{f'{number_field}__startswith': f'{prefix}-'}).count()
+        with explicit_created_at(model):
+            for start, size in self.chunks(count):
+                with transaction.atomic():
+                    docs, lines = [], []
+                    for n in range(offset + start, offset + start + size):
+                        picked = self.rng.sample(catalog, k=min(len(catalog), self.rng.randint(1, 4)))
+                        doc_lines = []
+                        subtotal = gst = Decimal('0')
+                        for product_id, price, gst_percentage in picked:
+                            quantity = self.rng.randint(1, 3)
+                            total = price * quantity
+                            subtotal += total
+                            gst += (total * Decimal(str(gst_percentage)) / 100).quantize(Decimal('0.01'))
+                            doc_lines.append((product_id, quantity, price, total))
+                        customer_id, phone, name = self.customer()
+                        doc = build(name, phone, subtotal, gst)
+                        doc.customer_id = customer_id
+                        setattr(doc, number_field, f"{prefix}-{n:09d}")
+                        doc.created_by = self.rng.choice(users)
+                        doc.created_at = self.moment()
+                        docs.append(doc)
+                        lines.append(doc_lines)
+                    model.objects.bulk_create(docs)
+                    item_model.objects.bulk_create([
+                        item_model(**{parent_field: doc}, product_id=product_id, quantity=quantity, price=price, total=total)
+                        for doc, doc_lines in zip(docs, lines)
+                        for product_id, quantity, price, total in doc_lines
+                    ])
+        self.log(f"{model._meta.verbose_name_plural}: +{count}")
+
+    def bills(self, count):
+        self.documents(
+            Bill, BillItem, 'bill', count,
+            lambda name, phone, subtotal, gst: Bill(
+                customer_name=name, customer_phone=phone,
+                subtotal=subtotal, gst_amount=gst, grand_total=subtotal + gst,
+            ),
+            'invoice_no', 'SYN',
+        )
+
+    def proformas(self, count):
+        self.documents(
+            ProformaInvoice, ProformaItem, 'proforma', count,
+            lambda name, phone, subtotal, gst: ProformaInvoice(
+                customer_name=name, customer_phone=phone,
+                subtotal=subtotal, gst_amount=gst, grand_total=subtotal + gst,
+            ),
+            'proforma_no', 'SYNPF',
+        )
+
+    def services(self, count):
+        users = self.cashiers()
+        offset = Service.objects.filter(service_id__startswith='SYNS-').count()
+        with explicit_created_at(Service):
+            for start, size in self.chunks(count):
+                rows = []
+                for n in range(offset + start, offset + start + size):
+                    customer_id, phone, name = self.customer()
+                    rows.append(Service(
+                        service_id=f"SYNS-{n:09d}",
+                        service_invoice_no=f"SYNSI-{n:09d}",
+                        customer_name=name,
+                        customer_phone=phone,
+                        customer_id=customer_id,
+                        service_type=self.rng.choice(SERVICE_TYPES),
+                        service_price=Decimal(self.rng.randrange(300, 8000)),
+                        created_by=self.rng.choice(users),
+                        created_at=self.moment(),
+                    ))
+                Service.objects.bulk_create(rows)
+        self.log(f"services: +{count}")
+
+    def returns(self, count):
+        bounds = Bill.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            return
+        span = range(bounds['low'], bounds['high'] + 1)
+        picked = self.rng.sample(span, k=min(count, len(span)))
+        created = 0
+        with explicit_created_at(ReturnInvoice):
+            for start, size in self.chunks(len(picked)):
+                names = dict(
+                    BillItem.objects.filter(bill_id__in=picked[start:start + size])
+                    .values_list('bill_id', 'product__name')
+                )
+                rows = [
+                    ReturnInvoice(
+                        invoice_id=bill_id,
+                        product_name=name,
+                        quantity=1,
+                        return_type=self.rng.choice(['refund', 'replace']),
+                        reason='Synthetic return',
+                        created_at=self.moment(),
+                    )
+                    for bill_id, name in names.items()
+                ]
+                ReturnInvoice.objects.bulk_create(rows)
+                created += len(rows)
+        self.log(f"returns: +{created}")
+
+    def run(self, products=0, bills=0, services=0, proformas=0, returns=0, customers=None, units=0):
+        if customers is None:
+            # Regulars: each customer comes back about three times
+            customers = (bills + services + proformas) // 3 if bills or services or proformas else 0
+        if customers or ((bills or services or proformas) and not Customer.objects.exists()):
+            self.customers(max(customers, 1))
+        if products:
+            self.products(products)
+        if units:
+            self.units(units)
+        if bills:
+            self.bills(bills)
+        if services:
+            self.services(services)
+        if proformas:
+            self.proformas(proformas)
+        if returns:
+            self.returns(returns)
+        if bills or services:
+            rebuild_sales_rollup()
+            self.log("daily sales rollup rebuilt")
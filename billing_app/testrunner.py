@@ -0,0 +1,17 @@
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Keeps the suite's metrics snapshots out of the METRICS_DIR that real workers share."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.metrics_dir = tempfile.TemporaryDirectory()
+        settings.METRICS_DIR = self.metrics_dir.name
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self.metrics_dir.cleanup()
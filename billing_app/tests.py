@@ -1,3 +1,1241 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .benchmarks import percentile, regressions
+from .customers import encode_history_cursor, normalize_phone
+from .models import (
+    Category, Customer, DailySales, Product, ProductTombstone, ProductUnit, Bill, BillItem, ProformaInvoice,
+    ProformaItem, ReturnInvoice, Service,
+)
+from .numbering import NumberAllocator, financial_year, format_number, next_number
+from .pagination import encode_position
+from .queryplans import api_view_names, audit, audit_cases
+from .renderers import packb
+from .serializers import BillSerializer, ProductSerializer, ServiceSerializer
+from .consumers import TerminalConsumer
+from .fieldsets import BILLS, PRODUCTS, SERVICES
+from .live import publisher
+from .metrics import registry
+from .middleware import ENCODERS, choose_encoding
+from .search import product_index
+from .storage import precache_entries
+from .synthetic import Generator
+
+
+class ListQueryCountTests(TestCase):
+    """List endpoints must cost a fixed number of queries, not one per row."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("staff", password="pass", is_staff=True)
+        self.client.force_login(self.user)
+        self.products = [
+            Product.objects.create(
+                name=f"Phone {i}",
+                selling_price=Decimal("100.00"),
+                purchase_price=Decimal("80.00"),
+                stock=1000,
+            )
+            for i in range(3)
+        ]
+
+    def create_bill(self):
+        bill = Bill.objects.create(customer_name="Customer", customer_phone="9999999999", created_by=self.user)
+        for product in self.products:
+            BillItem.objects.create(
+                bill=bill, product=product, quantity=1, price=product.selling_price, total=product.selling_price
+            )
+        return bill
+
+    def create_proforma(self, related_bill=None):
+        proforma = ProformaInvoice.objects.create(
+            customer_name="Customer",
+            subtotal=Decimal("300.00"),
+            gst_amount=Decimal("0"),
+            grand_total=Decimal("300.00"),
+            created_by=self.user,
+            related_bill=related_bill,
+        )
+        for product in self.products:
+            ProformaItem.objects.create(
+                proforma=proforma, product=product, quantity=1, price=product.selling_price, total=product.selling_price
+            )
+        return proforma
+
+    def test_bill_list_query_count_is_constant(self):
+        # session + user + bills/creators + items/products
+        for count in (1, 10):
+            while Bill.objects.count() < count:
+                self.create_bill()
+            with self.assertNumQueries(4):
+                response = self.client.get("/api/bills/?fields=all&expand=items")
+            self.assertEqual(len(response.json()["results"]), count)
+            self.assertEqual(len(response.json()["results"][0]["items"]), 3)
+            self.assertEqual(response.json()["results"][0]["created_by"], "staff")
+
+    def test_bill_list_page_query_count_is_constant(self):
+        for _ in range(10):
+            self.create_bill()
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/bills/?page_size=5&expand=items")
+        self.assertEqual(len(response.json()["results"]), 5)
+
+    def test_proforma_list_query_count_is_constant(self):
+        # session + user + proformas/creators + proforma items + bills + bill items
+        for count in (1, 10):
+            while ProformaInvoice.objects.count() < count:
+                self.create_proforma(related_bill=self.create_bill())
+            with self.assertNumQueries(6):
+                response = self.client.get("/api/proforma/?fields=all&expand=items,related_bill")
+            results = response.json()["results"]
+            self.assertEqual(len(results), count)
+            self.assertEqual(len(results[0]["items"]), 3)
+            self.assertEqual(len(results[0]["related_bill"]["items"]), 3)
+
+    def test_summaries_cost_one_query(self):
+        # session + user + the rows themselves
+        for _ in range(10):
+            self.create_proforma(related_bill=self.create_bill())
+        for url in ("/api/bills/", "/api/proforma/", "/api/services/"):
+            with self.subTest(url=url), self.assertNumQueries(3):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class CursorPaginationTests(TestCase):
+    """Keyset pages cover every row once; bad cursors and page sizes are a 400."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("staff", password="pass", is_staff=True))
+        now = timezone.now()
+        for i in range(7):
+            bill = Bill.objects.create(invoice_no=f"INV-P-{i}", customer_name="C", customer_phone="9")
+            # Two bills per timestamp: ties are broken by id
+            Bill.objects.filter(pk=bill.pk).update(created_at=now - timedelta(minutes=i // 2))
+
+    def test_pages_round_trip_every_row_once(self):
+        seen, cursor = [], None
+        while True:
+            params = {"page_size": 2, **({"cursor": cursor} if cursor else {})}
+            body = self.client.get("/api/bills/", params).json()
+            self.assertLessEqual(len(body["results"]), 2)
+            seen.extend(row["invoice_no"] for row in body["results"])
+            cursor = body["next"]
+            if not cursor:
+                break
+        expected = Bill.objects.order_by("-created_at", "-id").values_list("invoice_no", flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_page_size_bounds(self):
+        for bad in ("0", "-3", "ten"):
+            with self.subTest(page_size=bad):
+                self.assertEqual(self.client.get("/api/bills/", {"page_size": bad}).status_code, 400)
+        with override_settings(BILLING_MAX_PAGE_SIZE=3):
+            body = self.client.get("/api/bills/", {"page_size": 1000}).json()
+        self.assertEqual(len(body["results"]), 3)
+        self.assertIsNotNone(body["next"])
+
+    def test_malformed_cursors_are_rejected(self):
+        huge = encode_position(timezone.now(), 2 ** 64)
+        for bad in ("garbage", "e30", encode_position(timezone.now(), 0), huge):
+            with self.subTest(cursor=bad):
+                self.assertEqual(self.client.get("/api/bills/", {"cursor": bad}).status_code, 400)
+
+
+class ListFilterTests(TestCase):
+    """Invoice list filters, and the 400 for dates that cannot be read."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user("staff", password="pass", is_staff=True)
+        self.other = User.objects.create_user("other", password="pass", is_staff=True)
+        self.client.force_login(self.staff)
+        self.old = Bill.objects.create(
+            invoice_no="INV-OLD-1", customer_name="Ravi Kumar", customer_phone="9000000001", created_by=self.staff,
+        )
+        Bill.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timedelta(days=10))
+        self.new = Bill.objects.create(
+            invoice_no="INV-NEW-1", customer_name="Priya Nair", customer_phone="9000000002", created_by=self.other,
+        )
+
+    def invoices(self, **params):
+        response = self.client.get("/api/bills/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["invoice_no"] for row in response.json()["results"]]
+
+    def test_each_filter(self):
+        today = timezone.localdate().isoformat()
+        self.assertEqual(self.invoices(start=today), ["INV-NEW-1"])
+        self.assertEqual(self.invoices(end=(timezone.localdate() - timedelta(days=1)).isoformat()), ["INV-OLD-1"])
+        self.assertEqual(self.invoices(customer="rav"), ["INV-OLD-1"])
+        self.assertEqual(self.invoices(phone="9000000002"), ["INV-NEW-1"])
+        self.assertEqual(self.invoices(invoice_no="inv-old-1"), ["INV-OLD-1"])
+        self.assertEqual(self.invoices(created_by="other"), ["INV-NEW-1"])
+        self.assertEqual(self.invoices(created_by=str(self.staff.pk)), ["INV-OLD-1"])
+
+    def test_bad_dates_are_rejected(self):
+        for url in ("/api/bills/", "/api/services/", "/api/bills/export/", "/api/reports/", "/api/reports/series/"):
+            for value in ("yesterday", "2024-13-01", "2024-02-30"):
+                with self.subTest(url=url, value=value):
+                    response = self.client.get(url, {"start": value})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn("start", response.json())
+
+    def test_first_and_last_representable_days(self):
+        self.assertEqual(self.invoices(start="0001-01-01", end="9999-12-31"), ["INV-NEW-1", "INV-OLD-1"])
+        for url in ("/api/services/", "/api/proforma/", "/api/bills/export/", "/api/reports/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, {"start": "0001-01-01", "end": "9999-12-31"}).status_code, 200)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("staff", password="pass", is_staff=True)
+        self.client.force_login(self.user)
+        self.phone = Product.objects.create(
+            name="Phone", selling_price=Decimal("100.00"), purchase_price=Decimal("80.00"),
+            gst_percentage=18, stock=5,
+        )
+        self.case = Product.objects.create(
+            name="Case", selling_price=Decimal("10.00"), purchase_price=Decimal("5.00"), stock=1,
+        )
+
+    def post_bill(self, items):
+        return self.client.post(
+            "/api/bills/create/",
+            {"customer_name": "Customer", "customer_phone": "9999999999", "items": items},
+            content_type="application/json",
+        )
+
+    def test_checkout_deducts_stock_and_totals(self):
+        response = self.post_bill([
+            {"product_id": self.phone.id, "quantity": 2},
+            {"product_id": self.case.id, "quantity": 1},
+            {"product_id": self.phone.id, "quantity": 1},
+        ])
+        self.assertEqual(response.status_code, 201)
+        bill = Bill.objects.get(invoice_no=response.json()["invoice_no"])
+        self.assertEqual(bill.items.count(), 3)
+        self.assertEqual(bill.subtotal, Decimal("310.00"))
+        self.assertEqual(bill.grand_total, Decimal("364.00"))
+        self.phone.refresh_from_db()
+        self.case.refresh_from_db()
+        self.assertEqual((self.phone.stock, self.case.stock), (2, 0))
+
+    def test_insufficient_stock_rolls_back_whole_bill(self):
+        response = self.post_bill([
+            {"product_id": self.phone.id, "quantity": 1},
+            {"product_id": self.case.id, "quantity": 2},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Bill.objects.exists())
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.stock, 5)
+
+
+class SQLitePragmaTests(TestCase):
+    """Every new SQLite connection gets SQLITE_PRAGMAS."""
+
+    def pragmas(self, *names):
+        fresh = connections.create_connection("default")
+        try:
+            with fresh.cursor() as cursor:
+                return [cursor.execute(f"PRAGMA {name}").fetchone()[0] for name in names]
+        finally:
+            fresh.close()
+
+    def test_settings_pragmas_are_applied(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        # synchronous is NORMAL (1) only under WAL, FULL (2) otherwise; temp_store MEMORY is 2
+        journal_mode = self.pragmas("journal_mode")[0]
+        self.assertEqual(journal_mode, "wal" if os.environ.get("SQLITE_WAL") == "1" else "delete")
+        synchronous = 1 if journal_mode == "wal" else 2
+        self.assertEqual(self.pragmas("synchronous", "busy_timeout", "temp_store"), [synchronous, 20000, 2])
+        with override_settings(SQLITE_PRAGMAS={"synchronous": "OFF", "busy_timeout": 1234}):
+            self.assertEqual(self.pragmas("synchronous", "busy_timeout"), [0, 1234])
+
+
+class BillSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("staff", password="pass", is_staff=True)
+        self.client.force_login(self.user)
+        self.phone = Product.objects.create(
+            name="Phone", selling_price=Decimal("100.00"), purchase_price=Decimal("80.00"), stock=5,
+        )
+
+    def sync(self, bills):
+        return self.client.post("/api/bills/sync/", {"bills": bills}, content_type="application/json")
+
+    def test_checkout_body_must_be_an_object(self):
+        response = self.client.post("/api/bills/create/", [{"customer_name": "A"}], content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Expected a dictionary", str(response.json()))
+
+    def test_replaying_a_batch_bills_nothing_twice(self):
+        batch = [
+            {"client_key": "t1-a", "customer_name": "A", "customer_phone": "1",
+             "items": [{"product_id": self.phone.id, "quantity": 2}]},
+            {"client_key": "t1-b", "customer_name": "B", "customer_phone": "2",
+             "items": [{"product_id": self.phone.id, "quantity": 9}]},
+            {"client_key": "t1-a", "customer_name": "A", "customer_phone": "1",
+             "items": [{"product_id": self.phone.id, "quantity": 2}]},
+        ]
+        first = self.sync(batch).json()["results"]
+        self.assertEqual([r["status"] for r in first], ["created", "rejected", "duplicate"])
+        self.assertEqual(first[2]["invoice_no"], first[0]["invoice_no"])
+
+        state = (Bill.objects.count(), BillItem.objects.count(), DailySales.objects.get().bill_count)
+        second = self.sync(batch).json()["results"]
+        self.assertEqual([r["status"] for r in second], ["duplicate", "rejected", "duplicate"])
+        self.assertEqual(second[0]["invoice_no"], first[0]["invoice_no"])
+        self.assertEqual((Bill.objects.count(), BillItem.objects.count(), DailySales.objects.get().bill_count), state)
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.stock, 3)
+
+    def test_retried_create_returns_the_original_invoice(self):
+        body = {"client_key": "k1", "customer_name": "A", "customer_phone": "1",
+                "items": [{"product_id": self.phone.id, "quantity": 1}]}
+        first = self.client.post("/api/bills/create/", body, content_type="application/json")
+        retry = self.client.post("/api/bills/create/", body, content_type="application/json")
+        self.assertEqual((first.status_code, retry.status_code), (201, 200))
+        self.assertEqual(first.json()["invoice_no"], retry.json()["invoice_no"])
+        self.assertEqual(Bill.objects.count(), 1)
+
+
+class ProductSuggestTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("staff", password="pass", is_staff=True)
+        self.client.force_login(self.user)
+        for name, imei, stock in [
+            ("Redmi Note 12", "861234567890123", 3),
+            ("Note Pad Cover", "", 5),
+            ("Redmi 12C", "869999999999999", 0),
+            ("Samsung Galaxy Note", "", 2),
+        ]:
+            Product.objects.create(
+                name=name, imei=imei, selling_price=Decimal("10.00"), purchase_price=Decimal("5.00"), stock=stock
+            )
+        product_index.rebuild()
+
+    def suggest(self, q):
+        response = self.client.get("/api/products/suggest/", {"q": q})
+        return [p["name"] for p in response.json()["results"]]
+
+    def test_ranks_prefix_before_word_before_substring(self):
+        self.assertEqual(self.suggest("note"), ["Note Pad Cover", "Redmi Note 12", "Samsung Galaxy Note"])
+        # substring-only matches come back unordered within their tier
+        self.assertCountEqual(self.suggest("ote"), ["Note Pad Cover", "Redmi Note 12", "Samsung Galaxy Note"])
+
+    def test_skips_out_of_stock_and_matches_imei(self):
+        self.assertEqual(self.suggest("redmi"), ["Redmi Note 12"])
+        self.assertEqual(self.suggest("4567"), ["Redmi Note 12"])
+
+    def test_index_follows_product_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(
+                name="Redmi 13", selling_price=Decimal("10.00"), purchase_price=Decimal("5.00"), stock=1
+            )
+            Product.objects.filter(name="Redmi Note 12").delete()
+        self.assertEqual(self.suggest("redmi"), ["Redmi 13"])
+
+    def test_delta_read_picks_up_late_commits(self):
+        # Another worker stamped this write first but committed it after a
+        # later-stamped one had moved the high water mark past it
+        stamped = product_index.high_water - timedelta(seconds=2)
+        Product.objects.filter(name="Redmi 12C").update(stock=4, updated_at=stamped)
+        product_index.synced_at = 0
+        self.assertEqual(self.suggest("redmi"), ["Redmi 12C", "Redmi Note 12"])
+
+
+class ReportsRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(
+            name="Phone", selling_price=Decimal("100.00"), purchase_price=Decimal("80.00"),
+            gst_percentage=18, stock=10,
+        )
+
+    def test_reports_follow_checkout_services_and_rebuild(self):
+        for _ in range(2):
+            self.client.post(
+                "/api/bills/create/",
+                {"customer_name": "C", "customer_phone": "1", "items": [{"product_id": self.product.id, "quantity": 1}]},
+                content_type="application/json",
+            )
+        self.client.post(
+            "/api/services/create/",
+            {"customer_name": "C", "customer_phone": "1", "service_type": "Screen", "service_price": "50.00"},
+            content_type="application/json",
+        )
+        expected = {
+            "total_sales": 236.0, "service_income": 50.0, "daily_sales": 236.0,
+            "monthly_sales": 236.0, "total_revenue": 286.0, "bill_count": 2, "service_count": 1,
+        }
+        data = self.client.get("/api/reports/").json()
+        self.assertEqual({k: data[k] for k in expected}, expected)
+
+        call_command("rebuild_sales_rollup", stdout=StringIO())
+        data = self.client.get("/api/reports/").json()
+        self.assertEqual({k: data[k] for k in expected}, expected)
+
+        data = self.client.get("/api/reports/", {"start": "2000-01-01", "end": "2000-01-31"}).json()
+        self.assertEqual((data["total_sales"], data["daily_sales"]), (0.0, 236.0))
+
+    def test_series_is_columnar_with_empty_buckets_filled(self):
+        self.client.post(
+            "/api/bills/create/",
+            {"customer_name": "C", "customer_phone": "1", "items": [{"product_id": self.product.id, "quantity": 1}]},
+            content_type="application/json",
+        )
+        today = timezone.localdate()
+        start = today - timedelta(days=2)
+        data = self.client.get("/api/reports/series/", {"start": start.isoformat(), "end": today.isoformat()}).json()
+        self.assertEqual(data["periods"], [(start + timedelta(days=i)).isoformat() for i in range(3)])
+        self.assertEqual(data["bills"], [0.0, 0.0, 118.0])
+        self.assertEqual(data["bill_count"], [0, 0, 1])
+
+        data = self.client.get("/api/reports/series/", {"bucket": "month", "start": today.isoformat()}).json()
+        self.assertEqual(data["periods"], [today.replace(day=1).isoformat()])
+        self.assertEqual(self.client.get("/api/reports/series/", {"bucket": "hour"}).status_code, 400)
+
+    def test_series_stops_at_the_first_and_last_representable_days(self):
+        # The default window would start before date.min
+        data = self.client.get("/api/reports/series/", {"bucket": "month", "end": "0001-01-02"}).json()
+        self.assertEqual(data["periods"], ["0001-01-01"])
+        for bucket in ("day", "week", "month"):
+            with self.subTest(bucket=bucket):
+                response = self.client.get(
+                    "/api/reports/series/", {"bucket": bucket, "start": "9999-12-30", "end": "9999-12-31"},
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["periods"][-1][:4], "9999")
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+        product = Product.objects.create(
+            name="Phone", imei="123", selling_price=Decimal("100.00"), purchase_price=Decimal("80.00"), stock=10,
+        )
+        for name in ("Ravi", "Anil"):
+            bill = Bill.objects.create(customer_name=name, customer_phone="1", created_by=self.user, grand_total=100)
+            BillItem.objects.create(bill=bill, product=product, quantity=2, price=50, total=100)
+
+    def read_csv(self, response):
+        self.assertEqual(response["Content-Type"], "text/csv")
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_bill_export_streams_filtered_rows(self):
+        lines = self.read_csv(self.client.get("/api/bills/export/", {"customer": "ra"}))
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("INV-"))
+        self.assertIn(",Ravi,1,", lines[1])
+
+    def test_bill_item_export_has_one_row_per_item(self):
+        lines = self.read_csv(self.client.get("/api/bills/export/", {"items": "1"}))
+        self.assertEqual(len(lines), 3)
+        self.assertIn(",Phone,123,2,50.00,100.00,admin", lines[1])
+
+    def test_cells_that_look_like_formulas_are_escaped(self):
+        Bill.objects.create(
+            customer_name='=HYPERLINK("http://x","y")', customer_phone="+911", created_by=self.user, grand_total=-5,
+        )
+        lines = self.read_csv(self.client.get("/api/bills/export/", {"customer": "=hyp"}))
+        self.assertIn(""","'=HYPERLINK(""http://x"",""y"")",'+911,""", lines[1])
+        self.assertIn(",-5.00,", lines[1])  # numbers are left alone
+
+    async def test_asgi_streams_asynchronously(self):
+        response = await self.async_client.get("/api/bills/export/")
+        self.assertTrue(response.is_async)
+        body = b"".join([piece async for piece in response.streaming_content])
+        self.assertEqual(len(body.decode().splitlines()), 3)
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pass", is_staff=True))
+
+    def test_csv_import_reports_bad_rows_and_keeps_the_rest(self):
+        body = (
+            "name,imei,selling_price,purchase_price,category,stock\n"
+            "Phone A,111,100.00,80.00,Mobiles,5\n"
+            ",222,100.00,80.00,Mobiles,5\n"
+            "Phone C,333,abc,80.00,Tablets,1\n"
+            "Phone D,444,50.00,40.00,Tablets,2\n"
+        )
+        response = self.client.post("/api/products/bulk/", body, content_type="text/csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual([e["row"] for e in response.data["errors"]], [2, 3])
+        self.assertEqual(sorted(Product.objects.values_list("imei", flat=True)), ["111", "444"])
+        self.assertEqual(sorted(Category.objects.values_list("name", flat=True)), ["Mobiles", "Tablets"])
+
+    def test_rows_that_would_not_fit_the_columns_are_reported(self):
+        rows = [
+            {"name": "Fits", "selling_price": "10", "purchase_price": "5", "category": "c" * 100},
+            {"name": "Long IMEI", "imei": "8" * 51, "selling_price": "10", "purchase_price": "5"},
+            {"name": "Long category", "category": "c" * 101, "selling_price": "10", "purchase_price": "5"},
+            {"name": "Long agency", "agency_name": "a" * 201, "selling_price": "10", "purchase_price": "5"},
+            {"name": "NaN GST", "gst_percentage": "nan", "selling_price": "10", "purchase_price": "5"},
+            {"name": "Infinite GST", "gst_percentage": "inf", "selling_price": "10", "purchase_price": "5"},
+            {"name": "Huge stock", "stock": str(2 ** 31), "selling_price": "10", "purchase_price": "5"},
+        ]
+        response = self.client.post("/api/products/bulk/", rows, content_type="application/json")
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(
+            [(e["row"], list(e["errors"])) for e in response.data["errors"]],
+            [(2, ["imei"]), (3, ["category"]), (4, ["agency_name"]),
+             (5, ["gst_percentage"]), (6, ["gst_percentage"]), (7, ["stock"])],
+        )
+        self.assertEqual(Product.objects.get().category, "c" * 100)
+
+    def test_stock_deltas_never_go_negative(self):
+        a = Product.objects.create(name="A", imei="1", selling_price=10, purchase_price=5, stock=5)
+        b = Product.objects.create(name="B", imei="2", selling_price=10, purchase_price=5, stock=1)
+        body = "\n".join([
+            json.dumps({"id": a.id, "delta": 3}),
+            json.dumps({"imei": "2", "delta": -4}),
+            json.dumps({"imei": "missing", "delta": 1}),
+        ])
+        response = self.client.post("/api/products/stock/bulk/", body, content_type="application/x-ndjson")
+        self.assertEqual(response.data["updated"], 1)
+        self.assertEqual(
+            [(e["row"], e["errors"]) for e in response.data["errors"]],
+            [(3, {"imei": "Product not found"}), (2, {"delta": "Insufficient stock"})],
+        )
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((a.stock, b.stock), (8, 1))
+
+    def test_stock_deltas_stay_within_the_column(self):
+        a = Product.objects.create(name="A", selling_price=10, purchase_price=5, stock=5)
+        body = "\n".join(json.dumps({"id": a.id, "delta": delta}) for delta in (10 ** 20, 2 ** 40, 2 ** 31 - 1, 1))
+        response = self.client.post("/api/products/stock/bulk/", body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["updated"], 0)
+        self.assertEqual(
+            sorted((e["row"], list(e["errors"])) for e in response.data["errors"]),
+            [(1, ["delta"]), (2, ["delta"]), (3, ["delta"]), (4, ["delta"])],
+        )
+        a.refresh_from_db()
+        self.assertEqual(a.stock, 5)
+
+
+class CatalogSyncTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pass", is_staff=True))
+        self.phone = Product.objects.create(name="Phone", selling_price=10, purchase_price=5, stock=5)
+        self.case = Product.objects.create(name="Case", selling_price=2, purchase_price=1, stock=9)
+
+    def test_unchanged_catalog_answers_304(self):
+        response = self.client.get("/api/products/")
+        self.assertEqual(len(response.data["results"]), 2)
+        etag = response["ETag"]
+
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        Product.objects.filter(pk=self.case.pk).update(stock=8, updated_at=timezone.now())
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_since_returns_only_changes_and_tombstones(self):
+        old = timezone.now() - timedelta(minutes=5)
+        Product.objects.update(updated_at=old)
+        version = self.client.get("/api/products/").data["version"]
+
+        self.case.stock = 3
+        self.case.save()
+        phone_id = self.phone.id
+        self.phone.delete()
+
+        response = self.client.get("/api/products/", {"since": version})
+        self.assertEqual([p["id"] for p in response.data["results"]], [self.case.id])
+        self.assertEqual(response.data["deleted"], [phone_id])
+        self.assertGreater(int(response.data["version"]), int(version))
+
+        response = self.client.get("/api/products/", {"since": response.data["version"]})
+        self.assertEqual(response.data["deleted"], [phone_id])  # still inside the grace window
+
+    def test_too_old_version_resets_to_full_catalog(self):
+        response = self.client.get("/api/products/", {"since": "1"})
+        self.assertTrue(response.data["reset"])
+        self.assertEqual(len(response.data["results"]), 2)
+        for bad in ("x", "-1", "99999999999999999999999", str(10 ** 18)):
+            with self.subTest(since=bad):
+                self.assertEqual(self.client.get("/api/products/", {"since": bad}).status_code, 400)
+
+
+class ServiceWorkerTests(TestCase):
+    def test_precache_lists_app_assets_and_versions_by_hash(self):
+        names = {
+            "js/app.js": "/static/js/app.1a2b3c4d5e6f.js",
+            "css/style.css": "/static/css/style.0f9e8d7c6b5a.css",
+            "admin/js/core.js": "/static/admin/js/core.111111111111.js",
+            "sw.js": "/static/sw.222222222222.js",
+        }
+        entries = precache_entries(names)
+        self.assertEqual(entries["urls"], ["/static/css/style.0f9e8d7c6b5a.css", "/static/js/app.1a2b3c4d5e6f.js"])
+
+        names["js/app.js"] = "/static/js/app.999999999999.js"
+        self.assertNotEqual(precache_entries(names)["version"], entries["version"])
+
+    def test_worker_is_served_from_root_with_precache(self):
+        response = self.client.get("/sw.js")
+        self.assertEqual(response["Service-Worker-Allowed"], "/")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertTrue(response.content.startswith(b"const PRECACHE = {"))
+        self.assertRegex(response.content, rb"/static/js/app\.([0-9a-f]{12}\.)?js")
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    LIVE_COALESCE_SECONDS=60,
+)
+class LiveUpdateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("staff", password="pass", is_staff=True)
+        self.client.force_login(self.user)
+        self.phone = Product.objects.create(name="Phone", selling_price=10, purchase_price=5, stock=5)
+        self.case = Product.objects.create(name="Case", selling_price=2, purchase_price=1, stock=9)
+        if publisher.timer is not None:
+            publisher.timer.cancel()
+        publisher.take()  # drop anything left over from other tests
+
+    async def connect(self, user):
+        """Open a terminal socket; returns ``(communicator, accepted)``."""
+        scope = {"type": "websocket", "path": "/ws/terminals/", "user": user}
+        terminal = ApplicationCommunicator(TerminalConsumer.as_asgi(), scope)
+        await terminal.send_input({"type": "websocket.connect"})
+        reply = await terminal.receive_output()
+        return terminal, reply["type"] == "websocket.accept"
+
+    async def receive_json(self, terminal):
+        return json.loads((await terminal.receive_output())["text"])
+
+    def flush(self):
+        """Send the pending batch now instead of when the coalescing timer fires."""
+        if publisher.timer is not None:
+            publisher.timer.cancel()
+        publisher.flush()
+
+    def test_anonymous_terminal_is_refused(self):
+        async def run():
+            _, accepted = await self.connect(AnonymousUser())
+            return accepted
+        self.assertFalse(async_to_sync(run)())
+
+    def test_writes_reach_terminals_as_one_coalesced_batch(self):
+        case_id = self.case.id
+
+        @sync_to_async
+        def checkout_then_delete():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    "/api/bills/create/",
+                    {"customer_name": "A", "customer_phone": "1",
+                     "items": [{"product_id": self.phone.id, "quantity": 2}]},
+                    content_type="application/json",
+                )
+            with self.captureOnCommitCallbacks(execute=True):
+                self.case.delete()
+            self.flush()
+
+        async def run():
+            terminal, accepted = await self.connect(self.user)
+            self.assertTrue(accepted)
+            await checkout_then_delete()
+            batch = await self.receive_json(terminal)
+            self.assertTrue(await terminal.receive_nothing())
+            await terminal.send_input({"type": "websocket.disconnect", "code": 1000})
+            await terminal.wait()
+            return batch
+
+        batch = async_to_sync(run)()
+        self.assertEqual([(s["id"], s["stock"]) for s in batch["stock"]], [(self.phone.id, 3)])
+        self.assertEqual(batch["deleted"], [case_id])
+        self.assertEqual([b["customer_name"] for b in batch["bills"]], ["A"])
+
+
+class RequestTimingTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pass", is_staff=True))
+
+    def test_server_timing_reports_queries(self):
+        response = self.client.get("/api/categories/")
+        self.assertRegex(response["Server-Timing"], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+    @override_settings(REQUEST_SLOW_MS=0)
+    def test_slow_request_log_names_repeated_queries(self):
+        product = Product.objects.create(name="Phone", selling_price=10, purchase_price=5, stock=5)
+
+        def n_plus_one():
+            for _ in range(3):
+                Product.objects.get(pk=product.pk)
+
+        with self.assertLogs("billing_app.requests", "WARNING") as logs, \
+                mock.patch("billing_app.views.catalog.latest_change", side_effect=n_plus_one):
+            self.client.get("/api/products/")
+        self.assertIn("Slow request GET /api/products/ (product_list)", logs.output[0])
+        self.assertIn("3x", logs.output[0])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        override = override_settings(METRICS_DIR=self.dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        registry.counters.clear()  # drop counts left over from other tests
+        registry.histograms.clear()
+        self.user = User.objects.create_user("admin", password="pass", is_staff=True)
+
+    def sample(self, text, line_start):
+        return next(float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(line_start))
+
+    def snapshot(self, name, bills, gauges=None):
+        Path(self.dir.name, f"{name}.json").write_text(json.dumps({
+            "pid": int(name.split("-")[0]),
+            "counters": {"billing_bills_created_total\t": bills},
+            "histograms": {},
+            "gauges": gauges or {},
+        }))
+
+    def test_exited_workers_are_folded_into_the_aggregate(self):
+        self.client.force_login(self.user)
+        self.snapshot("999999999-1", 4)
+        # An earlier worker whose pid this process has since been given
+        self.snapshot(f"{os.getpid()}-1", 3)
+        for _ in range(2):  # folding twice must not count twice
+            text = self.client.get("/metrics").content.decode()
+            self.assertEqual(self.sample(text, "billing_bills_created_total "), 7)
+        self.assertCountEqual(
+            [path.name for path in Path(self.dir.name).glob("*.json")],
+            ["aggregate.json", f"{registry.pid}-{registry.started}.json"],
+        )
+
+    def test_metrics_sum_all_worker_snapshots(self):
+        self.client.force_login(self.user)
+        product = Product.objects.create(name="Phone", selling_price=10, purchase_price=5, stock=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):  # the second checkout hits a stock conflict
+                self.client.post(
+                    "/api/bills/create/",
+                    {"customer_name": "A", "customer_phone": "1", "items": [{"product_id": product.id, "quantity": 1}]},
+                    content_type="application/json",
+                )
+        # Another worker's snapshot, left behind after it exited
+        self.snapshot("999999999-1", 4, gauges={"billing_db_connections_open\t": 7})
+
+        text = self.client.get("/metrics").content.decode()
+        self.assertEqual(self.sample(text, "billing_bills_created_total "), 5)
+        self.assertEqual(self.sample(text, "billing_stock_conflicts_total "), 1)
+        self.assertEqual(
+            self.sample(text, 'billing_request_duration_seconds_count{view="create_bill"}'), 2
+        )
+        self.assertEqual(
+            self.sample(text, 'billing_request_duration_seconds_bucket{view="create_bill",le="+Inf"}'), 2
+        )
+        self.assertLess(self.sample(text, "billing_db_connections_open "), 7)
+        self.assertIn("# TYPE billing_request_duration_seconds histogram", text)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_protects_the_endpoint(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+
+
+class SyntheticDataTests(TestCase):
+    def test_generator_appends_consistent_documents(self):
+        call_command(
+            "generate_data", "--products", "30", "--bills", "40", "--services", "8",
+            "--proformas", "5", "--returns", "6", "--days", "30", stdout=StringIO(),
+        )
+        self.assertEqual(Product.objects.count(), 30)
+        self.assertEqual(Bill.objects.filter(invoice_no__startswith="SYN-").count(), 40)
+        self.assertEqual(ProformaInvoice.objects.count(), 5)
+        self.assertEqual(ReturnInvoice.objects.count(), 6)
+        bill = Bill.objects.order_by("id").first()
+        self.assertEqual(bill.subtotal, sum(item.total for item in bill.items.all()))
+        self.assertGreater(timezone.now() - Bill.objects.earliest("created_at").created_at, timedelta(hours=1))
+        self.assertEqual(DailySales.objects.aggregate(n=Sum("bill_count"))["n"], 40)
+
+        # A second run appends without reusing document numbers
+        call_command("generate_data", "--products", "0", "--bills", "10", stdout=StringIO())
+        self.assertEqual(Bill.objects.values("invoice_no").distinct().count(), 50)
+
+
+class BenchmarkRegressionTests(TestCase):
+    def entry(self, queries=4, peak_kib=1000, p95=10.0, p99=12.0, requests=500):
+        latency = {"requests": requests, "p50": 5.0, "p95": p95, "p99": p99, "rps": 100.0}
+        return {"queries": queries, "peak_kib": peak_kib, "latency": {"4": latency}}
+
+    def test_regressions_flag_only_real_slowdowns(self):
+        baseline = {"1000": {"bill_list": self.entry()}}
+        self.assertEqual(regressions(baseline, {"1000": {"bill_list": self.entry(p95=13.0, peak_kib=1200)}}), [])
+        # Sizes and scenarios missing from the baseline are not compared
+        self.assertEqual(regressions(baseline, {"5000": {"bill_list": self.entry(queries=99)}}), [])
+
+        problems = regressions(baseline, {"1000": {"bill_list": self.entry(queries=5, peak_kib=2000, p99=30.0)}})
+        self.assertEqual(len(problems), 3)
+        self.assertIn("5 queries, baseline 4", problems[0])
+        self.assertIn("p99", problems[2])
+
+    def test_tails_of_small_samples_are_not_compared(self):
+        baseline = {"1000": {"bill_list": self.entry()}}
+        # With 100 requests p99 is the slowest one; p95 has five above it and counts
+        self.assertEqual(regressions(baseline, {"1000": {"bill_list": self.entry(p99=90.0, requests=100)}}), [])
+        self.assertEqual(regressions(baseline, {"1000": {"bill_list": self.entry(p95=90.0, requests=20)}}), [])
+        problems = regressions(baseline, {"1000": {"bill_list": self.entry(p95=90.0, requests=100)}})
+        self.assertEqual(len(problems), 1)
+        self.assertIn("p95", problems[0])
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7.0], 95), 7.0)
+
+
+class QueryPlanAuditTests(TestCase):
+    """Every API view's SQL must be served by an index (see queryplans.py)."""
+
+    def setUp(self):
+        Generator(seed=1).run(products=30, bills=60, services=15, proformas=6, returns=3, units=20)
+        self.client.force_login(User.objects.create_user("staff", password="pass", is_staff=True))
+
+    def test_every_api_view_is_audited(self):
+        self.assertEqual(api_view_names() - {case.view for case in audit_cases()}, set())
+
+    def test_api_plans_use_indexes(self):
+        problems = [
+            f"{finding.case}: {finding.kind} on {finding.table} ({finding.detail}); suggest {finding.suggestion}"
+            for finding in audit(self.client) if not finding.allowed
+        ]
+        self.assertEqual(problems, [])
+
+    def test_unsupported_engine_is_refused(self):
+        with mock.patch.object(connection, "vendor", "oracle"), self.assertRaisesMessage(CommandError, "oracle"):
+            call_command("audit_query_plans", stdout=StringIO())
+
+
+class CustomerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("staff", password="pass", is_staff=True)
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(name="Phone", selling_price=100, purchase_price=80, stock=100)
+
+    def bill(self, phone, name="Ravi"):
+        response = self.client.post(
+            "/api/bills/create/",
+            {"customer_name": name, "customer_phone": phone, "items": [{"product_id": self.product.id, "quantity": 1}]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return Bill.objects.get(invoice_no=response.json()["invoice_no"])
+
+    def test_phone_formats_share_one_customer(self):
+        self.assertEqual(normalize_phone("+91 98765-43210"), "9876543210")
+        first = self.bill("+91 98765-43210", name="Ravi")
+        second = self.bill("098765 43210", name="Ravi Kumar")
+        self.assertEqual(first.customer_id, second.customer_id)
+        self.assertEqual(Customer.objects.get().name, "Ravi Kumar")
+        self.assertEqual(second.customer_phone, "098765 43210")  # kept as typed for the invoice
+
+    def test_history_merges_all_documents_newest_first(self):
+        bills = [self.bill("9876543210") for _ in range(3)]
+        self.bill("9000000001")  # someone else
+        customer = bills[0].customer
+        service = Service.objects.create(
+            customer_name="Ravi", customer_phone="9876543210", service_type="Screen", service_price=500, customer=customer,
+        )
+        proforma = ProformaInvoice.objects.create(
+            customer_name="Ravi", subtotal=0, gst_amount=0, grand_total=0, customer=customer,
+        )
+        # A tie on created_at across tables must neither repeat nor skip rows
+        moment = timezone.now() - timedelta(days=1)
+        Bill.objects.filter(pk=bills[1].pk).update(created_at=moment)
+        Service.objects.filter(pk=service.pk).update(created_at=moment)
+
+        seen, cursor = [], None
+        while True:
+            params = {"page_size": 2, **({"cursor": cursor} if cursor else {})}
+            body = self.client.get("/api/customers/+91-9876543210/history/", params).json()
+            seen.extend((row["type"], row["id"]) for row in body["results"])
+            cursor = body["next"]
+            if not cursor:
+                break
+        self.assertEqual(body["customer"], {"phone": "9876543210", "name": "Ravi"})
+        self.assertEqual(seen, [
+            ("proforma", proforma.id), ("bill", bills[2].id), ("bill", bills[0].id),
+            ("service", service.id), ("bill", bills[1].id),
+        ])
+        self.assertEqual(self.client.get("/api/customers/123/history/").status_code, 404)
+
+    def test_malformed_history_cursors_are_rejected(self):
+        self.bill("9876543210")
+        now = timezone.now()
+        bad_cursors = (
+            "garbage", "e30", encode_history_cursor(now, "refund", 1),
+            encode_history_cursor(now, "bill", 0), encode_history_cursor(now, "bill", 2 ** 70),
+        )
+        for bad in bad_cursors:
+            with self.subTest(cursor=bad):
+                response = self.client.get("/api/customers/9876543210/history/", {"cursor": bad})
+                self.assertEqual(response.status_code, 400)
+
+    def test_suggest_by_phone_prefix(self):
+        self.bill("9876543210", name="Ravi")
+        self.bill("9876000000", name="Priya")
+        self.bill("9123456789", name="Arun")
+        results = self.client.get("/api/customers/suggest/", {"q": "98 76"}).json()["results"]
+        self.assertEqual([c["name"] for c in results], ["Priya", "Ravi"])
+        self.assertEqual(self.client.get("/api/customers/suggest/", {"q": ""}).json()["results"], [])
+
+
+class ProductUnitTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pass", is_staff=True))
+        self.model = Product.objects.create(name="Galaxy S23", selling_price=100, purchase_price=80, stock=0)
+
+    def intake(self, *imeis):
+        rows = [{"product_id": self.model.id, "imei": imei} for imei in imeis]
+        return self.client.post("/api/units/bulk/", rows, content_type="application/json").data
+
+    def bill(self, imeis):
+        return self.client.post(
+            "/api/bills/create/",
+            {
+                "customer_name": "Ravi", "customer_phone": "9876543210",
+                "items": [{"product_id": self.model.id, "quantity": len(imeis), "imeis": imeis}],
+            },
+            content_type="application/json",
+        )
+
+    def test_intake_adds_stock_and_rejects_repeated_imeis(self):
+        self.intake("861", "862")
+        result = self.intake("862", "863", "863")
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(
+            [(e["row"], e["errors"]) for e in result["errors"]],
+            [(3, {"imei": "Repeated in this batch."}), (1, {"imei": "Already registered"})],
+        )
+        self.model.refresh_from_db()
+        self.assertEqual(self.model.stock, 3)
+
+    def test_checkout_sells_scanned_units(self):
+        self.intake("861", "862", "863")
+        scanned = self.client.get("/api/units/862/").json()
+        self.assertEqual((scanned["product"]["id"], scanned["unit"]["imei"]), (self.model.id, "862"))
+
+        response = self.bill(["862", "863"])
+        self.assertEqual(response.status_code, 201)
+        item = BillItem.objects.get(bill__invoice_no=response.json()["invoice_no"])
+        self.assertEqual(sorted(item.units.values_list("imei", flat=True)), ["862", "863"])
+        self.assertEqual(set(item.units.values_list("status", flat=True)), {ProductUnit.SOLD})
+
+        sold = self.client.get("/api/units/862/")
+        self.assertEqual((sold.status_code, sold.json()["invoice_no"]), (409, response.json()["invoice_no"]))
+        # Selling a sold unit again rolls the whole bill back
+        self.assertEqual(self.bill(["861", "862"]).status_code, 400)
+        self.assertEqual(ProductUnit.objects.get(imei="861").status, ProductUnit.IN_STOCK)
+        self.model.refresh_from_db()
+        self.assertEqual(self.model.stock, 1)
+        self.assertEqual(self.client.get("/api/units/999/").status_code, 404)
+
+    def test_units_in_stock_need_an_imei_per_unit(self):
+        self.intake("861", "862")
+        response = self.client.post(
+            "/api/bills/create/",
+            {"customer_name": "Ravi", "customer_phone": "9876543210",
+             "items": [{"product_id": self.model.id, "quantity": 1}]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("IMEI", str(response.json()["items"]))
+        self.model.refresh_from_db()
+        self.assertEqual(self.model.stock, 2)
+        self.assertFalse(Bill.objects.exists())
+        self.assertEqual(self.bill(["861"]).status_code, 201)
+
+    def test_collapse_turns_handset_products_into_units(self):
+        handsets = [
+            Product.objects.create(name="Redmi 12", imei=f"35{n}", selling_price=90, purchase_price=70, stock=1)
+            for n in range(4)
+        ]
+        user = User.objects.get()
+        bill = Bill.objects.create(customer_name="Ravi", customer_phone="1", created_by=user)
+        BillItem.objects.create(bill=bill, product=handsets[2], quantity=1, price=90, total=90)  # stock 1 -> 0
+        call_command("collapse_handsets", stdout=StringIO())
+
+        product = Product.objects.get(name="Redmi 12")
+        self.assertEqual((product.id, product.imei, product.stock), (handsets[0].id, None, 3))
+        self.assertEqual(bill.items.get().product_id, product.id)
+        sold = ProductUnit.objects.get(status=ProductUnit.SOLD)
+        self.assertEqual((sold.imei, sold.bill_item.bill_id), ("352", bill.id))
+        self.assertEqual(product.units.filter(status=ProductUnit.IN_STOCK).count(), 3)
+        self.assertEqual(ProductTombstone.objects.count(), 3)
+
+
+class FastPathSerializerTests(TestCase):
+    """The values() read path must render exactly what the serializers render."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pass", is_staff=True))
+        Generator(seed=3).run(products=20, services=15)
+        Product.objects.create(name="Bare", selling_price=Decimal("0.5"), purchase_price=0, gst_percentage=0)
+        Service.objects.create(customer_name="Nobody", customer_phone="1", service_type="Check", service_price=0)
+
+    def assertSameJSON(self, fast, slow):
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(slow))
+
+    def test_products_match_product_serializer(self):
+        qs = Product.objects.order_by("-created_at", "-id")
+        self.assertSameJSON(PRODUCTS.full().serialize(PRODUCTS.full().values(qs)), ProductSerializer(qs, many=True).data)
+        body = self.client.get("/api/products/?fields=all").json()
+        self.assertEqual(body["results"], json.loads(JSONRenderer().render(ProductSerializer(qs, many=True).data)))
+
+    def test_services_match_service_serializer_across_pages(self):
+        qs = Service.objects.select_related("created_by").order_by("-created_at", "-id")
+        self.assertSameJSON(SERVICES.full().serialize(SERVICES.full().values(qs)), ServiceSerializer(qs, many=True).data)
+        pages, cursor = [], None
+        while True:
+            body = self.client.get("/api/services/", {"page_size": 4, "fields": "all", **({"cursor": cursor} if cursor else {})}).json()
+            pages.extend(body["results"])
+            cursor = body["next"]
+            if not cursor:
+                break
+        self.assertEqual(pages, json.loads(JSONRenderer().render(ServiceSerializer(qs, many=True).data)))
+
+
+class SparseFieldsetTests(TestCase):
+    """Lists answer with a summary unless ?fields= / ?expand= ask for more."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pass", is_staff=True))
+        Generator(seed=5).run(products=10, bills=6)
+
+    def test_summary_is_the_default(self):
+        row = self.client.get("/api/bills/").json()["results"][0]
+        self.assertEqual(list(row), list(BILLS.summary))
+
+    def test_all_fields_and_expansions_match_the_serializer(self):
+        qs = BillSerializer.setup_eager_loading(Bill.objects.order_by("-created_at", "-id"))
+        body = self.client.get("/api/bills/", {"fields": "all", "expand": "items"}).json()
+        self.assertEqual(body["results"], json.loads(JSONRenderer().render(BillSerializer(qs, many=True).data)))
+
+    def test_picked_fields_only(self):
+        body = self.client.get("/api/bills/", {"fields": "invoice_no,grand_total", "expand": "items"}).json()
+        row = body["results"][0]
+        self.assertEqual(list(row), ["invoice_no", "grand_total", "items"])
+        self.assertTrue(row["items"][0]["product"]["name"])
+
+    def test_service_popup_lookup_has_the_issue(self):
+        service = Service.objects.create(customer_name="Ravi", customer_phone="1", service_type="Screen",
+                                         issue="Cracked glass", service_price=500)
+        summary = self.client.get("/api/services/").json()["results"][0]
+        self.assertNotIn("issue", summary)
+        # What invoice.js viewService asks for
+        body = self.client.get("/api/services/", {"invoice_no": service.service_id.lower(), "fields": "all"}).json()
+        self.assertEqual([row["issue"] for row in body["results"]], ["Cracked glass"])
+
+    def test_unknown_fields_are_rejected(self):
+        self.assertEqual(self.client.get("/api/bills/?fields=secret").status_code, 400)
+        self.assertEqual(self.client.get("/api/products/?expand=items").status_code, 400)
+
+    def test_pages_follow_with_fields(self):
+        seen, cursor = [], None
+        while True:
+            params = {"page_size": 4, "fields": "invoice_no", **({"cursor": cursor} if cursor else {})}
+            body = self.client.get("/api/bills/", params).json()
+            seen.extend(row["invoice_no"] for row in body["results"])
+            cursor = body["next"]
+            if not cursor:
+                break
+        self.assertEqual(seen, list(Bill.objects.order_by("-created_at", "-id").values_list("invoice_no", flat=True)))
+
+
+def from_columns(value):
+    """What app.js fromColumns does."""
+    if isinstance(value, list):
+        return [from_columns(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "$columns" in value:
+        return [dict(zip(value["$columns"], map(from_columns, row))) for row in value["$rows"]]
+    return {key: from_columns(item) for key, item in value.items()}
+
+
+class CompactRendererTests(TestCase):
+    """List endpoints also speak columnar JSON and MessagePack, on request."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pass", is_staff=True))
+        Generator(seed=7).run(products=10, bills=5)
+
+    def test_json_stays_the_default(self):
+        response = self.client.get("/api/bills/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("Accept", response["Vary"])
+
+    def test_columnar_json_decodes_to_the_json_body(self):
+        params = {"fields": "all", "expand": "items"}
+        plain = self.client.get("/api/bills/", params).json()
+        response = self.client.get("/api/bills/", params, HTTP_ACCEPT="application/vnd.billing.columns+json")
+        body = json.loads(response.content)
+        self.assertEqual(body["results"]["$columns"][:2], ["id", "invoice_no"])
+        self.assertEqual(from_columns(body), plain)
+
+    def test_messagepack_encoding(self):
+        self.assertEqual(packb(None), b"\xc0")
+        self.assertEqual(packb([1, -1, -33, 200, -200, 70000, 2 ** 40]), bytes.fromhex(
+            "97" "01" "ff" "d0df" "ccc8" "d1ff38" "ce00011170" "cf0000010000000000"
+        ))
+        self.assertEqual(packb({"a": [True, False, 1.5]}), bytes.fromhex("81a16193c3c2cb3ff8000000000000"))
+        self.assertEqual(packb("é" * 20), b"\xd9\x28" + "é".encode() * 20)
+        self.assertEqual(packb(list(range(16)))[:3], b"\xdc\x00\x10")
+        self.assertEqual(packb(Decimal("1.50")), packb(1.5))
+
+    def test_messagepack_list_and_catalog_etag(self):
+        response = self.client.get("/api/products/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(response.content[:1], b"\x82")  # {results, version}: a two-entry map
+        json_etag = self.client.get("/api/products/")["ETag"]
+        self.assertNotEqual(response["ETag"], json_etag)
+        again = self.client.get("/api/products/", HTTP_ACCEPT="application/msgpack", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+
+class StreamingListTests(TestCase):
+    """Whole lists stream a batch at a time and compress as they go."""
+
+    def setUp(self):
+        user = User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.force_login(user)
+        self.async_client.force_login(user)
+        Generator(seed=9).run(products=10, bills=3)
+
+    def get(self, chunk_size, **headers):
+        with override_settings(BILLING_STREAM_CHUNK_SIZE=chunk_size):
+            return self.client.get("/api/products/", {"fields": "all"}, **headers)
+
+    def test_streamed_body_is_the_rendered_body(self):
+        for accept in ("application/json", "application/vnd.billing.columns+json"):
+            with self.subTest(accept=accept):
+                whole = self.get(0, HTTP_ACCEPT=accept)
+                streamed = self.get(4, HTTP_ACCEPT=accept)
+                self.assertFalse(whole.streaming)
+                self.assertTrue(streamed.streaming)
+                self.assertEqual(streamed["Content-Type"], accept)
+                self.assertEqual(b"".join(streamed.streaming_content), whole.content)
+
+    def test_short_lists_are_not_streamed(self):
+        self.assertFalse(self.get(50).streaming)
+
+    def test_gzip_on_streamed_and_whole_bodies(self):
+        plain = self.get(0).content
+        for chunk_size in (0, 4):
+            with self.subTest(chunk_size=chunk_size):
+                response = self.get(chunk_size, HTTP_ACCEPT_ENCODING="gzip, deflate")
+                self.assertEqual(response["Content-Encoding"], "gzip")
+                self.assertIn("Accept-Encoding", response["Vary"])
+                self.assertEqual(gzip.decompress(response.getvalue()), plain)
+        self.assertFalse(self.get(4).has_header("Content-Encoding"))
+
+    def test_weak_etag_still_revalidates(self):
+        etag = self.get(0, HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertEqual(self.get(0, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_encoding_negotiation(self):
+        best = "br" if "br" in ENCODERS else "gzip"
+        self.assertEqual(choose_encoding("gzip, deflate, br"), best)
+        self.assertEqual(choose_encoding("*"), best)
+        self.assertEqual(choose_encoding("br;q=0, gzip;q=0.5"), "gzip")
+        self.assertIsNone(choose_encoding("gzip;q=0, identity"))
+        self.assertIsNone(choose_encoding(""))
+
+    @override_settings(BILLING_STREAM_CHUNK_SIZE=2)
+    async def test_asgi_streams_asynchronously(self):
+        response = await self.async_client.get("/api/bills/", {"expand": "items"}, headers={"accept-encoding": "gzip"})
+        self.assertTrue(response.is_async)
+        body = gzip.decompress(b"".join([piece async for piece in response.streaming_content]))
+        self.assertEqual(len(json.loads(body)["results"]), 3)
+
+
+class InvoiceNumberTests(TransactionTestCase):
+    """Concurrent terminals must never be handed the same number."""
+
+    def test_threads_get_unique_sequential_numbers(self):
+        self.stress(block_size=1)
+
+    def test_threads_share_reserved_blocks_without_duplicates(self):
+        self.stress(block_size=7)
+
+    def stress(self, block_size):
+        threads, per_thread = 8, 25
+        numbers, errors = [], []
+        lock = threading.Lock()
+
+        def sell():
+            try:
+                for _ in range(per_thread):
+                    with transaction.atomic():
+                        number = next_number("INV")
+                    with lock:
+                        numbers.append(number)
+            except Exception as exc:  # surfaced by the assertion below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        allocator = NumberAllocator()
+        workers = [threading.Thread(target=sell) for _ in range(threads)]
+        with mock.patch.object(NumberAllocator, "block_size", return_value=block_size), \
+                mock.patch("billing_app.numbering.allocator", allocator):
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(numbers), threads * per_thread)
+        self.assertEqual(len(set(numbers)), len(numbers))
+        year = financial_year()
+        # Only the last block can have numbers left over
+        expected = [format_number("INV", year, n) for n in range(1, threads * per_thread + 1)]
+        self.assertEqual(sorted(numbers), expected)
+
+    def test_rolled_back_bill_returns_its_number(self):
+        year = financial_year()
+        try:
+            with transaction.atomic():
+                Bill.objects.create(customer_name="A", customer_phone="1")
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        bill = Bill.objects.create(customer_name="B", customer_phone="1")
+        self.assertEqual(bill.invoice_no, format_number("INV", year, 1))
@@ -0,0 +1,192 @@
+from django.db import DatabaseError, transaction
+from django.db.models import Count, F, Max, Min
+from django.utils import timezone
+from rest_framework import serializers
+
+from .bulk import BatchResult, chunk_size, chunks, int_field, text_field
+from .live import products_changed_on_commit
+from .models import BillItem, Product, ProductUnit, ProformaItem
+from .search import refresh_on_commit
+
+
+# ==========================
+# SERIAL-NUMBERED UNITS
+# ==========================
+# Every handset is a ProductUnit row keyed by its IMEI, and the catalog
+# keeps one Product per model. Product.stock still counts the units on
+# hand, so the existing stock, catalog and suggestion code is unchanged.
+# Intake adds units and raises stock with relative updates. Checkout
+# deducts stock as before and then sells the scanned units with one
+# guarded UPDATE per line. A line for a product with units in stock must
+# scan one IMEI per unit, or stock and units would drift apart.
+
+def add_stock(counts, now):
+    """Raise stock by ``{product id: count}``, one relative UPDATE per distinct count."""
+    by_count = {}
+    for pk, count in counts.items():
+        by_count.setdefault(count, []).append(pk)
+    for count, pks in by_count.items():
+        Product.objects.filter(pk__in=pks).update(stock=F('stock') + count, updated_at=now)
+    refresh_on_commit(counts)
+    products_changed_on_commit(counts)
+
+
+def intake(rows):
+    """
+    Register ``{"product_id", "imei"}`` rows as units in stock. An IMEI
+    that is already registered, or repeated within the batch, is
+    reported and skipped.
+    """
+    result = BatchResult()
+    row_number = 0
+    seen = set()
+    for chunk in chunks(rows, chunk_size()):
+        wanted = []  # (row number, product id, imei)
+        for row in chunk:
+            row_number += 1
+            row = row if isinstance(row, dict) else {}
+            errors = {}
+            product_id = int_field(row, 'product_id', errors)
+            imei = text_field(row, 'imei', errors, 50, required=True)
+            if 'imei' not in errors and imei in seen:
+                errors['imei'] = 'Repeated in this batch.'
+            if errors:
+                result.error(row_number, errors)
+            else:
+                seen.add(imei)
+                wanted.append((row_number, product_id, imei))
+        if wanted:
+            intake_chunk(wanted, result)
+    return result
+
+
+def intake_chunk(wanted, result):
+    registered = set(
+        ProductUnit.objects.filter(imei__in=[imei for _, _, imei in wanted]).values_list('imei', flat=True)
+    )
+    products = set(
+        Product.objects.filter(pk__in={pk for _, pk, _ in wanted}).values_list('pk', flat=True)
+    )
+    units, numbers, counts = [], [], {}
+    for number, product_id, imei in wanted:
+        if product_id not in products:
+            result.error(number, {'product_id': 'Product not found'})
+        elif imei in registered:
+            result.error(number, {'imei': 'Already registered'})
+        else:
+            units.append(ProductUnit(product_id=product_id, imei=imei))
+            numbers.append(number)
+            counts[product_id] = counts.get(product_id, 0) + 1
+    if not units:
+        return
+    try:
+        with transaction.atomic():
+            ProductUnit.objects.bulk_create(units)
+            add_stock(counts, timezone.now())
+    except DatabaseError as exc:
+        # Usually an IMEI registered by a concurrent intake
+        for number in numbers:
+            result.error(number, {'row': f'Could not save chunk: {exc}'})
+        return
+    result.ok += len(units)
+
+
+def tracked(product_ids):
+    """The ids among ``product_ids`` with units in stock; selling those needs an IMEI per unit."""
+    return set(
+        ProductUnit.objects.filter(product_id__in=product_ids, status=ProductUnit.IN_STOCK)
+        .values_list('product_id', flat=True).distinct()
+    )
+
+
+def sell_units(item, imeis, now):
+    """Mark the in-stock ``imeis`` of ``item``'s product as sold on ``item``, or raise."""
+    sold = ProductUnit.objects.filter(
+        product_id=item.product_id, imei__in=imeis, status=ProductUnit.IN_STOCK,
+    ).update(status=ProductUnit.SOLD, bill_item=item, sold_at=now)
+    if sold != len(imeis):
+        available = set(
+            ProductUnit.objects.filter(bill_item=item).values_list('imei', flat=True)
+        )
+        missing = next(imei for imei in imeis if imei not in available)
+        raise serializers.ValidationError({
+            'items': f"IMEI {missing} is not in stock for {item.product.name}"
+        })
+
+
+def scan(imei):
+    """
+    ``(unit, product)`` for a scanned IMEI in one indexed lookup. Units
+    come first. Products that still carry their own IMEI come second,
+    with no unit. Both are ``None`` when nothing matches.
+    """
+    unit = (
+        ProductUnit.objects.select_related('product', 'bill_item__bill')
+        .filter(imei=imei).first()
+    )
+    if unit is not None:
+        return unit, unit.product
+    return None, Product.objects.filter(imei=imei).order_by('id').first()
+
+
+# ---------- collapsing one-product-per-handset catalogs ----------
+
+# Rows that differ only in IMEI and stock are the same model
+MODEL_FIELDS = ('name', 'selling_price', 'purchase_price', 'gst_percentage', 'category', 'agency_name')
+
+
+def handset_products():
+    """Products that stand for a single handset: an IMEI and at most one in stock."""
+    return Product.objects.exclude(imei=None).exclude(imei='').filter(stock__lte=1)
+
+
+def collapse_groups():
+    """Groups of handset products that would become one catalog row each."""
+    return (
+        handset_products().values(*MODEL_FIELDS)
+        .annotate(members=Count('id'), keep=Min('id'))
+        .order_by('keep')
+    )
+
+
+def collapse_group(group):
+    """
+    Turn every handset product of ``group`` into a unit of the group's
+    oldest product. Bill and proforma lines move to that product and the
+    other rows are deleted, which leaves catalog tombstones. Returns the
+    number of products removed.
+    """
+    key = {name: group[name] for name in MODEL_FIELDS}
+    keep = group['keep']
+    now = timezone.now()
+    with transaction.atomic():
+        members = list(handset_products().filter(**key).order_by('id').values_list('id', 'imei', 'stock'))
+        ids = [pk for pk, imei, stock in members]
+        # A handset with no stock left was sold; its most recent bill line sold it
+        sales = {
+            row['product_id']: row
+            for row in BillItem.objects.filter(product_id__in=ids)
+            .values('product_id').annotate(item=Max('id'), at=Max('bill__created_at'))
+        }
+        ProductUnit.objects.bulk_create([
+            ProductUnit(
+                product_id=keep,
+                imei=imei,
+                status=ProductUnit.IN_STOCK if stock else ProductUnit.SOLD,
+                bill_item_id=None if stock else sales.get(pk, {}).get('item'),
+                sold_at=None if stock else sales.get(pk, {}).get('at'),
+            )
+            for pk, imei, stock in members
+        ], ignore_conflicts=True)
+
+        others = [pk for pk in ids if pk != keep]
+        ProductUnit.objects.filter(product_id__in=others).update(product_id=keep)
+        BillItem.objects.filter(product_id__in=others).update(product_id=keep)
+        ProformaItem.objects.filter(product_id__in=others).update(product_id=keep)
+        Product.objects.filter(pk=keep).update(
+            stock=sum(stock for pk, imei, stock in members), imei=None, updated_at=now,
+        )
+        Product.objects.filter(pk__in=others).delete()
+        refresh_on_commit([keep])
+        products_changed_on_commit([keep])
+    return len(others)
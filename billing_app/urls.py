@@ -20,15 +20,26 @@ urlpatterns = [
     path('api/categories/', views.category_list, name='category_list'),
     path('api/categories/create/', views.create_category, name='create_category'),
     path('api/products/create/', views.create_product, name='create_product'),
+    path('api/products/bulk/', views.bulk_import_products, name='bulk_import_products'),
+    path('api/products/stock/bulk/', views.bulk_adjust_stock, name='bulk_adjust_stock'),
+    path('api/units/bulk/', views.bulk_intake_units, name='bulk_intake_units'),
+    path('api/units/<str:imei>/', views.scan_unit, name='scan_unit'),
     path('api/products/<int:pk>/', views.update_product, name='update_product'),
     path('api/products/<int:pk>/delete/', views.delete_product, name='delete_product'),
     path('api/bills/create/', views.create_bill, name='create_bill'),
+    path('api/bills/sync/', views.sync_bills, name='sync_bills'),
     path('api/bills/', views.bill_list, name='bill_list'),
+    path('api/bills/export/', views.bill_export, name='bill_export'),
     path('api/services/create/', views.create_service, name='create_service'),
     path('api/services/', views.service_list, name='service_list'),
+    path('api/services/export/', views.service_export, name='service_export'),
+    path('api/customers/suggest/', views.customer_suggest, name='customer_suggest'),
+    path('api/customers/<str:phone>/history/', views.customer_history, name='customer_history'),
     path('api/reports/', views.reports_data, name='reports_data'),
+    path('api/reports/series/', views.reports_series, name='reports_series'),
     path('api/proforma/create/', views.create_proforma, name='create_proforma'),
     path('api/proforma/', views.proforma_list, name='proforma_list'),
+    path('api/proforma/export/', views.proforma_export, name='proforma_export'),
     # Return page + APIs
     path('return/', views.return_page, name='return_page'),
     path('api/products/suggest/', views.product_suggest, name='product_suggest'),
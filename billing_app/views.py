@@ -1,19 +1,24 @@
-from django.http import JsonResponse
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import models
-from datetime import datetime
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from datetime import date, timedelta
 from django.db.models import ProtectedError
-from django.db.models import Q
 
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 
-from .models import Category, Product, Bill, Service, ProformaInvoice
+from .models import Category, Customer, Product, Bill, Service, ProformaInvoice
 from .serializers import (
     CategorySerializer,
     ProductSerializer,
@@ -22,6 +27,38 @@ from .serializers import (
     ProformaInvoiceSerializer
 )
 from .permissions import IsAdminUser, IsStaffOrAdminUser
+from .fieldsets import BILLS, PRODUCTS, PROFORMAS, SERVICES
+from .pagination import get_page_size, is_paginated, paginate_values
+from .renderers import LIST_RENDERERS
+from .filters import filter_bills, filter_services, filter_proformas, parse_date_param
+from .rollups import record_return, sales_between, sales_series
+from .search import product_index
+from . import bulk, catalog, customers, exports, metrics, streaming, sync, units
+from .storage import load_precache
+
+
+# ==========================
+# HELPERS
+# ==========================
+def list_response(request, qs, fieldset, extra=None):
+    """
+    Render ``qs`` into the ``{'results': ..., **extra}`` envelope, one page
+    at a time when asked, with the ``?fields=`` / ``?expand=`` of
+    ``fieldset``. Whole lists are streamed (see streaming.py).
+    """
+    extra = extra or {}
+    projection = fieldset.for_request(request)
+    if not is_paginated(request):
+        rows = projection.values(qs).iterator(chunk_size=2000)
+        response = streaming.stream_list(request, rows, projection.serialize, extra)
+        if response is None:
+            response = Response({'results': projection.serialize(rows), **extra})
+    else:
+        results, next_cursor = paginate_values(request, qs, projection)
+        response = Response({'results': results, 'next': next_cursor, **extra})
+    # The body's format follows the Accept header (see renderers.py)
+    patch_vary_headers(response, ['Accept'])
+    return response
 
 
 # ==========================
@@ -79,6 +116,36 @@ def reports_page(request):
     return render(request, 'reports.html')
 
 
+def service_worker(request):
+    """
+    The service worker, from the site root so its scope covers every page,
+    with this deploy's precache list injected (see storage.py).
+    """
+    source = Path(finders.find('sw.js')).read_text()
+    response = HttpResponse(
+        f"const PRECACHE = {json.dumps(load_precache())};\n{source}",
+        content_type='application/javascript',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['Service-Worker-Allowed'] = '/'
+    return response
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape target. With METRICS_TOKEN set, scrapers send it as
+    a bearer token; otherwise only logged-in staff may read it.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        allowed = request.META.get('HTTP_AUTHORIZATION', '') == f'Bearer {token}'
+    else:
+        allowed = request.user.is_authenticated and request.user.is_staff
+    if not allowed:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @login_required
 def proforma_invoice_page(request):
     if not request.user.is_superuser:
@@ -109,11 +176,41 @@ def create_category(request):
 # PRODUCT APIs
 # ==========================
 @api_view(['GET'])
+@renderer_classes(LIST_RENDERERS)
 @permission_classes([IsAuthenticated])
 def product_list(request):
-    qs = Product.objects.all().order_by('-created_at')
-    serializer = ProductSerializer(qs, many=True)
-    return Response({'results': serializer.data})
+    """
+    The product catalog, tagged with its version and a strong ETag
+    (If-None-Match answers 304). ``?since=<version>`` returns only the
+    products changed and the ids deleted after that version; ``reset``
+    means the version is too old and the full catalog was sent instead.
+    Rows are summaries unless ``?fields=`` asks for more.
+    """
+    since = request.query_params.get('since')
+    since = catalog.parse_version(since) if since else None
+    latest = catalog.latest_change()
+    etag = catalog.catalog_etag(request, latest)
+    if catalog.etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        version = catalog.to_version(latest)
+        changes = catalog.changes_since(since) if since else None
+        if changes is not None:
+            changed, deleted = changes
+            projection = PRODUCTS.for_request(request)
+            response = Response({
+                'results': projection.serialize(projection.values(changed)),
+                'deleted': deleted,
+                'version': version,
+            })
+        else:
+            extra = {'reset': True, 'version': version} if since else {'version': version}
+            response = list_response(request, Product.objects.all().order_by('-created_at', '-id'), PRODUCTS, extra)
+
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Accept'])
+    return response
 
 
 @api_view(['POST'])
@@ -152,6 +249,55 @@ def update_product(request, pk):
     return Response(serializer.errors, status=400)
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_import_products(request):
+    """Create products from a CSV / NDJSON / JSON batch; bad rows are reported, not fatal."""
+    result = bulk.import_products(bulk.iter_rows(request))
+    return Response(result.as_dict('created'), status=200)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_adjust_stock(request):
+    """Apply stock deltas (rows of id or imei plus delta) in chunked relative updates."""
+    result = bulk.adjust_stock(bulk.iter_rows(request))
+    return Response(result.as_dict('updated'), status=200)
+
+
+# ==========================
+# PRODUCT UNIT APIs
+# ==========================
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_intake_units(request):
+    """Register handsets (rows of product_id plus imei) as units in stock."""
+    result = units.intake(bulk.iter_rows(request))
+    return Response(result.as_dict('created'), status=200)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def scan_unit(request, imei):
+    """
+    Resolve a scanned IMEI to its product and unit. A sold unit answers
+    409 with the invoice it went out on.
+    """
+    unit, product = units.scan(imei.strip())
+    if product is None:
+        return Response({'error': 'Unknown IMEI'}, status=404)
+    if unit is not None and unit.status == unit.SOLD:
+        bill = unit.bill_item.bill if unit.bill_item else None
+        return Response({
+            'error': f'{unit.imei} is already sold',
+            'invoice_no': bill.invoice_no if bill else None,
+        }, status=409)
+    return Response({
+        'product': ProductSerializer(product).data,
+        'unit': {'id': unit.id, 'imei': unit.imei} if unit else None,
+    })
+
+
 from django.db.models import ProtectedError
 
 @api_view(['DELETE'])
@@ -185,25 +331,48 @@ def delete_product(request, pk):
 @api_view(['POST'])
 @permission_classes([IsStaffOrAdminUser])
 def create_bill(request):
-    serializer = BillSerializer(
-        data=request.data,
-        context={'request': request}
-    )
-    if serializer.is_valid():
-        bill = serializer.save()
-        return Response({
-            'invoice_no': bill.invoice_no,
-            'grand_total': bill.grand_total
-        }, status=201)
-    return Response(serializer.errors, status=400)
+    """Bill one checkout; a repeated ``client_key`` returns the original invoice (200)."""
+    result = sync.apply_bill(request.data, request)
+    if result['status'] == 'rejected':
+        return Response(result['errors'], status=400)
+    return Response({
+        'invoice_no': result['invoice_no'],
+        'grand_total': result['grand_total']
+    }, status=201 if result['status'] == 'created' else 200)
+
+
+@api_view(['POST'])
+@permission_classes([IsStaffOrAdminUser])
+def sync_bills(request):
+    """
+    Apply a batch of bills queued offline: ``{"bills": [{client_key, ...}]}``.
+    Returns one result per bill, in order; replaying a batch bills nothing twice.
+    """
+    bills = request.data.get('bills') if isinstance(request.data, dict) else None
+    if not isinstance(bills, list):
+        return Response({'error': 'Expected {"bills": [...]}'}, status=400)
+    if len(bills) > sync.max_batch():
+        return Response({'error': f'At most {sync.max_batch()} bills per batch'}, status=400)
+    return Response({'results': sync.sync_bills(bills, request)})
 
 
 @api_view(['GET'])
+@renderer_classes(LIST_RENDERERS)
 @permission_classes([IsAuthenticated])
 def bill_list(request):
-    qs = Bill.objects.all().order_by('-created_at')
-    serializer = BillSerializer(qs, many=True)
-    return Response({'results': serializer.data})
+    """Bill summaries; ?fields= / ?expand=items for more (see fieldsets.py)."""
+    qs = filter_bills(Bill.objects.all(), request.query_params).order_by('-created_at', '-id')
+    return list_response(request, qs, BILLS)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def bill_export(request):
+    """Stream bills as CSV; ?items=1 writes one row per bill item instead."""
+    qs = filter_bills(Bill.objects.all(), request.query_params).order_by('-created_at', '-id')
+    if request.query_params.get('items') in ('1', 'true'):
+        return exports.stream_csv(request, 'bill_items.csv', exports.BILL_ITEM_HEADER, exports.bill_item_rows(qs))
+    return exports.stream_csv(request, 'bills.csv', exports.BILL_HEADER, exports.bill_rows(qs))
 
 
 # ==========================
@@ -226,11 +395,60 @@ def create_service(request):
 
 
 @api_view(['GET'])
+@renderer_classes(LIST_RENDERERS)
 @permission_classes([IsAuthenticated])
 def service_list(request):
-    qs = Service.objects.all().order_by('-created_at')
-    serializer = ServiceSerializer(qs, many=True)
-    return Response({'results': serializer.data})
+    qs = filter_services(Service.objects.all(), request.query_params).order_by('-created_at', '-id')
+    return list_response(request, qs, SERVICES)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def service_export(request):
+    qs = filter_services(Service.objects.all(), request.query_params).order_by('-created_at', '-id')
+    return exports.stream_csv(request, 'services.csv', exports.SERVICE_HEADER, exports.service_rows(qs))
+
+
+# ==========================
+# CUSTOMER APIs
+# ==========================
+HISTORY_SERIALIZERS = {
+    'bill': BillSerializer,
+    'service': ServiceSerializer,
+    'proforma': ProformaInvoiceSerializer,
+}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def customer_suggest(request):
+    """Customers whose phone starts with ?q=, for the billing screen."""
+    return Response({'results': customers.suggest(request.query_params.get('q', ''))})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def customer_history(request, phone):
+    """Bills, services and proformas of one customer, newest first, paged with ?cursor=."""
+    customer = Customer.objects.filter(phone=customers.normalize_phone(phone)).first()
+    if customer is None:
+        return Response({'error': 'Customer not found'}, status=404)
+
+    entries, next_cursor = customers.history_page(
+        customer, request.query_params.get('cursor'), get_page_size(request)
+    )
+    loaded = {}
+    for kind, serializer_class in HISTORY_SERIALIZERS.items():
+        ids = [pk for entry_kind, pk in entries if entry_kind == kind]
+        if ids:
+            qs = serializer_class.setup_eager_loading(customers.HISTORY_MODELS[kind].objects.filter(pk__in=ids))
+            for obj in qs:
+                loaded[kind, obj.pk] = {'type': kind, **serializer_class(obj).data}
+    return Response({
+        'customer': {'phone': customer.phone, 'name': customer.name},
+        'results': [loaded[entry] for entry in entries if entry in loaded],
+        'next': next_cursor,
+    })
 
 
 # ==========================
@@ -239,34 +457,52 @@ def service_list(request):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def reports_data(request):
-    today = datetime.now().date()
-
-    total_sales = Bill.objects.aggregate(
-        total=models.Sum('grand_total')
-    )['total'] or 0
-
-    service_income = Service.objects.aggregate(
-        total=models.Sum('service_price')
-    )['total'] or 0
+    """Sales totals from the DailySales rollup; ?start=/?end= narrow the totals."""
+    today = timezone.localdate()
+    start = parse_date_param(request.query_params, 'start')
+    end = parse_date_param(request.query_params, 'end')
 
-    daily_sales = Bill.objects.filter(
-        created_at__date=today
-    ).aggregate(total=models.Sum('grand_total'))['total'] or 0
+    in_range = sales_between(start, end)
+    daily = sales_between(today, today)
+    monthly = sales_between(today.replace(day=1), today)
 
-    month_start = today.replace(day=1)
-    monthly_sales = Bill.objects.filter(
-        created_at__date__gte=month_start
-    ).aggregate(total=models.Sum('grand_total'))['total'] or 0
+    total_sales = in_range['bill_total']
+    service_income = in_range['service_total']
 
     return Response({
         'total_sales': float(total_sales),
         'service_income': float(service_income),
-        'daily_sales': float(daily_sales),
-        'monthly_sales': float(monthly_sales),
-        'total_revenue': float(total_sales + service_income)
+        'daily_sales': float(daily['bill_total']),
+        'monthly_sales': float(monthly['bill_total']),
+        'total_revenue': float(total_sales + service_income),
+        'bill_count': in_range['bill_count'],
+        'service_count': in_range['service_count'],
+        'return_quantity': in_range['return_quantity'],
     })
 
 
+SERIES_DEFAULT_SPAN = {'day': 30, 'week': 7 * 12, 'month': 365}
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def reports_series(request):
+    """Revenue per ?bucket=day|week|month over ?start=/?end= (defaults to a recent window)."""
+    bucket = request.query_params.get('bucket', 'day')
+    if bucket not in SERIES_DEFAULT_SPAN:
+        return Response({'error': 'bucket must be day, week or month'}, status=400)
+
+    end = parse_date_param(request.query_params, 'end') or timezone.localdate()
+    span = timedelta(days=SERIES_DEFAULT_SPAN[bucket] - 1)
+    start = parse_date_param(request.query_params, 'start') or (end - span if end - date.min >= span else date.min)
+    if start > end:
+        return Response({'error': 'start must be on or before end'}, status=400)
+    if bucket == 'day' and (end - start).days > 3660:
+        return Response({'error': 'Use week or month buckets for ranges over ten years'}, status=400)
+
+    return Response(sales_series(start, end, bucket))
+
+
 # ==========================
 # PROFORMA APIs (ADMIN)
 # ==========================
@@ -286,12 +522,19 @@ def create_proforma(request):
     return Response(serializer.errors, status=400)
 
 @api_view(['GET'])
+@renderer_classes(LIST_RENDERERS)
 @permission_classes([IsAuthenticated])
 def proforma_list(request):
-    """List all proforma invoices with their corresponding bills if created"""
-    qs = ProformaInvoice.objects.all().order_by('-created_at')
-    serializer = ProformaInvoiceSerializer(qs, many=True)
-    return Response({'results': serializer.data})
+    """Proforma summaries; ?expand=items,related_bill adds the items and the bill made from it."""
+    qs = filter_proformas(ProformaInvoice.objects.all(), request.query_params).order_by('-created_at', '-id')
+    return list_response(request, qs, PROFORMAS)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def proforma_export(request):
+    qs = filter_proformas(ProformaInvoice.objects.all(), request.query_params).order_by('-created_at', '-id')
+    return exports.stream_csv(request, 'proformas.csv', exports.PROFORMA_HEADER, exports.proforma_rows(qs))
 
 
 # ==========================
@@ -307,18 +550,15 @@ def return_page(request):
 def product_suggest(request):
     q = request.GET.get('q', '').strip()
 
-    products = Product.objects.filter(
-        Q(name__icontains=q),
-        stock__gt=0        # ✅ IMPORTANT
-    )[:10]
+    products = product_index.search(q, limit=10, in_stock=True)
 
     data = [{
-        'id': p.id,
-        'name': p.name,
-        'imei': p.imei,
-        'stock': p.stock,
-        'selling_price': p.selling_price,
-        'purchase_price': p.purchase_price
+        'id': p['id'],
+        'name': p['name'],
+        'imei': p['imei'],
+        'stock': p['stock'],
+        'selling_price': p['selling_price'],
+        'purchase_price': p['purchase_price']
     } for p in products]
 
     return JsonResponse({'results': data})
@@ -362,6 +602,8 @@ def process_return(request):
         with transaction.atomic():
             product.stock -= quantity
             product.save()
+            record_return(quantity, request.user)
+            metrics.count_on_commit('billing_returns_total')
     except Exception as e:
         return Response({'error': 'Failed to update stock', 'details': str(e)}, status=500)
 
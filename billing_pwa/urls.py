@@ -4,13 +4,18 @@ from django.views.generic import TemplateView
 from django.views.static import serve
 from django.conf import settings
 
+from billing_app import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('billing_app.urls')),
     
     
-    # Serve sw.js from root
-    path('sw.js', serve, {'document_root': settings.BASE_DIR, 'path': 'sw.js'}),
+    # Serve sw.js from root, with the collectstatic precache list injected
+    path('sw.js', views.service_worker, name='service_worker'),
+
+    # Prometheus scrape target
+    path('metrics', views.metrics_view, name='metrics'),
     
     # Also serve manifest if it's in root
     path('manifest.json', serve, {'document_root': settings.BASE_DIR, 'path': 'manifest.json'}),
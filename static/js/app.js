@@ -1,13 +1,128 @@
 // Global App Configuration and Utilities
+
+// List endpoints can answer in two compact formats (billing_app/renderers.py):
+// columnar JSON and MessagePack, both turning lists of objects into
+// {"$columns": [...], "$rows": [[...]]}. apiRequest(url, { format }) asks for
+// one and hands back the usual objects. The pages use columnar JSON: about
+// half the bytes of JSON and as quick to parse, where MessagePack is a
+// little smaller still but decoding it in JavaScript is slower than the
+// browser's native JSON.parse (manage.py bench_renderers).
+const MEDIA_TYPES = {
+    json: 'application/json',
+    columns: 'application/vnd.billing.columns+json',
+    msgpack: 'application/msgpack',
+};
+
+function fromColumns(value) {
+    if (Array.isArray(value)) return value.map(fromColumns);
+    if (value === null || typeof value !== 'object') return value;
+    const names = value.$columns;
+    if (names) {
+        return value.$rows.map(row => {
+            const obj = {};
+            for (let i = 0; i < names.length; i++) {
+                const cell = row[i];
+                obj[names[i]] = cell !== null && typeof cell === 'object' ? fromColumns(cell) : cell;
+            }
+            return obj;
+        });
+    }
+    for (const key of Object.keys(value)) value[key] = fromColumns(value[key]);
+    return value;
+}
+
+// The MessagePack subset the server writes: nil, booleans, ints, floats,
+// strings, arrays and maps
+function decodeMessagePack(bytes) {
+    const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    const text = new TextDecoder();
+    let pos = 0;
+
+    const str = length => {
+        const value = text.decode(bytes.subarray(pos, pos + length));
+        pos += length;
+        return value;
+    };
+    const array = length => {
+        const value = new Array(length);
+        for (let i = 0; i < length; i++) value[i] = read();
+        return value;
+    };
+    const map = length => {
+        const value = {};
+        for (let i = 0; i < length; i++) {
+            const key = read();
+            value[key] = read();
+        }
+        return value;
+    };
+
+    function read() {
+        const byte = bytes[pos++];
+        if (byte <= 0x7f) return byte;
+        if (byte <= 0x8f) return map(byte & 0x0f);
+        if (byte <= 0x9f) return array(byte & 0x0f);
+        if (byte <= 0xbf) return str(byte & 0x1f);
+        if (byte >= 0xe0) return byte - 0x100;
+        let value;
+        switch (byte) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xca: value = view.getFloat32(pos); pos += 4; return value;
+            case 0xcb: value = view.getFloat64(pos); pos += 8; return value;
+            case 0xcc: return bytes[pos++];
+            case 0xcd: value = view.getUint16(pos); pos += 2; return value;
+            case 0xce: value = view.getUint32(pos); pos += 4; return value;
+            case 0xcf: value = Number(view.getBigUint64(pos)); pos += 8; return value;
+            case 0xd0: value = view.getInt8(pos); pos += 1; return value;
+            case 0xd1: value = view.getInt16(pos); pos += 2; return value;
+            case 0xd2: value = view.getInt32(pos); pos += 4; return value;
+            case 0xd3: value = Number(view.getBigInt64(pos)); pos += 8; return value;
+            case 0xd9: return str(bytes[pos++]);
+            case 0xda: value = view.getUint16(pos); pos += 2; return str(value);
+            case 0xdb: value = view.getUint32(pos); pos += 4; return str(value);
+            case 0xdc: value = view.getUint16(pos); pos += 2; return array(value);
+            case 0xdd: value = view.getUint32(pos); pos += 4; return array(value);
+            case 0xde: value = view.getUint16(pos); pos += 2; return map(value);
+            case 0xdf: value = view.getUint32(pos); pos += 4; return map(value);
+        }
+        throw new Error(`Unsupported MessagePack type 0x${byte.toString(16)} at byte ${pos - 1}`);
+    }
+
+    return read();
+}
+
+async function decodeBody(response) {
+    const type = response.headers.get('Content-Type') || '';
+    if (type.startsWith(MEDIA_TYPES.msgpack)) {
+        return fromColumns(decodeMessagePack(new Uint8Array(await response.arrayBuffer())));
+    }
+    const data = await response.json();
+    return type.startsWith(MEDIA_TYPES.columns) ? fromColumns(data) : data;
+}
+
+function readCookie(name) {
+    const prefix = name + '=';
+    const found = document.cookie.split(';').map(c => c.trim()).find(c => c.startsWith(prefix));
+    return found ? decodeURIComponent(found.slice(prefix.length)) : null;
+}
+
 class BillingApp {
     constructor() {
-        // Get CSRF token from meta tag or hidden input
-        this.csrfToken = document.querySelector('meta[name="csrf-token"]')?.content || 
-                         document.querySelector('[name=csrfmiddlewaretoken]')?.value || '';
         this.currentUser = null;
+        this.catalog = new ProductCatalog(this);
         this.init();
     }
     
+    // From the cookie first: a page served from the offline cache may carry
+    // the token of an earlier login, and login issues a new one
+    get csrfToken() {
+        return readCookie('csrftoken') ||
+               document.querySelector('meta[name="csrf-token"]')?.content ||
+               document.querySelector('[name=csrfmiddlewaretoken]')?.value || '';
+    }
+
     init() {
         this.setupEventListeners();
         this.setupOfflineDetection();
@@ -24,21 +139,24 @@ class BillingApp {
         }
     }
 
+    // options.format: 'json' (default), 'columns' or 'msgpack'; list endpoints only
     async apiRequest(endpoint, options = {}) {
+        const { format = 'json', ...fetchOptions } = options;
         const defaultOptions = {
             method: 'GET',
             headers: {
+                'Accept': MEDIA_TYPES[format],
                 'Content-Type': 'application/json',
                 'X-CSRFToken': this.csrfToken,
             },
             credentials: 'include', // <--- MUST have this
-            ...options
+            ...fetchOptions
         };
 
         const response = await fetch(endpoint, defaultOptions);
 
         if (!response.ok) {
-            const errorData = await response.json().catch(() => ({}));
+            const errorData = await decodeBody(response).catch(() => ({}));
             // Build detailed error message from API response
             let errorMessage = errorData.message || `HTTP error! status: ${response.status}`;
             if (typeof errorData === 'object') {
@@ -60,7 +178,7 @@ class BillingApp {
             throw new Error(errorMessage);
         }
 
-        return response.json();
+        return decodeBody(response);
     }
 
     showToast(message, type = 'success') {
@@ -82,6 +200,89 @@ class BillingApp {
     }
 }
 
+// Product catalog shared by billing, inventory and proforma pages.
+// The first load is a normal GET that the browser revalidates with the
+// server's ETag (a 304 when nothing changed); later loads on the same page
+// ask only for what changed since the last version seen. Only the fields
+// the pages read are requested (see billing_app/fieldsets.py).
+const CATALOG_FIELDS = 'id,name,imei,selling_price,purchase_price,gst_percentage,category,stock,agency_name';
+
+class ProductCatalog {
+    constructor(app) {
+        this.app = app;
+        this.byId = new Map();
+        this.version = null;
+        this.versions = new Map();  // product id -> catalog version of its live stock
+        this.socket = null;
+    }
+
+    get products() {
+        return Array.from(this.byId.values()).sort((a, b) => b.id - a.id);
+    }
+
+    async load() {
+        if (this.version === null) {
+            const res = await this.app.apiRequest(`/api/products/?fields=${CATALOG_FIELDS}`, { format: 'columns' });
+            this.byId = new Map((res.results || res).map(p => [p.id, p]));
+            this.version = res.version ?? null;
+            return this.products;
+        }
+
+        const res = await this.app.apiRequest(
+            `/api/products/?fields=${CATALOG_FIELDS}&since=${encodeURIComponent(this.version)}`,
+            { format: 'columns' }
+        );
+        if (res.reset) this.byId.clear();
+        (res.deleted || []).forEach(id => this.byId.delete(id));
+        (res.results || []).forEach(p => this.byId.set(p.id, p));
+        this.version = res.version;
+        return this.products;
+    }
+
+    // Live stock and new-bill batches pushed by the server (billing_app/live.py).
+    // Fires a "catalog:changed" window event after each batch.
+    listen() {
+        if (this.socket || !('WebSocket' in window)) return;
+        const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+        let retry = 1000;
+
+        const connect = () => {
+            this.socket = new WebSocket(`${scheme}://${location.host}/ws/terminals/`);
+            this.socket.onopen = () => {
+                // Catch up on anything missed while disconnected
+                if (retry > 1000 && this.version !== null) this.load().then(() => this.changed([]));
+                retry = 1000;
+            };
+            this.socket.onmessage = event => this.applyBatch(JSON.parse(event.data));
+            this.socket.onclose = () => {
+                setTimeout(connect, retry);
+                retry = Math.min(retry * 2, 30000);
+            };
+        };
+        connect();
+    }
+
+    async applyBatch(batch) {
+        if (batch.resync) {
+            await this.load();
+        }
+        (batch.deleted || []).forEach(id => this.byId.delete(id));
+        (batch.stock || []).forEach(({ id, stock, v }) => {
+            const product = this.byId.get(id);
+            // Batches from different server processes can arrive out of order
+            if (product && !(BigInt(v) < BigInt(this.versions.get(id) || '0'))) {
+                product.stock = stock;
+                this.versions.set(id, v);
+            }
+        });
+        this.changed(batch.bills || []);
+    }
+
+    changed(bills) {
+        window.dispatchEvent(new CustomEvent('catalog:changed', { detail: { bills } }));
+    }
+}
+
 // Initialize app
 document.addEventListener('DOMContentLoaded', () => {
     window.billingApp = new BillingApp();
@@ -12,6 +12,7 @@ class BillingManager {
         this.loadProducts();
         this.generateInvoiceNumber();
         this.createSuggestionDropdown();
+        this.createCustomerDropdown();
     }
 
     cacheDOM() {
@@ -48,16 +49,40 @@ class BillingManager {
             this.showProductSuggestions(e.target.value)
         );
 
+        // Barcode scanners type the IMEI and press Enter
+        this.productSearch.addEventListener('keydown', e => {
+            const imei = this.productSearch.value.trim();
+            if (e.key === 'Enter' && /^\d{14,17}$/.test(imei)) {
+                e.preventDefault();
+                this.scanUnit(imei);
+            }
+        });
+
+        // Stock sold on other terminals, pushed live
+        window.addEventListener('catalog:changed', () => {
+            this.products = window.billingApp.catalog.products;
+        });
+
+        // Returning customers: suggest by phone prefix once a few digits are typed
+        let customerTimer = null;
+        this.customerPhone.addEventListener('input', e => {
+            clearTimeout(customerTimer);
+            customerTimer = setTimeout(() => this.showCustomerSuggestions(e.target.value), 200);
+        });
+
         document.addEventListener('click', e => {
             if (!this.productSearch.contains(e.target)) {
                 this.dropdown.style.display = 'none';
             }
+            if (!this.customerPhone.contains(e.target)) {
+                this.customerDropdown.style.display = 'none';
+            }
         });
     }
 
     async loadProducts() {
-        const res = await window.billingApp.apiRequest('/api/products/');
-        this.products = res.results || res;
+        this.products = await window.billingApp.catalog.load();
+        window.billingApp.catalog.listen();
     }
 
     createSuggestionDropdown() {
@@ -66,6 +91,62 @@ class BillingManager {
         document.body.appendChild(this.dropdown);
     }
 
+    createCustomerDropdown() {
+        this.customerDropdown = document.createElement('div');
+        this.customerDropdown.id = 'customerDropdown';
+        document.body.appendChild(this.customerDropdown);
+    }
+
+    async showCustomerSuggestions(term) {
+        const digits = term.replace(/\D/g, '');
+        if (digits.length < 3) {
+            this.customerDropdown.style.display = 'none';
+            return;
+        }
+
+        let matches = [];
+        try {
+            const res = await window.billingApp.apiRequest(`/api/customers/suggest/?q=${digits}`);
+            matches = res.results || [];
+        } catch {
+            // Offline: the cashier types the details in full
+        }
+        // Ignore answers to keystrokes the cashier has already typed past
+        if (this.customerPhone.value !== term) return;
+
+        this.customerDropdown.innerHTML = '';
+        if (!matches.length) {
+            this.customerDropdown.style.display = 'none';
+            return;
+        }
+
+        matches.forEach(c => {
+            const div = document.createElement('div');
+            div.className = 'suggestion-item';
+            div.innerHTML = `
+                <div class="suggestion-left">
+                    <span class="name"></span>
+                    <span class="category"></span>
+                </div>
+            `;
+            div.querySelector('.name').textContent = c.name || '-';
+            div.querySelector('.category').textContent = c.phone;
+
+            div.onclick = () => {
+                this.customerPhone.value = c.phone;
+                if (c.name) this.customerName.value = c.name;
+                this.customerDropdown.style.display = 'none';
+            };
+            this.customerDropdown.appendChild(div);
+        });
+
+        const r = this.customerPhone.getBoundingClientRect();
+        this.customerDropdown.style.top = `${r.bottom + window.scrollY + 6}px`;
+        this.customerDropdown.style.left = `${r.left}px`;
+        this.customerDropdown.style.width = `${r.width}px`;
+        this.customerDropdown.style.display = 'block';
+    }
+
     showProductSuggestions(term) {
         this.dropdown.innerHTML = '';
 
@@ -129,6 +210,45 @@ class BillingManager {
         this.dropdown.style.display = 'none';
     }
 
+    async scanUnit(imei) {
+        this.dropdown.style.display = 'none';
+        this.productSearch.value = '';
+        if (this.items.some(i => (i.imeis || []).includes(imei))) {
+            return alert(`⚠️ ${imei} is already on this bill.`);
+        }
+
+        let res;
+        try {
+            res = await window.billingApp.apiRequest(`/api/units/${encodeURIComponent(imei)}/`);
+        } catch (err) {
+            return alert(`❌ ${imei}: ${err.message}`);
+        }
+        const p = res.product;
+        if (!res.unit) {
+            // A product that still carries its own IMEI: pick it as before
+            return this.selectProduct(p);
+        }
+
+        const existingItem = this.items.find(i => i.product_id == p.id);
+        if ((existingItem ? existingItem.quantity : 0) + 1 > p.stock) {
+            return alert(`❌ Cannot add more. Only ${p.stock} units available in total.`);
+        }
+        if (existingItem) {
+            existingItem.quantity += 1;
+            existingItem.imeis = [...(existingItem.imeis || []), imei];
+        } else {
+            this.items.push({
+                product_id: p.id,
+                product_name: p.name,
+                quantity: 1,
+                price: Number(p.selling_price),
+                imeis: [imei]
+            });
+        }
+        this.renderItems();
+        this.calculateTotals();
+    }
+
     addItem() {
         const pid = this.productSearch.dataset.pid;
         const availableStock = Number(this.productSearch.dataset.stock);
@@ -141,6 +261,9 @@ class BillingManager {
 
         // 🔍 Check if same product already exists in cart to calculate total requested qty
         const existingItem = this.items.find(i => i.product_id == pid);
+        if (existingItem && existingItem.imeis) {
+            return alert('Scan the IMEI of each further handset of this model.');
+        }
         const currentCartQty = existingItem ? existingItem.quantity : 0;
         const totalRequestedQty = currentCartQty + qty;
 
@@ -180,7 +303,7 @@ class BillingManager {
         this.items.forEach(i => {
             this.itemsList.innerHTML += `
                 <div class="item-row">
-                    <span>${i.product_name} × ${i.quantity}</span>
+                    <span>${i.product_name} × ${i.quantity}${i.imeis ? `<br><small>IMEI ${i.imeis.join(', ')}</small>` : ''}</span>
                     <b>₹${(i.price * i.quantity).toFixed(2)}</b>
                 </div>
             `;
@@ -205,25 +328,28 @@ class BillingManager {
     async saveBill() {
         if (!this.items.length) return alert('Add items first');
 
-        const res = await window.billingApp.apiRequest('/api/bills/create/', {
-            method: 'POST',
-            body: JSON.stringify({
-                customer_name: this.customerName.value,
-                customer_phone: this.customerPhone.value,
-                items: this.items.map(i => ({
-                    product_id: i.product_id,
-                    quantity: i.quantity
-                }))
-            })
+        const res = await window.billQueue.submit({
+            customer_name: this.customerName.value,
+            customer_phone: this.customerPhone.value,
+            items: this.items.map(i => ({
+                product_id: i.product_id,
+                quantity: i.quantity,
+                ...(i.imeis ? { imeis: i.imeis } : {})
+            }))
         });
 
+        if (res.queued) {
+            window.billingApp.showToast('Offline: bill saved and will sync when back online', 'warning');
+        }
+
         this.lastSavedInvoice = {
-            invoice_no: res.invoice_no,
+            invoice_no: res.queued ? 'PENDING' : res.invoice_no,
             grand_total: res.grand_total,
             items: this.items
         };
 
         document.getElementById('saveConfirmModal').style.display = 'flex';
+        if (!res.queued) this.loadProducts();
     }
 
     clearBill() {
@@ -251,7 +377,7 @@ class BillingManager {
 
         const itemsHtml = inv.items.map(i => `
             <tr>
-                <td>${i.product_name}</td>
+                <td>${i.product_name}${i.imeis ? `<br>IMEI ${i.imeis.join(', ')}` : ''}</td>
                 <td style="text-align:center">${i.quantity}</td>
                 <td style="text-align:right">₹${i.price.toFixed(2)}</td>
                 <td style="text-align:right">₹${(i.price * i.quantity).toFixed(2)}</td>
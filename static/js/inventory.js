@@ -18,13 +18,20 @@ class InventoryManager {
         });
 
         document.getElementById('clearProductBtn')?.addEventListener('click', () => this.clearForm());
+
+        // Stock changes from other terminals, pushed live
+        window.addEventListener('catalog:changed', () => {
+            this.products = window.billingApp.catalog.products;
+            this.renderProductsTable();
+            this.updatePagination();
+        });
     }
 
     async loadProducts(page = 1) {
         try {
             this.currentPage = page;
-            const response = await window.billingApp.apiRequest(`/api/products/?page=${page}`);
-            this.products = response.results || response;
+            this.products = await window.billingApp.catalog.load();
+            window.billingApp.catalog.listen();
             this.renderProductsTable();
             this.updatePagination();
         } catch (error) {
@@ -120,16 +120,37 @@ class InvoiceManager {
         this.loadData();
     }
 
+    // Filters are applied server-side (indexed); see billing_app/filters.py
+    buildFilterQuery() {
+        const params = new URLSearchParams();
+        const dateFilter = document.getElementById('dateFilter')?.value;
+        const customerFilter = document.getElementById('customerFilter')?.value.trim();
+
+        if (dateFilter) {
+            params.set('start', dateFilter);
+            params.set('end', dateFilter);
+        }
+        if (customerFilter) {
+            // Digits search by phone, anything else by customer name prefix
+            params.set(/^\+?\d+$/.test(customerFilter) ? 'phone' : 'customer', customerFilter);
+        }
+        const query = params.toString();
+        return query ? `?${query}` : '';
+    }
+
     async loadData() {
         try {
+            const query = this.buildFilterQuery();
             if (this.currentTab === 'product') {
-                const data = await window.billingApp.apiRequest('/api/bills/');
+                const data = await window.billingApp.apiRequest(`/api/bills/${query}`, { format: 'columns' });
                 this.invoices = data.results || data;
-                this.applyFilters();
+                this.displayedInvoices = null;
+                this.renderInvoices();
             } else {
-                const data = await window.billingApp.apiRequest('/api/services/');
+                const data = await window.billingApp.apiRequest(`/api/services/${query}`, { format: 'columns' });
                 this.services = data.results || data;
-                this.applyFilters();
+                this.displayedServices = null;
+                this.renderServices();
             }
         } catch (e) {
             console.error(e);
@@ -241,8 +262,16 @@ class InvoiceManager {
         document.body.insertAdjacentHTML('beforeend', modalHtml);
     }
 
-    viewInvoice(invoiceNo) {
-        const inv = this.invoices.find(i => i.invoice_no === invoiceNo);
+    // The list holds summaries; the popup fetches the whole bill with its items
+    async viewInvoice(invoiceNo) {
+        let inv;
+        try {
+            const params = new URLSearchParams({ invoice_no: invoiceNo, fields: 'all', expand: 'items' });
+            const data = await window.billingApp.apiRequest(`/api/bills/?${params}`);
+            inv = (data.results || [])[0];
+        } catch (e) {
+            console.error(e);
+        }
         if (!inv) return window.billingApp.showToast('Invoice not found', 'error');
 
         // Log to console for debugging
@@ -303,12 +332,16 @@ class InvoiceManager {
         this.showCustomPopup('Invoice Details', content);
     }
 
-    viewService(identifier) {
-        const ser = this.services.find(s => 
-            (s.service_invoice_no === identifier) || 
-            (s.service_id === identifier) || 
-            (s.invoice_no === identifier)
-        );
+    // Like viewInvoice: the list holds summaries without the issue text
+    async viewService(identifier) {
+        let ser;
+        try {
+            const params = new URLSearchParams({ invoice_no: identifier, fields: 'all' });
+            const data = await window.billingApp.apiRequest(`/api/services/?${params}`);
+            ser = (data.results || [])[0];
+        } catch (e) {
+            console.error(e);
+        }
         if (!ser) return window.billingApp.showToast('Service not found', 'error');
 
         // SMART MAPPING: Tries to find the right data in your API response
@@ -348,25 +381,8 @@ class InvoiceManager {
     }
 
     applyFilters() {
-        const dateFilter = document.getElementById('dateFilter').value;
-        const customerFilter = document.getElementById('customerFilter').value.toLowerCase();
-
-        const filterFn = (item, dateKey) => {
-            if (customerFilter && !item.customer_name.toLowerCase().includes(customerFilter)) return false;
-            if (dateFilter) {
-                return new Date(item[dateKey]).toLocaleDateString('en-IN') ===
-                       new Date(dateFilter).toLocaleDateString('en-IN');
-            }
-            return true;
-        };
-
-        if (this.currentTab === 'product') {
-            this.displayedInvoices = this.invoices.filter(i => filterFn(i, 'created_at'));
-            this.renderInvoices();
-        } else {
-            this.displayedServices = this.services.filter(s => filterFn(s, 'created_at'));
-            this.renderServices();
-        }
+        this.currentPage = 1;
+        this.loadData();
     }
 
     clearFilters() {
@@ -376,7 +392,9 @@ class InvoiceManager {
     }
 
     exportToCSV() {
-        console.log('Export CSV:', this.currentTab);
+        // Server streams the CSV with the same filters as the list
+        const base = this.currentTab === 'product' ? '/api/bills/export/' : '/api/services/export/';
+        window.location.href = `${base}${this.buildFilterQuery()}`;
     }
 }
 
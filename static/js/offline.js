@@ -0,0 +1,132 @@
+// static/js/offline.js
+// Offline checkout queue. Bills that cannot reach the server are stored in
+// IndexedDB under a client-generated key and posted to /api/bills/sync/
+// when the connection comes back. The server deduplicates on the key, so a
+// batch that is sent twice (or a POST that did reach the server before the
+// connection dropped) never bills twice.
+
+class OfflineBillQueue {
+    constructor(app) {
+        this.app = app;
+        this.dbName = 'billing-offline';
+        this.storeName = 'bills';
+        this.batchSize = 50;
+        this.syncing = false;
+        this.init();
+    }
+
+    init() {
+        window.addEventListener('online', () => this.sync());
+        if (navigator.onLine) this.sync();
+    }
+
+    static newKey() {
+        if (window.crypto?.randomUUID) return crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+
+    open() {
+        if (!this.dbPromise) {
+            this.dbPromise = new Promise((resolve, reject) => {
+                const request = indexedDB.open(this.dbName, 1);
+                request.onupgradeneeded = () => {
+                    request.result.createObjectStore(this.storeName, { keyPath: 'client_key' });
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return this.dbPromise;
+    }
+
+    async run(mode, action) {
+        const db = await this.open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(this.storeName, mode);
+            const request = action(tx.objectStore(this.storeName));
+            tx.oncomplete = () => resolve(request?.result);
+            tx.onerror = () => reject(tx.error);
+        });
+    }
+
+    add(bill) {
+        return this.run('readwrite', store => store.put({ ...bill, queued_at: Date.now(), failed: null }));
+    }
+
+    all() {
+        return this.run('readonly', store => store.getAll());
+    }
+
+    remove(keys) {
+        return this.run('readwrite', store => keys.forEach(key => store.delete(key)));
+    }
+
+    markFailed(results) {
+        return this.run('readwrite', store => results.forEach(result => {
+            const request = store.get(result.client_key);
+            request.onsuccess = () => {
+                if (request.result) store.put({ ...request.result, failed: result.errors });
+            };
+        }));
+    }
+
+    async pending() {
+        return (await this.all()).filter(bill => !bill.failed);
+    }
+
+    // Post a bill now, or queue it when the network is unreachable.
+    // Resolves to the server's {invoice_no, grand_total} or {queued: true}.
+    async submit(bill) {
+        bill = { client_key: OfflineBillQueue.newKey(), ...bill };
+        if (navigator.onLine) {
+            try {
+                return await this.app.apiRequest('/api/bills/create/', {
+                    method: 'POST',
+                    body: JSON.stringify(bill)
+                });
+            } catch (error) {
+                // fetch() rejects with a TypeError only when the request never
+                // completed; HTTP errors (e.g. insufficient stock) are real answers
+                if (!(error instanceof TypeError)) throw error;
+            }
+        }
+        await this.add(bill);
+        return { queued: true, client_key: bill.client_key };
+    }
+
+    async sync() {
+        if (this.syncing) return;
+        this.syncing = true;
+        let created = 0;
+        let rejected = 0;
+        try {
+            let queued = await this.pending();
+            while (queued.length && navigator.onLine) {
+                const batch = queued.slice(0, this.batchSize);
+                const res = await this.app.apiRequest('/api/bills/sync/', {
+                    method: 'POST',
+                    body: JSON.stringify({
+                        bills: batch.map(({ queued_at, failed, ...bill }) => bill)
+                    })
+                });
+                const done = res.results.filter(r => r.status !== 'rejected');
+                const failed = res.results.filter(r => r.status === 'rejected');
+                await this.remove(done.map(r => r.client_key));
+                if (failed.length) await this.markFailed(failed);
+                created += done.length;
+                rejected += failed.length;
+                queued = queued.slice(batch.length);
+            }
+        } catch (error) {
+            console.error('Offline bill sync failed:', error);
+        } finally {
+            this.syncing = false;
+        }
+        if (created) this.app.showToast(`Synced ${created} offline bill(s)`, 'success');
+        if (rejected) this.app.showToast(`${rejected} offline bill(s) were rejected`, 'error');
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    window.billQueue = new OfflineBillQueue(window.billingApp);
+});
@@ -47,7 +47,7 @@ class ProformaManager {
         tbody.innerHTML = '<tr><td colspan="5" style="text-align:center;">Loading...</td></tr>';
 
         try {
-            const res = await window.billingApp.apiRequest('/api/proforma/list/');
+            const res = await window.billingApp.apiRequest('/api/proforma/', { format: 'columns' });
             this.proformas = res.results || res;
             this.renderProformaList();
         } catch (e) {
@@ -76,12 +76,26 @@ class ProformaManager {
         `).join('');
     }
 
-    viewProforma(no) {
-        const pro = this.proformas.find(p => p.proforma_no === no);
-        if (!pro) return;
+    // The list holds summaries; the preview fetches the proforma with its items
+    async viewProforma(no) {
+        let pro;
+        try {
+            const params = new URLSearchParams({ proforma_no: no, fields: 'all', expand: 'items' });
+            const res = await window.billingApp.apiRequest(`/api/proforma/?${params}`);
+            pro = (res.results || [])[0];
+        } catch (e) {
+            console.error(e);
+        }
+        if (!pro) return window.billingApp.showToast('Proforma not found', 'error');
 
         // Set items and data for preview
-        this.items = pro.items;
+        this.items = pro.items.map(item => ({
+            product_id: item.product ? item.product.id : null,
+            name: item.product ? item.product.name : 'Unknown Product',
+            quantity: item.quantity,
+            price: Number(item.price),
+            total: Number(item.total)
+        }));
         document.getElementById('proCustomerName').value = pro.customer_name;
         document.getElementById('proValidUntil').value = pro.valid_until;
         
@@ -114,8 +128,7 @@ class ProformaManager {
     /* ---------------- PRODUCTS ---------------- */
     async loadProducts() {
         try {
-            const res = await window.billingApp.apiRequest('/api/products/');
-            this.products = res.results || res;
+            this.products = await window.billingApp.catalog.load();
             this.populateProductList();
         } catch {
             window.billingApp.showToast('Failed to load products', 'error');
@@ -1,81 +1,106 @@
 // static/sw.js - Service Worker for Mobile Billing PWA
-// This handles offline caching, precaches core assets, and provides basic offline support
+// Served from /sw.js by billing_app.views.service_worker, which prepends
+//   const PRECACHE = {version, urls};
+// built at collectstatic time from whitenoise's manifest (billing_app/storage.py).
+// Every deploy that changes an asset changes PRECACHE.version, so the browser
+// installs this worker again and the old caches are dropped on activate.
+//
+//   hashed static assets  cache-first (a hashed URL never changes content)
+//   pages                 network-first; the cached copy only when offline
+//   /api/ GETs            network-first, falling back to a bounded cache
 
-const CACHE_NAME = 'mobile-billing-pwa-v1';
-const urlsToCache = [
-    '/',                          // Root (login page)
-    '/billing/',                  // Billing page
-    '/service/',                  // Service page
-    '/static/css/style.css',      // Main CSS
-    '/static/css/print.css',      // Print styles
-    '/static/js/app.js',          // Core app logic
-    '/static/js/billing.js',      // Billing JS
-    '/static/js/inventory.js',    // Inventory JS
-    '/static/js/service.js',      // Service JS
-    '/static/js/invoice.js',      // Invoice JS
-    '/static/js/reports.js',      // Reports JS
-    '/static/js/pwa.js',          // PWA features
-    '/static/manifest.json',      // Manifest
+const VERSION = PRECACHE.version;
+const STATIC_CACHE = `static-${VERSION}`;
+const PAGE_CACHE = `pages-${VERSION}`;
+const API_CACHE = `api-${VERSION}`;
+const API_CACHE_LIMIT = 60;
+const HASHED_ASSET = /\.[0-9a-f]{12}\.[a-z0-9]+$/;
+const PASSTHROUGH = ['/sw.js', '/admin/', '/logout/', '/api/bills/sync/'];
 
-    // Add more critical assets like templates or additional JS/CSS if needed
-];
-
-// Install event: Cache all essential files during SW installation
+// Install event: precache every app asset of this deploy
 self.addEventListener('install', event => {
     event.waitUntil(
-        caches.open(CACHE_NAME)
-            .then(cache => {
-                console.log('SW: Caching core files');
-                return cache.addAll(urlsToCache);
-            })
-            .catch(error => {
-                console.error('SW: Caching failed:', error);
-            })
+        caches.open(STATIC_CACHE)
+            .then(cache => cache.addAll(PRECACHE.urls))
+            .then(() => self.skipWaiting())
     );
-    
-    // Skip waiting to activate the new SW immediately
-    self.skipWaiting();
 });
 
-// Activate event: Clean up old caches
+// Activate event: drop caches of previous deploys
 self.addEventListener('activate', event => {
-    const cacheWhitelist = [CACHE_NAME];
+    const current = [STATIC_CACHE, PAGE_CACHE, API_CACHE];
     event.waitUntil(
-        caches.keys().then(cacheNames => {
-            return Promise.all(
-                cacheNames.map(cacheName => {
-                    if (!cacheWhitelist.includes(cacheName)) {
-                        return caches.delete(cacheName);
-                    }
-                })
-            );
-        })
+        caches.keys()
+            .then(names => Promise.all(
+                names.filter(name => !current.includes(name)).map(name => caches.delete(name))
+            ))
+            .then(() => self.clients.claim())
     );
-    
-    // Take control of all clients immediately
-    self.clients.claim();
 });
 
-// Fetch event: Serve from cache first, then network (cache-first strategy)
 self.addEventListener('fetch', event => {
-    event.respondWith(
-        caches.match(event.request)
-            .then(response => {
-                // If found in cache, return it
-                if (response) {
-                    return response;
-                }
-                
-                // Otherwise, fetch from network
-                return fetch(event.request).catch(() => {
-                    // Fallback for offline: Return a custom offline response if needed
-                    console.log('SW: Offline mode - serving from cache or fallback');
-                    // Optional: return caches.match('/offline.html'); // If you add an offline page
-                });
-            })
-    );
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) return;
+    if (url.pathname.startsWith('/logout/')) {
+        // The next user of a shared terminal must not get this user's pages or data
+        event.waitUntil(Promise.all([caches.delete(PAGE_CACHE), caches.delete(API_CACHE)]));
+        return;
+    }
+    if (PASSTHROUGH.some(prefix => url.pathname.startsWith(prefix))) return;
+
+    if (url.pathname.startsWith('/api/')) {
+        event.respondWith(networkFirst(request));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(HASHED_ASSET.test(url.pathname) ? cacheFirst(request) : networkFirst(request, STATIC_CACHE));
+    } else if (request.mode === 'navigate') {
+        // Online, pages come fresh: each carries the CSRF token of the current login
+        event.respondWith(networkFirst(request, PAGE_CACHE));
+    }
 });
 
+async function cacheFirst(request) {
+    const cached = await caches.match(request, { cacheName: STATIC_CACHE });
+    if (cached) return cached;
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(STATIC_CACHE);
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function networkFirst(request, cacheName = API_CACHE) {
+    const cache = await caches.open(cacheName);
+    try {
+        const response = await fetch(request);
+        // Only JSON is worth replaying offline; CSV exports stream straight through
+        const type = response.headers.get('Content-Type') || '';
+        // A redirect (e.g. to login) must not be replayed as the page itself
+        if (response.ok && !response.redirected && (cacheName !== API_CACHE || type.includes('json'))) {
+            await cache.put(request, response.clone());
+            if (cacheName === API_CACHE) trimCache(cache, API_CACHE_LIMIT);
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(request);
+        if (cached) return cached;
+        if (cacheName === API_CACHE) {
+            return new Response(JSON.stringify({ error: 'Offline' }), {
+                status: 503,
+                headers: { 'Content-Type': 'application/json' }
+            });
+        }
+        throw error;
+    }
+}
+
+// Keys come back in insertion order; a re-put moves an entry to the end
+async function trimCache(cache, limit) {
+    const keys = await cache.keys();
+    await Promise.all(keys.slice(0, Math.max(0, keys.length - limit)).map(key => cache.delete(key)));
+}
+
 // Optional: Handle push notifications (if you add push later)
 self.addEventListener('push', event => {
     const data = event.data ? event.data.json() : {};
@@ -84,7 +109,7 @@ self.addEventListener('push', event => {
         body: data.body || 'You have a new notification from your billing app.',
         icon: '/static/images/icon.png'
     };
-    
+
     event.waitUntil(
         self.registration.showNotification(title, options)
     );
@@ -96,4 +121,4 @@ self.addEventListener('notificationclick', event => {
     event.waitUntil(
         clients.openWindow('/')
     );
-});
\ No newline at end of file
+});